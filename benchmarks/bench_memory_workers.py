@@ -0,0 +1,42 @@
+"""Memory write throughput on the shared sqlite store vs number of worker processes.
+
+    python benchmarks/bench_memory_workers.py --workers 1 2 4 8 --writes 2000
+"""
+import os, sys, json, time, argparse, tempfile, multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synapseflow.agent import Memory
+from synapseflow.memory_store import SqliteStore
+
+def _worker(path: str, wid: int, writes: int, start):
+    mem = Memory(path=path, store=SqliteStore(path))
+    start.wait()
+    for i in range(writes):
+        mem.add(f'user{wid % 4}', f'worker {wid} note {i} about sanya weather and stocks')
+
+def run(workers: int, writes: int) -> dict:
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'bench.db')
+        SqliteStore(path).close()
+        start = mp.Event()
+        procs = [mp.Process(target=_worker, args=(path, w, writes, start)) for w in range(workers)]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        total = Memory(path=path, store=SqliteStore(path)).store._conn().execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    return {'workers': workers, 'writes': total, 'seconds': round(elapsed, 4), 'writes_per_sec': round(total / elapsed, 1),
+            'lost_writes': workers * writes - total}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    ap.add_argument('--writes', type=int, default=2000)
+    args = ap.parse_args()
+    print(json.dumps([run(w, args.writes) for w in args.workers], indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""CPU-bound tool throughput: in-process threads vs the tool process pool.
+
+    python benchmarks/bench_tool_process.py --workers 1 2 4 --calls 32
+"""
+import os, sys, json, time, argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synapseflow.tool_process import ProcessToolPool
+
+MODULE = os.path.splitext(os.path.basename(__file__))[0]
+
+def cpu_tool(input_text: str) -> str:
+    # stand-in for a CPU-heavy generated tool; holds the GIL the whole time
+    h = 0
+    for i in range(300000):
+        h = (h * 31 + i) % 1000003
+    return f'{input_text}:{h}'
+
+def run(workers: int, calls: int) -> dict:
+    with ThreadPoolExecutor(workers) as threads:
+        t0 = time.perf_counter()
+        list(threads.map(cpu_tool, [str(i) for i in range(calls)]))
+        threaded = time.perf_counter() - t0
+    pool = ProcessToolPool(max_workers=workers, preload=[MODULE])
+    pool.warm()
+    with ThreadPoolExecutor(workers) as callers:
+        t0 = time.perf_counter()
+        list(callers.map(lambda i: pool.run(MODULE, 'cpu_tool', str(i)), range(calls)))
+        isolated = time.perf_counter() - t0
+    pool.shutdown()
+    return {'workers': workers, 'calls': calls, 'threads_calls_per_sec': round(calls / threaded, 1),
+            'processes_calls_per_sec': round(calls / isolated, 1), 'cores': os.cpu_count()}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    ap.add_argument('--calls', type=int, default=32)
+    args = ap.parse_args()
+    print(json.dumps([run(w, args.calls) for w in args.workers], indent=2))
+
+if __name__ == '__main__':
+    main()
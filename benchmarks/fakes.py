@@ -0,0 +1,108 @@
+"""Offline stand-ins for the network dependencies, shared by the benchmarks."""
+import time, math, uuid, random, asyncio, hashlib, threading
+from typing import Any, Dict, List, Optional
+
+WORDS = ('weather stock news trip flight hotel price city forecast rain market share search article summary '
+         'budget plan route train map restaurant review currency exchange rate calendar meeting email report '
+         'translate image video music sport score traffic holiday visa museum beach ticket').split()
+
+def hash_embed(texts: List[str], model: str = 'fake', dim: int = 64) -> List[List[float]]:
+    """Deterministic bag-of-words hashing embedding (provider signature of set_embedding_provider)."""
+    out = []
+    for text in texts:
+        vec = [0.0] * dim
+        for tok in text.lower().split():
+            h = int.from_bytes(hashlib.blake2b(tok.encode(), digest_size=4).digest(), 'little')
+            vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        out.append([v / norm for v in vec])
+    return out
+
+class FakeChat:
+    """Chat provider (see set_chat_provider) streaming `chunks` tokens `delay` seconds apart."""
+    def __init__(self, chunks: int = 40, delay: float = 0.0005):
+        self.chunks = chunks
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, prompt, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        words = [WORDS[(len(prompt) + i) % len(WORDS)] + ' ' for i in range(self.chunks)]
+        if not stream:
+            time.sleep(self.delay * self.chunks)
+            return {'text': ''.join(words), 'raw': None}
+        return self._stream(words)
+
+    def _stream(self, words):
+        for w in words:
+            time.sleep(self.delay)
+            yield w
+
+class FakeQdrantAdapter:
+    """In-memory QdrantAdapter with the same upsert/query surface (brute-force cosine)."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.points: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, user_id: str, text: str, meta: Optional[Dict[str, Any]] = None, vector: Optional[List[float]] = None):
+        return self.upsert_many([{'user_id': user_id, 'text': text, 'meta': meta or {}, 'vector': vector}])
+
+    def upsert_many(self, records: List[Dict[str, Any]]):
+        time.sleep(self.latency)
+        ids = []
+        with self._lock:
+            for rec in records:
+                pid = str(uuid.uuid4())
+                self.points[pid] = {'vector': rec.get('vector'), 'payload': {'user_id': rec['user_id'], 'text': rec['text'], 'meta': rec.get('meta') or {}}}
+                ids.append(pid)
+        return ids
+
+    def search_by_vector(self, vector: List[float], top_k: int = 5, user_id: Optional[str] = None):
+        time.sleep(self.latency)
+        with self._lock:
+            points = list(self.points.items())
+        scored = []
+        for pid, p in points:
+            if p['vector'] is None or (user_id is not None and p['payload'].get('user_id') != user_id):
+                continue
+            scored.append((sum(a * b for a, b in zip(vector, p['vector'])), pid, p))
+        scored.sort(key=lambda s: -s[0])
+        return [{'id': pid, 'score': s, 'text': p['payload']['text'], 'payload': p['payload']} for s, pid, p in scored[:top_k]]
+
+    def query(self, user_id: str, query: str, top_k: int = 5, vector: Optional[List[float]] = None):
+        if vector is not None:
+            return self.search_by_vector(vector, top_k, user_id)
+        with self._lock:
+            hits = [(pid, p) for pid, p in self.points.items() if p['payload'].get('user_id') == user_id]
+        return [{'id': pid, 'text': p['payload']['text'], 'payload': p['payload']} for pid, p in hits[:top_k]]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def fake_tools(n: int, seed: int = 7, delay: float = 0.0):
+    """n (name, func, description) triples with overlapping vocabularies."""
+    rng = random.Random(seed)
+    tools = []
+    for i in range(n):
+        words = rng.sample(WORDS, 4)
+        name = f'{words[0]}_{words[1]}_{i}'
+
+        def func(text, _name=name):
+            if delay:
+                time.sleep(delay)
+            return f'{_name}: {text}'
+        tools.append((name, func, ' '.join(words) + ' tool'))
+    return tools
+
+def async_fake_tool(name: str, delay: float = 0.001):
+    async def func(text):
+        await asyncio.sleep(delay)
+        return f'{name}: {text}'
+    return func
+
+def sentence(rng: random.Random, words: int = 6) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
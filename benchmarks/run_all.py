@@ -0,0 +1,267 @@
+"""Offline benchmark suite for the agent hot paths; prints (or writes) one JSON document.
+
+    python benchmarks/run_all.py --out bench.json              # full run
+    python benchmarks/run_all.py --quick                       # smaller sizes, for CI
+    python benchmarks/run_all.py --only memory tools --compare bench.json
+
+Everything runs against fakes (benchmarks/fakes.py): no OpenAI, Qdrant or network.
+/run and /sse_stream are driven through the ASGI app when fastapi, httpx and PyJWT
+are installed, otherwise through the same handler pipeline in-process.
+"""
+import os, sys, json, time, random, asyncio, argparse, platform, tempfile, subprocess, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+
+def _pct(samples, q):
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+def _latency(samples_s):
+    ms = [x * 1000 for x in samples_s]
+    return {'p50_ms': round(_pct(ms, 0.5), 4), 'p95_ms': round(_pct(ms, 0.95), 4), 'p99_ms': round(_pct(ms, 0.99), 4)}
+
+def _timed(fn, n):
+    out = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append(time.perf_counter() - t0)
+    return out
+
+# --- memory -----------------------------------------------------------------
+
+def bench_memory(sizes, queries=200):
+    from synapseflow.agent import Memory
+    rng = random.Random(1)
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            mem = Memory(path=os.path.join(d, 'mem.json'))
+            texts = [fakes.sentence(rng, 10) for _ in range(size)]
+            t0 = time.perf_counter()
+            for t in texts:
+                mem.add('u1', t)
+            add_s = time.perf_counter() - t0
+            qs = [fakes.sentence(rng, 3) for _ in range(queries)]
+            lat = _timed(lambda i: mem.query('u1', qs[i]), queries)
+            mem.store.close()
+        results.append(dict(history=size, adds_per_sec=round(size / add_s, 1), **{'query_' + k: v for k, v in _latency(lat).items()}))
+    return results
+
+# --- tool selection -----------------------------------------------------------
+
+def bench_select_tools(counts, queries=300):
+    from synapseflow.agent import Agent, Memory, Tool
+    rng = random.Random(2)
+    results = []
+    for n in counts:
+        with tempfile.TemporaryDirectory() as d:
+            agent = Agent(memory=Memory(path=os.path.join(d, 'mem.json')))
+            t0 = time.perf_counter()
+            agent.swap_tools(add=[Tool(name, func, desc) for name, func, desc in fakes.fake_tools(n)])
+            register_ms = (time.perf_counter() - t0) * 1000
+            qs = [fakes.sentence(rng, 5) for _ in range(queries)]
+            single = _timed(lambda i: agent.select_tools(qs[i]), queries)
+            plans = [qs[i:i + 5] for i in range(0, queries, 5)]
+            many = _timed(lambda i: agent.select_tools_many(plans[i]), len(plans))
+        results.append(dict(tools=n, register_ms=round(register_ms, 3), **{'select_' + k: v for k, v in _latency(single).items()},
+                            **{'select_plan5_' + k: v for k, v in _latency(many).items()}))
+    return results
+
+# --- planner ----------------------------------------------------------------------
+
+def bench_planner(lengths, repeat=50):
+    from synapseflow.agent import Planner
+    rng = random.Random(3)
+    joins = ['. ', ' and ', ' then ', '; ', ', then use it to ']
+    results = []
+    for words in lengths:
+        parts, count = [], 0
+        while count < words:
+            parts.append(fakes.sentence(rng, 6))
+            parts.append(rng.choice(joins))
+            count += 6
+        task = ''.join(parts[:-1])
+        lat = _timed(lambda i: Planner.plan_graph(task), repeat)
+        results.append(dict(words=words, steps=len(Planner.plan_graph(task)), **_latency(lat)))
+    return results
+
+# --- end to end ---------------------------------------------------------------------
+
+def _make_agent(d):
+    from synapseflow.agent import Agent, Memory, Tool
+    agent = Agent(memory=Memory(path=os.path.join(d, 'mem.json')), max_workers=32, max_concurrency=32)
+    for name in ('weather_lookup', 'stock_price', 'news_search'):
+        agent.register_tool(Tool(name, fakes.async_fake_tool(name, 0.002), name.replace('_', ' ') + ' tool'))
+    return agent
+
+async def _load(make_request, concurrency, total):
+    lat = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            t0 = time.perf_counter()
+            await make_request(i)
+            lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - t0), lat
+
+def _asgi_client():
+    try:
+        import httpx, jwt  # noqa: F401
+        import synapseflow_app
+    except Exception:
+        return None, None
+    return synapseflow_app, httpx
+
+def bench_run(concurrencies, total=200):
+    results = []
+    app_mod, httpx = _asgi_client()
+    for c in concurrencies:
+        with tempfile.TemporaryDirectory() as d:
+            if app_mod is not None:
+                app_mod.agent = _make_agent(d)
+                mode = 'asgi'
+
+                async def run():
+                    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_mod.app), base_url='http://bench') as client:
+                        return await _load(lambda i: client.post('/run', json={'user_id': f'u{i % 8}', 'query': 'weather in Sanya and stock INFY then news about it'}), c, total)
+            else:
+                agent = _make_agent(d)
+                mode = 'in-process'
+
+                async def run():
+                    return await _load(lambda i: agent.arun(f'u{i % 8}', 'weather in Sanya and stock INFY then news about it'), c, total)
+            rps, lat = asyncio.run(run())
+        results.append(dict(mode=mode, concurrency=c, requests=total, requests_per_sec=round(rps, 1), **_latency(lat)))
+    return results
+
+def bench_sse(concurrencies, total=100, chunks=40):
+    from synapseflow import openai_integration as oi
+    from synapseflow.streaming import coalesce, sse_events
+    oi.set_chat_provider(fakes.FakeChat(chunks=chunks, delay=0.0005))
+    oi.set_response_cache(None)
+    app_mod, httpx = _asgi_client()
+    results = []
+
+    async def not_disconnected():
+        return False
+
+    async def pipeline(i, ttfb):
+        t0 = time.perf_counter()
+        first = True
+        async for frame in sse_events(coalesce(oi.achat_stream(f'prompt {i}'), max_chars=64, max_delay=0.05), not_disconnected, heartbeat=15):
+            if first:
+                ttfb.append(time.perf_counter() - t0)
+                first = False
+
+    try:
+        for c in concurrencies:
+            ttfb = []
+            if app_mod is not None:
+                mode = 'asgi'
+                token = app_mod.create_token('bench')
+
+                async def run():
+                    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_mod.app), base_url='http://bench') as client:
+                        async def one(i):
+                            t0 = time.perf_counter()
+                            async with client.stream('GET', '/sse_stream', params={'q': f'prompt {i}', 'token': token}) as resp:
+                                first = True
+                                async for _ in resp.aiter_bytes():
+                                    if first:
+                                        ttfb.append(time.perf_counter() - t0)
+                                        first = False
+                        return await _load(one, c, total)
+            else:
+                mode = 'in-process'
+
+                async def run():
+                    return await _load(lambda i: pipeline(i, ttfb), c, total)
+            sps, lat = asyncio.run(run())
+            results.append(dict(mode=mode, concurrency=c, streams=total, streams_per_sec=round(sps, 1),
+                                **_latency(lat), ttfb_p50_ms=round(_pct([x * 1000 for x in ttfb], 0.5), 4)))
+    finally:
+        oi.set_chat_provider(None)
+    return results
+
+# --- cold import ---------------------------------------------------------------------------
+
+def bench_cold_import(statements, repeat=5):
+    results = []
+    for stmt in statements:
+        runs = []
+        for _ in range(repeat):
+            code = f'import time; t0 = time.perf_counter(); {stmt}; print(time.perf_counter() - t0)'
+            out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+            if out.returncode != 0:
+                runs = None
+                break
+            runs.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+        results.append({'statement': stmt, 'ms_median': round(statistics.median(runs), 3) if runs else None,
+                        'ms_min': round(min(runs), 3) if runs else None})
+    return results
+
+SUITES = {
+    'memory': lambda q: bench_memory([500, 2000] if q else [1000, 10000, 50000]),
+    'tools': lambda q: bench_select_tools([10, 100] if q else [10, 100, 1000, 5000]),
+    'planner': lambda q: bench_planner([50, 500] if q else [50, 500, 5000]),
+    'run': lambda q: bench_run([1, 8] if q else [1, 8, 32], total=50 if q else 200),
+    'sse': lambda q: bench_sse([1, 8] if q else [1, 16, 64], total=20 if q else 100),
+    'import': lambda q: bench_cold_import(['import synapseflow', 'from synapseflow import Agent',
+                                           'import synapseflow.openai_integration'], repeat=3 if q else 7),
+}
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(current, baseline):
+    """Per-suite ratios current/baseline for every shared numeric field (row-aligned)."""
+    out = {}
+    for suite, rows in current['results'].items():
+        base_rows = baseline.get('results', {}).get(suite)
+        if not base_rows:
+            continue
+        out[suite] = [{k: round(r[k] / b[k], 3) for k in r if isinstance(r.get(k), (int, float)) and isinstance(b.get(k), (int, float)) and b[k]}
+                      for r, b in zip(rows, base_rows)]
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--only', nargs='+', choices=sorted(SUITES), help='suites to run (default: all)')
+    ap.add_argument('--quick', action='store_true', help='smaller sizes')
+    ap.add_argument('--out', help='write JSON here instead of stdout')
+    ap.add_argument('--compare', help='baseline JSON from an earlier run; adds current/baseline ratios')
+    args = ap.parse_args()
+    os.environ.setdefault('SYNAPSEFLOW_TOOL_RELOAD', '0')
+    os.environ['RESPONSE_CACHE_TTL'] = '0'  # measure the pipeline, not cache hits
+    doc = {'commit': _git_rev(), 'python': platform.python_version(), 'platform': platform.platform(),
+           'cpus': os.cpu_count(), 'quick': args.quick, 'time': time.time(), 'results': {}}
+    for name in args.only or list(SUITES):
+        t0 = time.perf_counter()
+        doc['results'][name] = SUITES[name](args.quick)
+        print(f'{name}: {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        doc['compare'] = {'baseline_commit': base.get('commit'), 'ratios': compare(doc, base)}
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,26 @@
-from .agent import Agent, Tool, Memory, Planner, LightSwarm
-from .openai_integration import chat_completion, chat_stream
-from .qdrant_adapter import QdrantAdapter
-from .tool_generator import create_tool_from_description
-
-from .tool_generator import create_tool_from_description
-from .openai_integration import chat_completion, chat_stream
-from .qdrant_adapter import QdrantAdapter
+import importlib
+
+# Public names are resolved lazily so `import synapseflow` does not pull in
+# openai / qdrant_client until one of their integrations is actually used.
+_EXPORTS = {
+    'Agent': '.agent', 'Tool': '.agent', 'LazyTool': '.agent', 'Memory': '.agent', 'Planner': '.agent', 'LightSwarm': '.agent',
+    'HostedAgent': '.swarm_process',
+    'MemoryStore': '.memory_store', 'LogStore': '.memory_store', 'JsonFileStore': '.memory_store',
+    'chat_completion': '.openai_integration', 'chat_stream': '.openai_integration',
+    'QdrantAdapter': '.qdrant_adapter',
+    'ContextBuilder': '.context',
+    'create_tool_from_description': '.tool_generator',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
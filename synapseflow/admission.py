@@ -0,0 +1,140 @@
+import math, time, asyncio
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+from .tracing import get_tracer
+
+class Overloaded(Exception):
+    """Raised by AdmissionQueue.slot when the queue is full; retry_after is in seconds."""
+    def __init__(self, retry_after: int, reason: str = 'queue full'):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+class _Waiter:
+    __slots__ = ('key', 'cost', 'future', 'enqueued')
+
+    def __init__(self, key: str, cost: int, future: asyncio.Future):
+        self.key = key
+        self.cost = cost
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+# Bounded admission for agent runs on one event loop. At most max_running units
+# of work execute at once; the rest wait in per-key (per-user) FIFOs that are
+# served round-robin, so one busy user cannot starve the others. When the queue
+# (or one key's share of it) is full, slot() raises Overloaded with a Retry-After
+# estimate from the recent service time instead of letting requests pile up.
+class AdmissionQueue:
+    def __init__(self, max_running: int = 32, max_queued: int = 256, max_queued_per_key: Optional[int] = None,
+                 tracer=None):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_queued_per_key = max_queued_per_key or max_queued
+        self.tracer = tracer or get_tracer()
+        self.running = 0
+        self.queued = 0
+        self._queues: 'OrderedDict[str, deque]' = OrderedDict()  # rotation order = round-robin order
+        self._service = 0.0  # EWMA seconds per unit of work
+        self.metrics = {'admitted': 0, 'queued_total': 0, 'rejected': 0, 'cancelled': 0}
+
+    def retry_after(self) -> int:
+        backlog = (self.queued + self.running) / max(1, self.max_running)
+        return max(1, math.ceil(backlog * (self._service or 1.0)))
+
+    def _reject(self, reason: str):
+        self.metrics['rejected'] += 1
+        self.tracer.count('admission.rejected', reason)
+        raise Overloaded(self.retry_after(), reason)
+
+    async def acquire(self, key: str, cost: int = 1) -> int:
+        cost = max(1, min(cost, self.max_running))
+        if not self.queued and self.running + cost <= self.max_running:
+            self.running += cost
+            self.metrics['admitted'] += 1
+            self.tracer.observe('admission.wait', '', 0.0)
+            return cost
+        q = self._queues.get(key)
+        if self.queued + cost > self.max_queued:
+            self._reject('queue full')
+        if q is not None and sum(w.cost for w in q) + cost > self.max_queued_per_key:
+            self._reject('user queue full')
+        waiter = _Waiter(key, cost, asyncio.get_running_loop().create_future())
+        if q is None:
+            q = self._queues[key] = deque()
+        q.append(waiter)
+        self.queued += cost
+        self.metrics['queued_total'] += 1
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(cost)  # granted just as the caller gave up
+            else:
+                self._drop(waiter)
+            self.metrics['cancelled'] += 1
+            raise
+        self.tracer.observe('admission.wait', '', time.perf_counter() - waiter.enqueued)
+        return cost
+
+    def _drop(self, waiter: _Waiter):
+        q = self._queues.get(waiter.key)
+        if q is not None and waiter in q:
+            q.remove(waiter)
+            self.queued -= waiter.cost
+            if not q:
+                del self._queues[waiter.key]
+        self._dispatch()
+
+    def release(self, cost: int = 1, seconds: Optional[float] = None):
+        self.running -= cost
+        if seconds is not None:
+            per_unit = seconds / cost
+            self._service = per_unit if not self._service else 0.8 * self._service + 0.2 * per_unit
+        self._dispatch()
+
+    def _dispatch(self):
+        # hand free capacity to the head of each key's FIFO in turn; a head that
+        # doesn't fit blocks later keys so large batches are not starved
+        while self._queues:
+            key, q = next(iter(self._queues.items()))
+            waiter = q[0]
+            if self.running + waiter.cost > self.max_running:
+                return
+            q.popleft()
+            self.queued -= waiter.cost
+            if q:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if waiter.future.done():
+                continue
+            self.running += waiter.cost
+            self.metrics['admitted'] += 1
+            waiter.future.set_result(None)
+
+    def slot(self, key: str, cost: int = 1) -> '_Slot':
+        """async with queue.slot(user_id): ... runs the body once admitted (or raises Overloaded)."""
+        return _Slot(self, key, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics, running=self.running, queued=self.queued, waiting_keys=len(self._queues),
+                    max_running=self.max_running, max_queued=self.max_queued, service_ms=self._service * 1000)
+
+class _Slot:
+    __slots__ = ('queue', 'key', 'cost', 'granted', 'start')
+
+    def __init__(self, queue: AdmissionQueue, key: str, cost: int):
+        self.queue = queue
+        self.key = key
+        self.cost = cost
+        self.granted = 0
+        self.start = 0.0
+
+    async def __aenter__(self):
+        self.granted = await self.queue.acquire(self.key, self.cost)
+        self.start = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.queue.release(self.granted, time.perf_counter() - self.start)
+        return False
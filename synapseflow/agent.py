@@ -1,27 +1,179 @@
-import os, time, json, re
-from typing import Callable, List, Dict, Any, Optional
+import os, time, json, re, queue, asyncio, functools, inspect, threading, importlib, pkgutil
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from .memory_store import MemoryStore, LogStore
+from .memory_index import InvertedIndex, Record
+from .memory_retention import RetentionPolicy
+from .tool_index import ToolIndex
+from .tool_cache import CachePolicy, ToolCache
+from .tool_process import ProcessToolPool, default_pool
+from .tracing import Tracer, get_tracer
+from .hybrid_recall import HybridRecall, vector_hits
+from .scheduler import PlanNode, DagResult, run_dag, arun_dag
+from .streaming import aiter_in_thread
+
+# Tools may return a generator (sync or async) to stream partial output; the
+# chunks go to on_chunk as they arrive and their joined text is the tool's result
+def _drain(out: Any, on_chunk: Optional[Callable[[Any], None]] = None) -> Any:
+    if inspect.isasyncgen(out):
+        # sync run path: drive an async generator tool on a private loop (tool threads have none)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(_adrain(out, on_chunk))
+        raise TypeError('async generator tool output cannot be drained inside a running event loop; use arun')
+    if not inspect.isgenerator(out):
+        return out
+    parts = []
+    for chunk in out:
+        parts.append(str(chunk))
+        if on_chunk:
+            on_chunk(chunk)
+    return ''.join(parts)
+
+async def _adrain(out: Any, on_chunk: Optional[Callable[[Any], None]] = None) -> Any:
+    if inspect.isasyncgen(out):
+        chunks = out
+    elif inspect.isgenerator(out):
+        chunks = aiter_in_thread(lambda: out)  # blocking generator: iterate it off the loop
+    else:
+        return out
+    parts = []
+    async for chunk in chunks:
+        parts.append(str(chunk))
+        if on_chunk:
+            on_chunk(chunk)
+    return ''.join(parts)
+
+_END = object()
 
 # Simple Tool wrapper
 class Tool:
-    def __init__(self, name: str, func: Callable, description: str = '', params: Optional[List[Dict[str,str]]] = None):
+    def __init__(self, name: str, func: Callable, description: str = '', params: Optional[List[Dict[str,str]]] = None, timeout: Optional[float] = None,
+                 cache: Optional[CachePolicy] = None):
         self.name = name
         self.func = func
         self.description = description or ''
         self.params = params or []
+        self.timeout = timeout
+        self.cache = cache  # results are cached by the agent's ToolCache when set
+
+    @property
+    def is_async(self) -> bool:
+        return asyncio.iscoroutinefunction(self.func)
+
+    @property
+    def accepts_context(self) -> bool:
+        # tools opt in to receiving dependency results with a `context` parameter
+        try:
+            return 'context' in inspect.signature(self.load()).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def load(self) -> Callable:
+        return self.func
 
     def run(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+    async def arun(self, *args, executor: Optional[Executor] = None, **kwargs):
+        # coroutine tools run on the loop; sync tools are pushed to the (bounded) executor
+        if self.is_async:
+            return await self.load()(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(self.run, *args, **kwargs))
+
+# Tool registered from the manifest; its module is imported on first run()
+class LazyTool(Tool):
+    def __init__(self, name: str, module: str, attr: str, description: str = '', params: Optional[List[Dict[str,str]]] = None,
+                 timeout: Optional[float] = None, is_async: bool = False, cache: Optional[CachePolicy] = None):
+        super().__init__(name, None, description, params, timeout, cache)
+        self.module = module
+        self.attr = attr
+        self._is_async = is_async
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_async(self) -> bool:
+        return self._is_async
+
+    def load(self) -> Callable:
+        if self.func is None:
+            with self._load_lock:
+                if self.func is None:
+                    self.func = getattr(importlib.import_module(self.module), self.attr)
+        return self.func
+
+    def run(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+# Tool run in a warm worker process (tool_isolation = 'process'): a CPU-bound or
+# untrusted tool can't hold this process's GIL or crash it, and each call is held
+# to the tool's wall-clock (timeout), CPU (tool_cpu_seconds) and memory (tool_memory_mb) limits
+class ProcessTool(LazyTool):
+    def __init__(self, name: str, module: str, attr: str, description: str = '', params: Optional[List[Dict[str,str]]] = None,
+                 timeout: Optional[float] = None, is_async: bool = False, cache: Optional[CachePolicy] = None,
+                 cpu_seconds: Optional[float] = None, memory_mb: Optional[int] = None, pool: Optional[ProcessToolPool] = None):
+        super().__init__(name, module, attr, description, params, timeout, is_async, cache)
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.version = None  # module mtime; workers re-import the module when it changes
+        self._pool = pool
+
+    @property
+    def pool(self) -> ProcessToolPool:
+        if self._pool is None:
+            self._pool = default_pool()
+        return self._pool
+
+    @property
+    def accepts_context(self) -> bool:
+        # checking the signature would import the module here, which isolation is meant to avoid
+        return False
+
+    def _limits(self) -> dict:
+        return {'timeout': self.timeout, 'cpu_seconds': self.cpu_seconds, 'memory_mb': self.memory_mb, 'version': self.version}
+
+    def run(self, *args, **kwargs):
+        return self.pool.run(self.module, self.attr, *args, **self._limits(), **kwargs)
+
+    async def arun(self, *args, executor: Optional[Executor] = None, **kwargs):
+        return await self.pool.arun(self.module, self.attr, *args, **self._limits(), **kwargs)
+
 # Memory (file-backed) with adapter hook (e.g., Qdrant)
+# Lazy stores (ShardedLogStore) load one user at a time; at most max_loaded_users
+# stay resident and users idle for idle_ttl seconds are evicted. A RetentionPolicy
+# bounds each user's history incrementally on add. With USE_EMBEDDINGS_QDRANT=1 (or
+# an `embeddings` object) writes are also embedded into the adapter and queries fuse
+# keyword and vector hits, falling back to keyword-only after recall_budget seconds.
 class Memory:
-    def __init__(self, path: str = 'memory.json', adapter: Any = None):
+    def __init__(self, path: str = 'memory.json', adapter: Any = None, store: Optional[MemoryStore] = None,
+                 retention: Optional[RetentionPolicy] = None, max_loaded_users: Optional[int] = None,
+                 idle_ttl: Optional[float] = None, embeddings: Any = None, recall_budget: Optional[float] = None):
         self.path = path
         self.adapter = adapter
+        self._embeddings = embeddings
+        self._recall: Optional[HybridRecall] = None
+        self.recall_budget = recall_budget if recall_budget is not None else float(os.getenv('MEMORY_RECALL_BUDGET_MS', '150')) / 1000
+        self.store = store or LogStore(path)
+        self.retention = retention
+        self.max_loaded_users = max_loaded_users
+        self.idle_ttl = idle_ttl
+        self._lock = threading.RLock()
+        self._data: Dict[str, deque] = {}
+        self._index: Dict[str, InvertedIndex] = {}
+        self._loaded: 'OrderedDict[str, float]' = OrderedDict()
+        self._since_prune: Dict[str, int] = {}
         try:
-            with open(self.path, 'r') as f:
-                self._data = json.load(f)
-        except Exception:
-            self._data = {}
+            loaded = self.store.load()
+        except Exception as e:
+            print('Failed to load memory store:', e)
+            loaded = {}
+        for uid, recs in loaded.items():
+            for rec in recs:
+                self._insert(uid, rec)
+            self._apply_retention(uid, persist=False)
 
         # If no adapter provided and QDRANT_URL env exists, attempt to init adapter lazily
         if not self.adapter and os.getenv('QDRANT_URL'):
@@ -30,158 +182,785 @@ class Memory:
                 self.adapter = QdrantAdapter(url=os.getenv('QDRANT_URL'))
             except Exception as e:
                 print('QdrantAdapter init failed:', e)
+        # or an offline numpy index (synapseflow.local_vector) at LOCAL_VECTOR_PATH
+        if not self.adapter and os.getenv('LOCAL_VECTOR_PATH'):
+            try:
+                from .local_vector import LocalVectorIndex
+                self.adapter = LocalVectorIndex(os.getenv('LOCAL_VECTOR_PATH'), dtype=os.getenv('LOCAL_VECTOR_DTYPE', 'float32'),
+                                                ivf_lists=int(os.getenv('LOCAL_VECTOR_IVF_LISTS', '0')))
+            except Exception as e:
+                print('LocalVectorIndex init failed:', e)
 
-    def add(self, user_id: str, text: str, meta: dict = None):
-        rec = {'t': time.time(), 'text': text, 'meta': meta or {}}
-        self._data.setdefault(user_id, []).append(rec)
+    @property
+    def embeddings(self):
+        # one long-lived EmbeddingMemory over self.adapter; False marks a failed init so it isn't retried per write.
+        # A local vector index is always used, with its own (offline) embedding function
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = False
+                    local = getattr(self.adapter, 'embed', None)
+                    if self.adapter and (local or os.getenv('USE_EMBEDDINGS_QDRANT') == '1'):
+                        try:
+                            from .embeddings_qdrant import EmbeddingMemory
+                            self._embeddings = EmbeddingMemory(adapter=self.adapter, embed=local)
+                        except Exception as e:
+                            print('EmbeddingMemory init failed:', e)
+        return self._embeddings or None
+
+    @property
+    def recall(self) -> Optional[HybridRecall]:
+        emb = self.embeddings
+        if emb is None:
+            return None
+        if self._recall is None:
+            with self._lock:
+                if self._recall is None:
+                    self._recall = HybridRecall(self._query, lambda uid, q, n: self._retained(uid, vector_hits(emb.query(uid, q, n, fallback=False))),
+                                                budget=self.recall_budget)
+        return self._recall
+
+    def _window_start(self, user_id: str) -> Optional[float]:
+        # oldest timestamp still inside the retention window; records the policy
+        # dropped or summarized stay in the vector adapter and are filtered by it
+        if self.retention is None:
+            return None
+        start = time.time() - self.retention.max_age if self.retention.max_age is not None else None
+        if self.retention.max_records is None:
+            return start
+        if self.store.shared:
+            # the summary record is stamped at prune time, after every record it replaced
+            oldest = self.store.oldest(user_id) if hasattr(self.store, 'oldest') else None
+        else:
+            with self._lock:
+                self._touch(user_id)
+                oldest = next((r.t for r in self._data.get(user_id, ()) if not (r.meta and r.meta.get('summary'))), None)
+        bounds = [b for b in (start, oldest) if b is not None]
+        return max(bounds) if bounds else None
+
+    def _retained(self, user_id: str, hits: List[dict]) -> List[dict]:
+        start = self._window_start(user_id)
+        if start is None:
+            return hits
+        return [h for h in hits if h.get('t') is None or h['t'] >= start]
+
+    def _insert(self, user_id: str, rec):
+        # caller holds self._lock (or is __init__)
+        rec = Record.of(rec)
+        recs = self._data.get(user_id)
+        if recs is None:
+            recs = self._data[user_id] = deque()
+            self._index[user_id] = InvertedIndex()
+        recs.append(rec)
+        self._index[user_id].add(rec)
+
+    def _touch(self, user_id: str):
+        # caller holds self._lock; loads a lazy store's shard on first access and evicts idle ones
+        if not self.store.lazy:
+            return
+        if user_id not in self._loaded:
+            try:
+                for rec in self.store.load_user(user_id):
+                    self._insert(user_id, rec)
+            except Exception as e:
+                print('Failed to load memory shard:', user_id, e)
+            self._apply_retention(user_id, persist=False)
+        now = time.monotonic()
+        self._loaded[user_id] = now
+        self._loaded.move_to_end(user_id)
+        while self._loaded:
+            uid, last = next(iter(self._loaded.items()))
+            over = self.max_loaded_users is not None and len(self._loaded) > self.max_loaded_users
+            idle = self.idle_ttl is not None and now - last > self.idle_ttl
+            if uid == user_id or not (over or idle):
+                break
+            self.evict(uid)
+
+    def evict(self, user_id: str):
+        """Drop a user's records from RAM (lazy stores reload them on next access)."""
+        with self._lock:
+            self._loaded.pop(user_id, None)
+            self._data.pop(user_id, None)
+            self._index.pop(user_id, None)
+            self.store.evict(user_id)
+
+    def _apply_retention(self, user_id: str, persist: bool = True):
+        # caller holds self._lock (or is __init__)
+        recs = self._data.get(user_id)
+        if self.retention is None or not recs or not self.retention.due(recs):
+            return
+        dropped = self.retention.trim(recs)
+        idx = self._index[user_id]
+        for rec in dropped:
+            idx.remove(rec.doc_id)
+        summary = self._summarize(user_id, [r.to_dict() for r in dropped])
+        if summary is not None:
+            summary = Record(dropped[-1].t, summary, {'summary': True, 'count': len(dropped)})
+            recs.appendleft(summary)
+            idx.add(summary)
+        if persist and self.store.lazy:
+            self.store.compact({user_id: list(recs)})
+
+    def _summarize(self, user_id: str, dropped: List[dict]) -> Optional[str]:
+        if not dropped or self.retention is None or self.retention.summarize is None:
+            return None
         try:
-            with open(self.path, 'w') as f:
-                json.dump(self._data, f, indent=2)
+            return self.retention.summarize(user_id, dropped) or None
         except Exception as e:
-            print('Failed to write memory file:', e)
-        # push to adapter if available
+            print('Memory summarize hook failed:', e)
+            return None
+
+    def _prune_shared(self, user_id: str):
+        # shared stores keep no local copy; prune in the store every `slack` adds per user
+        if self.retention is None or not hasattr(self.store, 'prune'):
+            return
+        n = self._since_prune.get(user_id, 0) + 1
+        if n < self.retention.slack:
+            self._since_prune[user_id] = n
+            return
+        self._since_prune.pop(user_id, None)
+        limit = self.retention.max_records
+        if limit is not None and self.retention.summarize is not None:
+            limit = max(0, limit - 1)
+        dropped = self.store.prune(user_id, limit, self.retention.max_age)
+        summary = self._summarize(user_id, dropped)
+        if summary is not None:
+            # stamped now: the store prunes purely by t, so an old stamp would expire the summary at once
+            self.store.append(user_id, {'t': time.time(), 'text': summary, 'meta': {'summary': True, 'count': len(dropped)}})
+
+    def refresh(self):
+        """Pull records other processes appended to a shared, non-searchable store."""
+        if self.store.shared and not self.store.searchable:
+            with self._lock:
+                for uid, rec in self.store.tail():
+                    self._insert(uid, rec)
+
+    def add(self, user_id: str, text: str, meta: dict = None):
+        with get_tracer().span('memory.add'):
+            self._add(user_id, text, meta)
+
+    def _add(self, user_id: str, text: str, meta: dict = None):
+        rec = Record(time.time(), text, meta)
+        with self._lock:
+            if not self.store.shared:
+                self._touch(user_id)
+                self._insert(user_id, rec)
+            try:
+                self.store.append(user_id, rec)
+                if self.store.should_compact(user_id):
+                    self.store.compact({user_id: list(self._data[user_id])} if self.store.lazy else self._data)
+                if self.store.shared:
+                    self._prune_shared(user_id)
+                else:
+                    self._apply_retention(user_id)
+            except Exception as e:
+                print('Failed to write memory store:', e)
+        self.refresh()
+        # push to adapter if available (embedded when USE_EMBEDDINGS_QDRANT=1)
         if self.adapter:
+            emb = self.embeddings
             try:
-                import os
-                if os.getenv('USE_EMBEDDINGS_QDRANT') == '1':
-                    try:
-                        from .embeddings_qdrant import EmbeddingMemory
-                        embm = EmbeddingMemory()
-                        embm.upsert_text(user_id, text, meta or {})
-                        return
-                    except Exception as e:
-                        print('EmbeddingMemory upsert failed:', e)
-                # fallback to regular adapter upsert
-                self.adapter.upsert(user_id, text, meta or {})
+                if emb is not None:
+                    emb.upsert_text(user_id, text, dict(meta or {}, t=rec.t))
+                else:
+                    self.adapter.upsert(user_id, text, meta or {})
             except Exception as e:
                 print('Memory adapter upsert failed:', e)
 
     def query(self, user_id: str, q: str, top_k: int = 5):
-        # naive keyword match + recency boost
-        items = self._data.get(user_id, [])
-        qset = set(q.lower().split())
-        scored = []
-        for it in items:
-            words = set(it.get('text','').lower().split())
-            score = len(qset & words)
-            # recency boost
-            score += 0.000001 * (time.time() - it['t'])
-            if score > 0:
-                scored.append((score, it))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        return [s[1] for s in scored[:top_k]]
+        with get_tracer().span('memory.query'):
+            recall = self.recall
+            if recall is not None:
+                return recall.search(user_id, q, top_k)
+            return self._query(user_id, q, top_k)
+
+    def _query(self, user_id: str, q: str, top_k: int = 5):
+        # BM25 + time-decay recency bonus, in the shared store (FTS5) or the user's inverted index
+        if self.store.searchable:
+            return self.store.search(user_id, q, top_k)
+        self.refresh()
+        with self._lock:
+            self._touch(user_id)
+            idx = self._index.get(user_id)
+            if idx is None:
+                return []
+            return [r.to_dict() for r in idx.search(q, top_k)]
+
+    def records(self, user_id: str) -> List[dict]:
+        """All retained records of a user, oldest first."""
+        if self.store.searchable:
+            return self.store.load_user(user_id)
+        self.refresh()
+        with self._lock:
+            self._touch(user_id)
+            return [r.to_dict() for r in self._data.get(user_id, ())]
 
 # Planner: Tree-of-Thought style simple planner
 class Planner:
+    # a step that refers back to an earlier result depends on the step before it: "the result(s)/output/answer",
+    # "previous", "above", or a bare it/that/them/those opening or closing the step ("summarize it"), not
+    # a conjunction or pronoun mid-sentence ("check that the weather is fine")
+    REFERENCE_RE = re.compile(r"\b(the (results?|outputs?|answers?)|previous|above)\b"
+                              r"|^(it|that|them|those)\b|\b(it|that|them|those)\W*$", re.I)
+
     @staticmethod
-    def plan(task: str) -> List[str]:
-        parts = re.split(r'[.;\n]| and | then ', task)
-        parts = [p.strip() for p in parts if p.strip()]
-        if not parts:
-            return [task]
+    def _split(task: str) -> List[Tuple[str, bool]]:
+        # (part, follows_then) pairs
+        tokens = re.split(r'([.;\n]| and | then )', task)
+        parts, then = [], False
+        for i, tok in enumerate(tokens):
+            if i % 2:
+                then = then or tok == ' then '
+                continue
+            p = tok.strip()
+            if p.lower().startswith('then '):
+                p, then = p[5:].strip(), True
+            if p:
+                parts.append((p, then))
+                then = False
         refined = []
-        for p in parts:
+        for p, then in parts:
             if len(p.split()) > 40:
-                refined.extend([x.strip() for x in re.split(r'[,:]', p) if x.strip()])
+                sub = [x.strip() for x in re.split(r'[,:]', p) if x.strip()]
+                refined.extend((x, then and i == 0) for i, x in enumerate(sub))
             else:
-                refined.append(p)
+                refined.append((p, then))
         # if still single long part split roughly
-        if len(refined) == 1 and len(refined[0].split()) > 20:
-            words = refined[0].split()
+        if len(refined) == 1 and len(refined[0][0].split()) > 20:
+            words = refined[0][0].split()
             half = len(words)//2
-            refined = [' '.join(words[:half]), ' '.join(words[half:])]
+            refined = [(' '.join(words[:half]), False), (' '.join(words[half:]), False)]
         return refined
 
+    @classmethod
+    def plan_graph(cls, task: str) -> List[PlanNode]:
+        """Steps as a DAG: 'then' or a back-reference orders a step after the previous one,
+        everything else is independent; identical sub-steps are merged."""
+        nodes: List[PlanNode] = []
+        seen: Dict[str, PlanNode] = {}
+        prev = None
+        for text, after_then in cls._split(task):
+            key = ' '.join(text.lower().split())
+            node = seen.get(key)
+            if node is None:
+                deps = [prev.id] if prev is not None and (after_then or cls.REFERENCE_RE.search(text)) else []
+                node = seen[key] = PlanNode(len(nodes), text, deps)
+                nodes.append(node)
+            prev = node
+        return nodes or [PlanNode(0, task)]
+
+    @classmethod
+    def plan(cls, task: str) -> List[str]:
+        return [n.step for n in cls.plan_graph(task)]
+
 # Agent core
 class Agent:
-    def __init__(self, name: str = 'SynapseFlow', memory: Memory = None, trace: Callable[[dict],None] = None):
+    def __init__(self, name: str = 'SynapseFlow', memory: Memory = None, trace: Callable[[dict],None] = None,
+                 max_workers: int = 8, max_concurrency: int = 8, tool_timeout: Optional[float] = 10.0,
+                 tool_cache: Optional[ToolCache] = None, process_pool: Optional[ProcessToolPool] = None,
+                 tracer: Optional[Tracer] = None):
         self.name = name
         self.tools: Dict[str, Tool] = {}
+        self.tool_index = ToolIndex()
+        self._tools_lock = threading.Lock()
         self.memory = memory or Memory()
-        self.trace = trace
+        self.trace = trace  # called with {'step', 'tool', 'output', 'ms'} per tool call; output is not copied
+        self.tracer = tracer or get_tracer()
         self.history: List[Dict[str,Any]] = []
+        # async path: sync tools run on a bounded thread pool, at most max_concurrency tool calls per run
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.tool_timeout = tool_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # results of tools with a CachePolicy; a LightSwarm shares one cache between its agents
+        self.tool_cache = tool_cache if tool_cache is not None else ToolCache()
+        # isolated tools share the process-wide pool unless one is given
+        self.process_pool = process_pool or default_pool()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'{self.name}-tool')
+        return self._executor
 
+    # self.tools is copy-on-write: changes build a new dict and swap it in, so a
+    # run holding the old dict (or Tool objects from it) sees a consistent registry
     def register_tool(self, tool: Tool):
-        self.tools[tool.name] = tool
+        self.swap_tools(add=[tool])
 
-    def discover_tools(self, module_prefix: str = 'synapseflow.tools'):
-        import pkgutil, importlib
+    def unregister_tool(self, name: str):
+        self.swap_tools(remove=[name])
+
+    def swap_tools(self, add: List[Tool] = (), remove: List[str] = ()):
+        """Apply a batch of registrations/removals as one atomic registry swap."""
+        with self._tools_lock:
+            tools = dict(self.tools)
+            for name in remove:
+                tools.pop(name, None)
+                self.tool_index.remove(name)
+            for tool in add:
+                tools[tool.name] = tool
+                self.tool_index.add(tool.name, tool.description)
+            self.tools = tools
+
+    def discover_tools(self, module_prefix: str = 'synapseflow.tools', lazy: bool = True):
+        # lazy: register from the static manifest and import each module on first use
+        if not lazy:
+            return self._discover_tools_eager(module_prefix)
+        from .tool_manifest import build_manifest
+        try:
+            entries = build_manifest(module_prefix)
+        except Exception as e:
+            print('Tool discovery failed:', e)
+            return
+        self.swap_tools(add=[t for t in map(self._tool_from_entry, entries) if t])
+
+    def _tool_from_entry(self, ent: Dict[str, Any]) -> Optional[Tool]:
+        if not ent.get('func'):
+            return self._load_tool_module(ent['module'])
+        meta = ent.get('meta', {})
+        args = (meta.get('tool_name', ent['func']), ent['module'], ent['func'], meta.get('tool_description', ''),
+                meta.get('tool_params'), meta.get('tool_timeout'), ent.get('is_async', False), CachePolicy.from_meta(meta))
+        if meta.get('tool_isolation') == 'process':
+            tool = self._process_tool(args, meta)
+            tool.version = ent.get('mtime_ns')
+            return tool
+        return LazyTool(*args)
+
+    def watch_tools(self, module_prefix: str = 'synapseflow.tools', interval: float = 2.0):
+        """Start a background watcher that hot-reloads the tool package (see ToolWatcher)."""
+        from .tool_watcher import ToolWatcher
+        return ToolWatcher(self, module_prefix, interval).start()
+
+    def _discover_tools_eager(self, module_prefix: str):
         try:
             pkg = importlib.import_module(module_prefix)
         except Exception as e:
             print('Tool discovery failed:', e)
             return
-        for finder, name, ispkg in pkgutil.iter_modules(pkg.__path__):
-            try:
-                mod = importlib.import_module(f"{module_prefix}.{name}")
-                # find callable functions and metadata
-                funcs = [a for a in dir(mod) if callable(getattr(mod, a)) and not a.startswith('_')]
-                if not funcs:
-                    continue
-                func = getattr(mod, funcs[0])
-                tname = getattr(mod, 'tool_name', funcs[0])
-                desc = getattr(mod, 'tool_description', '')
-                params = getattr(mod, 'tool_params', None)
-                self.register_tool(Tool(tname, func, desc, params))
-            except Exception as e:
-                print('Failed loading tool module', name, e)
+        tools = [self._load_tool_module(f"{module_prefix}.{name}") for finder, name, ispkg in pkgutil.iter_modules(pkg.__path__)]
+        self.swap_tools(add=[t for t in tools if t])
+
+    def _load_tool_module(self, module: str) -> Optional[Tool]:
+        try:
+            mod = importlib.import_module(module)
+            # find callable functions and metadata
+            funcs = [a for a in dir(mod) if callable(getattr(mod, a)) and not a.startswith('_')]
+            if not funcs:
+                return None
+            # the function named after the tool wins over imported helpers
+            tname = getattr(mod, 'tool_name', funcs[0])
+            func = getattr(mod, tname if tname in funcs else funcs[0])
+            desc = getattr(mod, 'tool_description', '')
+            params = getattr(mod, 'tool_params', None)
+            meta = {k: v for k, v in vars(mod).items() if k.startswith('tool_')}
+            if meta.get('tool_isolation') == 'process':
+                return self._process_tool((tname, module, func.__name__, desc, params, meta.get('tool_timeout'),
+                                           asyncio.iscoroutinefunction(func), CachePolicy.from_meta(meta)), meta)
+            return Tool(tname, func, desc, params, meta.get('tool_timeout'), CachePolicy.from_meta(meta))
+        except Exception as e:
+            print('Failed loading tool module', module, e)
+            return None
+
+    def _process_tool(self, args: tuple, meta: dict) -> ProcessTool:
+        tool = ProcessTool(*args, cpu_seconds=meta.get('tool_cpu_seconds'), memory_mb=meta.get('tool_memory_mb'),
+                           pool=self.process_pool)
+        tool.pool.add_preload(tool.module)
+        return tool
+
+    def describe(self) -> str:
+        # capability text (name plus tool names and descriptions) used for swarm routing
+        return ' '.join([self.name.replace('_', ' ')] + [f"{t.name.replace('_', ' ')} {t.description}" for t in self.tools.values()])
 
     def select_tools(self, query: str, top_n: int = 3):
-        # simple scoring: count of token occurrences in tool name+description
-        qtokens = query.lower().split()
-        scores = []
-        for tname, t in self.tools.items():
-            text = (t.description + ' ' + tname).lower()
-            score = sum(text.count(q) for q in qtokens)
-            if any(q in tname.lower() for q in qtokens):
-                score += 1
-            scores.append((score, t))
-        scores.sort(reverse=True, key=lambda x: x[0])
-        selected = [t for s,t in scores if s>0]
-        if not selected:
-            selected = [t for _,t in scores[:top_n]]
-        return selected[:top_n]
-
-    def run_step(self, step: str):
-        tools = self.select_tools(step)
+        # tf-idf over tool name+description, +1 for a name hit (see ToolIndex)
+        tools = self.tools
+        return [tools[n] for n in self.tool_index.select(query, top_n) if n in tools]
+
+    def select_tools_many(self, queries: List[str], top_n: int = 3):
+        # scores every step of a plan in one pass
+        tools = self.tools
+        return [[tools[n] for n in names if n in tools] for names in self.tool_index.select_many(queries, top_n)]
+
+    def _call_tool(self, t: Tool, step: str, context: Optional[List[dict]] = None, on_chunk: Optional[Callable] = None):
+        # results that depend on upstream context are never cached
+        if context and t.accepts_context:
+            return _drain(t.run(step, context=context), on_chunk)
+        if t.cache is not None and self.tool_cache is not None:
+            return self.tool_cache.call(t.name, step, lambda s: _drain(t.run(s), on_chunk), t.cache,
+                                        refresh=lambda s: _drain(t.run(s)))
+        return _drain(t.run(step), on_chunk)
+
+    @staticmethod
+    def _chunk_events(emit: Optional[Callable[[dict], None]], step: str, t: Tool) -> Optional[Callable]:
+        if emit is None:
+            return None
+        return lambda chunk: emit({'event': 'chunk', 'step': step, 'tool': t.name, 'data': chunk})
+
+    def run_step(self, step: str, tools: Optional[List[Tool]] = None, context: Optional[List[dict]] = None,
+                 emit: Optional[Callable[[dict], None]] = None):
+        # context: results of the steps this one depends on, passed to tools that accept it;
+        # emit: receives chunk/tool events while the step runs (see run_stream)
+        tools = self.select_tools(step) if tools is None else tools
         outs = []
         for t in tools:
-            try:
-                out = t.run(step)
-            except Exception as e:
-                out = f"Tool {t.name} failed: {e}"
+            with self.tracer.span('tool', t.name) as sp:
+                t0 = time.perf_counter()
+                try:
+                    out = self._call_tool(t, step, context, self._chunk_events(emit, step, t))
+                except Exception as e:
+                    sp.fail(e)
+                    out = f"Tool {t.name} failed: {e}"
+                ms = (time.perf_counter() - t0) * 1000
             outs.append({'tool': t.name, 'output': out})
             if self.trace:
-                try:
-                    self.trace({'step': step, 'tool': t.name, 'output': str(out)})
-                except Exception:
-                    pass
+                self._report(step, t, out, ms)
+            if emit:
+                emit({'event': 'tool', 'step': step, 'tool': t.name, 'output': out, 'ms': ms})
         return outs
 
-    def run(self, user_id: str, query: str, use_planner: bool = True):
+    def _report(self, step: str, t: Tool, out: Any, ms: float):
+        try:
+            self.trace({'step': step, 'tool': t.name, 'output': out, 'ms': ms})
+        except Exception:
+            pass
+
+    def _plan(self, query: str, use_planner: bool) -> Tuple[List[PlanNode], Dict[int, List[Tool]]]:
+        with self.tracer.span('plan'):
+            nodes = Planner.plan_graph(query) if use_planner else [PlanNode(0, query)]
+        with self.tracer.span('select_tools', steps=len(nodes)):
+            selected = self.select_tools_many([n.step for n in nodes])
+        return nodes, dict(zip((n.id for n in nodes), selected))
+
+    @staticmethod
+    def _collect(nodes: List[PlanNode], dag: DagResult, entry: dict):
+        entry['wall_ms'] = dag.wall_ms
+        entry['critical_path_ms'] = dag.critical_path_ms
+        by_id = {n.id: n for n in nodes}
+        final = []
+        for n in nodes:
+            item = {'step': n.step, 'results': dag.results[n.id]}
+            if n.deps:
+                item['depends_on'] = [by_id[d].step for d in n.deps]
+            final.append(item)
+        return final
+
+    @staticmethod
+    def _context(node: PlanNode, nodes: Dict[int, PlanNode], inputs: Dict[int, Any]) -> Optional[List[dict]]:
+        return [{'step': nodes[d].step, 'results': inputs[d]} for d in node.deps] or None
+
+    @staticmethod
+    def _plan_event(nodes: List[PlanNode]) -> dict:
+        by_id = {n.id: n for n in nodes}
+        return {'event': 'plan', 'steps': [{'step': n.step, 'depends_on': [by_id[d].step for d in n.deps]} for n in nodes]}
+
+    @staticmethod
+    def _step_done(emit: Optional[Callable[[dict], None]], node: PlanNode, results: List[dict]) -> List[dict]:
+        if emit:
+            emit({'event': 'step', 'step': node.step, 'results': results})
+        return results
+
+    # remember=False skips the memory write, e.g. when a swarm already stored the query once
+    def run(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True):
+        with self.tracer.span('agent.run', self.name):
+            return self._run(user_id, query, use_planner, remember)
+
+    def run_stream(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True):
+        """Like run(), but yields events as they happen: plan, chunk (generator tools), tool, step, result.
+
+        The run proceeds on a worker thread; stopping early doesn't cancel tools already running."""
+        events: 'queue.Queue' = queue.Queue()
+        box: Dict[str, Any] = {}
+
+        def work():
+            try:
+                with self.tracer.span('agent.run', self.name):
+                    box['result'] = self._run(user_id, query, use_planner, remember, emit=events.put)
+            except BaseException as e:
+                box['error'] = e
+            finally:
+                events.put(_END)
+        threading.Thread(target=work, name=f'{self.name}-stream', daemon=True).start()
+        while True:
+            ev = events.get()
+            if ev is _END:
+                break
+            yield ev
+        if 'error' in box:
+            raise box['error']
+        yield {'event': 'result', 'result': box['result']}
+
+    def _run(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True,
+             emit: Optional[Callable[[dict], None]] = None):
         entry = {'user': user_id, 'query': query, 'time': time.time()}
         self.history.append(entry)
         try:
-            self.memory.add(user_id, query)
+            if remember:
+                self.memory.add(user_id, query)
         except Exception as e:
             print('Memory add failed:', e)
-        steps = Planner.plan(query) if use_planner else [query]
-        final = []
-        for s in steps:
-            res = self.run_step(s)
-            final.append({'step': s, 'results': res})
-        return final
+        nodes, tools = self._plan(query, use_planner)
+        if emit:
+            emit(self._plan_event(nodes))
+        by_id = {n.id: n for n in nodes}
+        # independent steps run in parallel on the tool pool; dependent ones get their inputs' results
+        dag = run_dag(nodes, lambda n, inputs: self._step_done(
+            emit, n, self.run_step(n.step, tools[n.id], self._context(n, by_id, inputs), emit)), self.executor)
+        return self._collect(nodes, dag, entry)
+
+    async def _acall_tool(self, t: Tool, step: str, context: Optional[List[dict]] = None, on_chunk: Optional[Callable] = None):
+        if context and t.accepts_context:
+            return await _adrain(await t.arun(step, executor=self.executor, context=context), on_chunk)
+
+        async def call(s: str, on_chunk=on_chunk):
+            return await _adrain(await t.arun(s, executor=self.executor), on_chunk)
+        if t.cache is not None and self.tool_cache is not None:
+            # background refreshes run without this request's chunk callback
+            return await self.tool_cache.acall(t.name, step, call, t.cache, refresh=lambda s: call(s, None))
+        return await call(step)
+
+    async def _run_tool_async(self, t: Tool, step: str, sem: asyncio.Semaphore, context: Optional[List[dict]] = None,
+                              emit: Optional[Callable[[dict], None]] = None):
+        timeout = t.timeout if t.timeout is not None else self.tool_timeout
+        async with sem:
+            with self.tracer.span('tool', t.name) as sp:
+                t0 = time.perf_counter()
+                try:
+                    out = await asyncio.wait_for(self._acall_tool(t, step, context, self._chunk_events(emit, step, t)), timeout)
+                except asyncio.TimeoutError as e:
+                    sp.fail(e)
+                    out = f"Tool {t.name} timed out after {timeout}s"
+                except Exception as e:
+                    sp.fail(e)
+                    out = f"Tool {t.name} failed: {e}"
+                ms = (time.perf_counter() - t0) * 1000
+        if self.trace:
+            self._report(step, t, out, ms)
+        if emit:
+            emit({'event': 'tool', 'step': step, 'tool': t.name, 'output': out, 'ms': ms})
+        return {'tool': t.name, 'output': out}
+
+    async def run_step_async(self, step: str, sem: Optional[asyncio.Semaphore] = None, tools: Optional[List[Tool]] = None,
+                             context: Optional[List[dict]] = None, emit: Optional[Callable[[dict], None]] = None):
+        # selected tools run concurrently; cancelling the caller cancels every pending tool call
+        sem = sem or asyncio.Semaphore(self.max_concurrency)
+        tools = self.select_tools(step) if tools is None else tools
+        return list(await asyncio.gather(*(self._run_tool_async(t, step, sem, context, emit) for t in tools)))
+
+    async def arun(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True):
+        with self.tracer.span('agent.run', self.name):
+            return await self._arun(user_id, query, use_planner, remember)
 
-# Multi-agent orchestrator (LightSwarm)
+    async def arun_stream(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True):
+        """Async run_stream(): events are yielded as soon as each tool, chunk or step completes.
+
+        Closing the generator cancels the run."""
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def work():
+            with self.tracer.span('agent.run', self.name):
+                return await self._arun(user_id, query, use_planner, remember, emit=events.put_nowait)
+        task = asyncio.ensure_future(work())
+        task.add_done_callback(lambda _: events.put_nowait(_END))
+        try:
+            while True:
+                ev = await events.get()
+                if ev is _END:
+                    break
+                yield ev
+            yield {'event': 'result', 'result': task.result()}
+        finally:
+            task.cancel()
+
+    async def _arun(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True,
+                    emit: Optional[Callable[[dict], None]] = None):
+        entry = {'user': user_id, 'query': query, 'time': time.time()}
+        self.history.append(entry)
+        loop = asyncio.get_running_loop()
+        try:
+            if remember:
+                await loop.run_in_executor(self.executor, self.memory.add, user_id, query)
+        except Exception as e:
+            print('Memory add failed:', e)
+        nodes, tools = self._plan(query, use_planner)
+        if emit:
+            emit(self._plan_event(nodes))
+        by_id = {n.id: n for n in nodes}
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_node(n: PlanNode, inputs: Dict[int, Any]):
+            return self._step_done(emit, n, await self.run_step_async(n.step, sem, tools[n.id], self._context(n, by_id, inputs), emit))
+        dag = await arun_dag(nodes, run_node)
+        return self._collect(nodes, dag, entry)
+
+    async def arun_batch(self, items: List[Tuple[str, str]], use_planner: bool = True):
+        """Run (user_id, query) pairs together; returns one arun()-shaped result per item."""
+        with self.tracer.span('agent.run_batch', self.name, size=len(items)):
+            return await self._arun_batch(items, use_planner)
+
+    async def _arun_batch(self, items: List[Tuple[str, str]], use_planner: bool = True):
+        # identical queries run once, every distinct step across the batch is scored in
+        # one select pass, and identical context-free tool calls share a single task
+        entries = [{'user': u, 'query': q, 'time': time.time()} for u, q in items]
+        self.history.extend(entries)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, lambda: [self.memory.add(u, q) for u, q in items])
+        except Exception as e:
+            print('Memory add failed:', e)
+        queries = list(dict.fromkeys(q for _, q in items))
+        with self.tracer.span('plan', steps=len(queries)):
+            graphs = {q: Planner.plan_graph(q) if use_planner else [PlanNode(0, q)] for q in queries}
+        steps = list(dict.fromkeys(n.step for nodes in graphs.values() for n in nodes))
+        with self.tracer.span('select_tools', steps=len(steps)):
+            selected = dict(zip(steps, self.select_tools_many(steps)))
+        sem = asyncio.Semaphore(self.max_concurrency)
+        shared: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        def call(t: Tool, step: str, context: Optional[List[dict]]):
+            if context:
+                return self._run_tool_async(t, step, sem, context)
+            task = shared.get((t.name, step))
+            if task is None:
+                task = shared[(t.name, step)] = asyncio.ensure_future(self._run_tool_async(t, step, sem))
+            return task
+
+        async def run_query(q: str) -> DagResult:
+            by_id = {n.id: n for n in graphs[q]}
+            return await arun_dag(graphs[q], lambda n, inputs: asyncio.gather(
+                *(call(t, n.step, self._context(n, by_id, inputs)) for t in selected[n.step])))
+        try:
+            dags = dict(zip(queries, await asyncio.gather(*map(run_query, queries))))
+        finally:
+            for task in shared.values():
+                task.cancel()
+        for q, dag in dags.items():
+            for nid, outs in dag.results.items():
+                dag.results[nid] = list(outs)
+        return [self._collect(graphs[q], dags[q], e) for (_, q), e in zip(items, entries)]
+
+# Multi-agent orchestrator (LightSwarm). Agents share one tool result cache and,
+# when `memory` is given, one Memory that stores each query once per swarm call.
+# A query goes to a named agent or is routed to the agent whose capabilities
+# (tool names and descriptions unless given) best match it; broadcast() runs it on
+# several agents at once and returns after all, the first, or a quorum of them;
+# hedge() starts a backup agent if the primary hasn't answered after `hedge_after`
+# seconds and keeps whichever answers first. Agents can also be HostedAgents
+# (synapseflow.swarm_process) running in their own worker processes.
 class LightSwarm:
-    def __init__(self):
-        self.agents: Dict[str, Agent] = {}
+    DEFAULT_USER = 'swarm_user'
+
+    def __init__(self, tool_cache: Optional[ToolCache] = None, memory: Optional[Memory] = None,
+                 hedge_after: float = 0.5, tracer: Optional[Tracer] = None):
+        self.agents: Dict[str, Any] = {}
+        self.tool_cache = tool_cache or ToolCache()
+        self.memory = memory
+        self.hedge_after = hedge_after
+        self.tracer = tracer or get_tracer()
+        self.capabilities = ToolIndex()
 
-    def register_agent(self, agent: Agent):
+    def register_agent(self, agent: Any, capabilities: Optional[str] = None):
+        # in-process agents read and fill the swarm's tool cache (and memory); hosted ones keep their own
+        if isinstance(agent, Agent):
+            agent.tool_cache = self.tool_cache
+            if self.memory is not None:
+                agent.memory = self.memory
         self.agents[agent.name] = agent
+        self.capabilities.add(agent.name, agent.describe() if capabilities is None else capabilities)
+
+    def unregister_agent(self, name: str):
+        self.agents.pop(name, None)
+        self.capabilities.remove(name)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.tool_cache.stats()
+
+    def route(self, query: str, top_n: int = 1) -> List[str]:
+        """Best-matching agent names for the query (registration order when nothing matches)."""
+        names = [n for n in self.capabilities.select(query, top_n) if n in self.agents]
+        return names or list(self.agents)[:top_n]
 
-    def run(self, agent_name: str, query: str):
-        agent = self.agents.get(agent_name)
+    def run(self, agent_name: Optional[str], query: str, user_id: str = DEFAULT_USER):
+        # agent_name=None routes by capability
+        agent = self.agents.get(agent_name or next(iter(self.route(query)), ''))
         if not agent:
             return {'error': 'agent not found'}
-        return agent.run('swarm_user', query)
+        return agent.run(user_id, query)
+
+    async def arun(self, agent_name: Optional[str], query: str, user_id: str = DEFAULT_USER):
+        agent = self.agents.get(agent_name or next(iter(self.route(query)), ''))
+        if not agent:
+            return {'error': 'agent not found'}
+        return await agent.arun(user_id, query, remember=await self._remember(user_id, query))
+
+    async def _remember(self, user_id: str, query: str) -> bool:
+        # with shared memory the swarm stores the query once and tells the agents not to
+        if self.memory is None:
+            return True
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.memory.add, user_id, query)
+        except Exception as e:
+            print('Memory add failed:', e)
+        return False
+
+    async def broadcast(self, query: str, user_id: str = DEFAULT_USER, agents: Optional[List[str]] = None,
+                        mode: str = 'all', quorum: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Run on several agents concurrently; mode 'all', 'first' or 'quorum' (default: a majority)."""
+        names = [n for n in (agents or list(self.agents)) if n in self.agents]
+        need = {'all': len(names), 'first': 1, 'quorum': quorum or len(names) // 2 + 1}[mode]
+        remember = await self._remember(user_id, query)
+        tasks = {asyncio.ensure_future(self.agents[n].arun(user_id, query, remember=remember)): n for n in names}
+        results, errors, pending = {}, {}, set(tasks)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.tracer.span('swarm.broadcast', mode, agents=len(names)):
+            try:
+                while pending and len(results) < need:
+                    left = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        break
+                    for t in done:
+                        if t.cancelled():
+                            errors[tasks[t]] = 'cancelled'
+                            continue
+                        exc = t.exception()
+                        if exc is not None:
+                            errors[tasks[t]] = f'{type(exc).__name__}: {exc}'
+                        else:
+                            results[tasks[t]] = t.result()
+            finally:
+                for t in pending:
+                    t.cancel()  # first/quorum reached or timed out: stop the rest
+        return {'mode': mode, 'results': results, 'errors': errors, 'complete': len(results) >= need}
+
+    async def hedge(self, query: str, user_id: str = DEFAULT_USER, primary: Optional[str] = None,
+                    backup: Optional[str] = None, after: Optional[float] = None) -> Dict[str, Any]:
+        """Run on primary; if it is slower than `after` seconds (or fails) also run backup, first answer wins."""
+        primary = primary or next(iter(self.route(query)), None)
+        if primary not in self.agents:
+            return {'error': 'agent not found'}
+        backup = backup or next((n for n in self.route(query, top_n=len(self.agents)) + list(self.agents) if n != primary), None)
+        after = self.hedge_after if after is None else after
+        remember = await self._remember(user_id, query)
+        first = asyncio.ensure_future(self.agents[primary].arun(user_id, query, remember=remember))
+        tasks, pending = {first: primary}, {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=after)
+            if backup is None or (done and not first.cancelled() and first.exception() is None):
+                return {'agent': primary, 'result': await first, 'hedged': False}
+            self.tracer.count('swarm.hedged', primary)
+            second = asyncio.ensure_future(self.agents[backup].arun(user_id, query, remember=False))
+            tasks[second] = backup
+            pending = {second} if done else {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if not t.cancelled() and t.exception() is None:
+                        return {'agent': tasks[t], 'result': t.result(), 'hedged': True}
+            if first.cancelled():
+                raise RuntimeError(f'agent {primary!r} was cancelled')
+            raise first.exception()
+        finally:
+            # also reached when the caller is cancelled mid-wait
+            for t in tasks:
+                t.cancel()
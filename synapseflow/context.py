@@ -0,0 +1,196 @@
+import os, re, time, hashlib, functools, threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding('cl100k_base') if tiktoken is not None else None
+    except Exception:
+        return None  # encoding files not available offline
+
+@functools.lru_cache(maxsize=16384)
+def count_tokens(text: str) -> int:
+    """Token count: tiktoken's cl100k when installed, else words/punctuation with ~4 chars per token."""
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return sum(1 + (len(tok) - 1) // 4 for tok in _TOKEN_RE.findall(text))
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most max_tokens (by the same count as count_tokens), marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoding()
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:max(0, max_tokens - 1)]) + '…'
+    used, end = 0, 0
+    for m in _TOKEN_RE.finditer(text):
+        used += 1 + (len(m.group()) - 1) // 4
+        if used > max_tokens - 1:
+            break
+        end = m.end()
+    return text[:end] + '…'
+
+def extractive_summary(texts: List[str], max_tokens: int) -> str:
+    # no-LLM default: the first sentence of each item, in the order given (recall rank), until the budget is spent
+    out, used = [], 0
+    for text in texts:
+        first = truncate(_SENTENCE_RE.split(text.strip(), 1)[0], max(8, max_tokens // max(1, len(texts))))
+        cost = count_tokens(first) + 1
+        if used + cost > max_tokens:
+            break
+        out.append(first)
+        used += cost
+    return '; '.join(out)
+
+def llm_summarizer(model: Optional[str] = None) -> Callable[[List[str], int], str]:
+    """Summarizer for ContextBuilder that asks the chat model (responses go through its cache)."""
+    def summarize(texts: List[str], max_tokens: int) -> str:
+        from .openai_integration import chat_completion
+        prompt = ('Summarize these notes about the user in at most %d tokens, keeping names, numbers and decisions:\n- '
+                  % max_tokens) + '\n- '.join(texts)
+        return chat_completion(prompt, model=model, max_tokens=max_tokens, temperature=0.0)['text'].strip()
+    return summarize
+
+class ContextItem:
+    __slots__ = ('kind', 'text', 'tokens')
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+        self.tokens = count_tokens(text)
+
+def run_items(results: List[Dict[str, Any]]) -> List[ContextItem]:
+    """Tool outputs of an Agent.run / arun result as context items, in plan order."""
+    items = []
+    for step in results or []:
+        for r in step.get('results', []):
+            items.append(ContextItem('tool', f"{step['step']} -> {r['tool']}: {r['output']}"))
+    return items
+
+# Builds the context block sent with an LLM call. Items are this turn's tool
+# outputs (Agent.run results) followed by top_k recall from the memory
+# (Memory.query or EmbeddingMemory.query), each cut to item_tokens. They are
+# packed in that order while they fit in `budget` tokens; what doesn't fit is
+# summarized into one "Earlier context" line placed first, so the block starts
+# with the part that changes least between turns. Finished blocks are cached
+# per user, keyed by the items' content, and summaries by their input, so a
+# repeated or unchanged turn reuses prior work instead of re-counting and
+# re-summarizing.
+class ContextBuilder:
+    def __init__(self, memory: Any = None, budget: Optional[int] = None, top_k: int = 5, item_tokens: int = 200,
+                 summary_tokens: Optional[int] = None, summarize: Optional[Callable[[List[str], int], str]] = None,
+                 cache_size: int = 1024, cache_ttl: float = 300.0):
+        self.memory = memory
+        self.budget = budget if budget is not None else int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+        self.top_k = top_k
+        self.item_tokens = item_tokens
+        self.summary_tokens = summary_tokens if summary_tokens is not None else max(32, self.budget // 5)
+        self.summarize = summarize or extractive_summary
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._prefixes: 'OrderedDict[Tuple[str, str], Tuple[float, str]]' = OrderedDict()
+        self._summaries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {'builds': 0, 'prefix_hits': 0, 'summaries': 0, 'summary_hits': 0, 'dropped': 0}
+
+    def recall(self, user_id: str, prompt: str) -> List[ContextItem]:
+        if self.memory is None:
+            return []
+        try:
+            hits = self.memory.query(user_id, prompt, self.top_k)
+        except Exception as e:
+            print('Context recall failed:', e)
+            return []
+        return [ContextItem('memory', h.get('text', '')) for h in hits if h.get('text') and h.get('text') != prompt]
+
+    def build(self, user_id: str, prompt: str, results: Optional[List[Dict[str, Any]]] = None,
+              budget: Optional[int] = None) -> str:
+        """Context block for `prompt`: results are an Agent.run output; '' when there is nothing to add."""
+        budget = (self.budget if budget is None else budget) - count_tokens(prompt)
+        items = run_items(results) + self.recall(user_id, prompt)
+        if not items or budget <= 0:
+            return ''
+        key = (user_id, hashlib.sha1('\x00'.join(f'{i.kind}:{i.text}' for i in items).encode('utf-8') + str(budget).encode()).hexdigest())
+        now = time.monotonic()
+        with self._lock:
+            self.metrics['builds'] += 1
+            hit = self._prefixes.get(key)
+            if hit is not None and hit[0] > now:
+                self._prefixes.move_to_end(key)
+                self.metrics['prefix_hits'] += 1
+                return hit[1]
+        text = self._pack(items, budget)
+        with self._lock:
+            self._prefixes[key] = (now + self.cache_ttl, text)
+            self._prefixes.move_to_end(key)
+            while len(self._prefixes) > self.cache_size:
+                self._prefixes.popitem(last=False)
+        return text
+
+    def _pack(self, items: List[ContextItem], budget: int) -> str:
+        kept, rest, used = [], [], 0
+        for item in items:
+            text = truncate(item.text, self.item_tokens) if item.tokens > self.item_tokens else item.text
+            cost = (count_tokens(text) if text is not item.text else item.tokens) + 2
+            if not rest and used + cost <= budget - (self.summary_tokens if len(items) > len(kept) + 1 else 0):
+                kept.append((item.kind, text))
+                used += cost
+            else:
+                rest.append(item.text)
+        lines = []
+        if rest:
+            summary = self._summary(rest, min(self.summary_tokens, budget - used - 4))
+            if summary:
+                lines.append('Earlier context: ' + summary)
+            else:
+                with self._lock:
+                    self.metrics['dropped'] += len(rest)
+        tools = [t for k, t in kept if k == 'tool']
+        notes = [t for k, t in kept if k != 'tool']
+        if notes:
+            lines.append('Relevant memory:\n' + '\n'.join('- ' + t for t in notes))
+        if tools:
+            lines.append('Tool results:\n' + '\n'.join('- ' + t for t in tools))
+        return '\n'.join(lines)
+
+    def _summary(self, texts: List[str], max_tokens: int) -> str:
+        if max_tokens < 8:
+            return ''
+        key = hashlib.sha1(('\x00'.join(texts) + f'\x00{max_tokens}').encode('utf-8')).hexdigest()
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                self.metrics['summary_hits'] += 1
+                return self._summaries[key]
+        try:
+            summary = truncate(self.summarize(texts, max_tokens), max_tokens)
+        except Exception as e:
+            print('Context summarization failed, using extractive summary:', e)
+            summary = extractive_summary(texts, max_tokens)
+        with self._lock:
+            self.metrics['summaries'] += 1
+            self._summaries[key] = summary
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            if user_id is None:
+                self._prefixes.clear()
+            else:
+                for key in [k for k in self._prefixes if k[0] == user_id]:
+                    del self._prefixes[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.metrics, cached_prefixes=len(self._prefixes), cached_summaries=len(self._summaries))
@@ -0,0 +1,177 @@
+import time, hashlib, sqlite3, threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+from .tracing import get_tracer
+
+# provider(texts) -> one vector per text, in order
+EmbeddingProvider = Callable[[List[str]], List[List[float]]]
+
+# Embedding cache on disk: sqlite table of content hash -> float32 blob
+class DiskEmbeddingCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute('SELECT vec FROM embeddings WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        vec = array('f')
+        vec.frombytes(row[0])
+        return vec.tolist()
+
+    def put_many(self, items: Dict[str, List[float]]):
+        rows = [(k, array('f', v).tobytes()) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)', rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Batching embedding service.
+# embed() calls issued concurrently are coalesced into one provider call per
+# batch_window (or max_batch texts), identical in-flight texts share a future,
+# and results are cached by content hash in an LRU plus an optional disk tier.
+class EmbeddingService:
+    def __init__(self, provider: EmbeddingProvider, model: str = 'default', max_batch: int = 64,
+                 batch_window: float = 0.005, cache_size: int = 4096, cache_path: Optional[str] = None):
+        self.provider = provider
+        self.model = model
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        self.disk = DiskEmbeddingCache(cache_path) if cache_path else None
+        self._lru: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._pending: List[tuple] = []
+        self._inflight: Dict[str, Future] = {}
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self.metrics = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'batches': 0, 'batched_texts': 0, 'errors': 0}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256((self.model + '\0' + text).encode('utf-8')).hexdigest()
+
+    def _cached(self, key: str) -> Optional[List[float]]:
+        # caller holds self._cond
+        vec = self._lru.get(key)
+        if vec is not None:
+            self._lru.move_to_end(key)
+            self.metrics['hits'] += 1
+            return vec
+        if self.disk is not None:
+            vec = self.disk.get(key)
+            if vec is not None:
+                self.metrics['disk_hits'] += 1
+                self._remember(key, vec)
+                return vec
+        return None
+
+    def _remember(self, key: str, vec: List[float]):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
+
+    def submit(self, text: str) -> Future:
+        key = self.key(text)
+        with self._cond:
+            vec = self._cached(key)
+            if vec is not None:
+                fut = Future()
+                fut.set_result(vec)
+                return fut
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.metrics['coalesced'] += 1
+                return fut
+            if self._closed:
+                raise RuntimeError('EmbeddingService is closed')
+            self.metrics['misses'] += 1
+            fut = Future()
+            self._inflight[key] = fut
+            self._pending.append((key, text, fut))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop, name='embedding-batcher', daemon=True)
+                self._worker.start()
+            self._cond.notify()
+            return fut
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        return self.submit(text).result(timeout)
+
+    def embed_many(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        futs = [self.submit(t) for t in texts]
+        return [f.result(timeout) for f in futs]
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                # give concurrent callers a short window to join this batch
+                deadline = time.monotonic() + self.batch_window
+                while len(self._pending) < self.max_batch and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[tuple]):
+        try:
+            with get_tracer().span('embedding', self.model, batch=len(batch)):
+                vecs = self.provider([text for _, text, _ in batch])
+            if len(vecs) != len(batch):
+                raise RuntimeError(f'provider returned {len(vecs)} embeddings for {len(batch)} texts')
+        except Exception as e:
+            with self._cond:
+                self.metrics['errors'] += 1
+                for key, _, fut in batch:
+                    self._inflight.pop(key, None)
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        results = {key: list(vec) for (key, _, _), vec in zip(batch, vecs)}
+        if self.disk is not None:
+            try:
+                self.disk.put_many(results)
+            except Exception as e:
+                print('Embedding disk cache write failed:', e)
+        with self._cond:
+            self.metrics['batches'] += 1
+            self.metrics['batched_texts'] += len(batch)
+            for key, vec in results.items():
+                self._remember(key, vec)
+                self._inflight.pop(key, None)
+        for key, _, fut in batch:
+            fut.set_result(results[key])
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            out = dict(self.metrics)
+            out['cache_entries'] = len(self._lru)
+        lookups = out['hits'] + out['disk_hits'] + out['misses'] + out['coalesced']
+        out['hit_rate'] = (out['hits'] + out['disk_hits'] + out['coalesced']) / lookups if lookups else 0.0
+        return out
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+        if self.disk is not None:
+            self.disk.close()
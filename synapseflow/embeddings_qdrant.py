@@ -1,24 +1,41 @@
-from .openai_integration import get_embedding
+from .openai_integration import get_embedding, get_embeddings
 from .qdrant_adapter import QdrantAdapter
-from typing import List
+from typing import Callable, List
 
 class EmbeddingMemory:
-    def __init__(self, qdrant_url: str = None):
-        # Initialize adapter; will raise if qdrant-client not installed
-        self.adapter = QdrantAdapter(url=qdrant_url) if (qdrant_url or True) else None
+    def __init__(self, qdrant_url: str = None, adapter=None, embed: Callable[[List[str]], List[list]] = None):
+        # reuse the caller's adapter (and its pooled client) when given; a new one raises if qdrant-client is missing
+        self.adapter = adapter if adapter is not None else QdrantAdapter(url=qdrant_url)
+        # embed(texts) -> vectors overrides the shared embedding service, e.g. LocalVectorIndex.embed
+        self.embed_many = embed or get_embeddings
+        self.embed_one = (lambda text: embed([text])[0]) if embed else get_embedding
 
     def upsert_text(self, user_id: str, text: str, meta: dict = None):
         emb = None
         try:
-            emb = get_embedding(text)
+            emb = self.embed_one(text)
         except Exception as e:
             print('Embedding failed, upserting without vector:', e)
         self.adapter.upsert(user_id, text, meta or {}, vector=emb)
 
-    def query(self, user_id: str, query_text: str, top_k: int = 5):
+    def upsert_texts(self, user_id: str, texts: List[str], metas: List[dict] = None):
+        # one embeddings call + batched Qdrant upserts for the whole list
+        metas = metas or [{} for _ in texts]
         try:
-            qemb = get_embedding(query_text)
+            embs = self.embed_many(texts)
+        except Exception as e:
+            print('Embedding failed, upserting without vectors:', e)
+            embs = [None] * len(texts)
+        return self.adapter.upsert_many([{'user_id': user_id, 'text': t, 'meta': m or {}, 'vector': v}
+                                         for t, m, v in zip(texts, metas, embs)])
+
+    def query(self, user_id: str, query_text: str, top_k: int = 5, fallback: bool = True):
+        # fallback=False lets embedding errors propagate instead of returning an unranked payload scroll
+        try:
+            qemb = self.embed_one(query_text)
             return self.adapter.query(user_id, query_text, top_k=top_k, vector=qemb)
         except Exception as e:
+            if not fallback:
+                raise
             print('Embedding query failed, falling back to payload search:', e)
             return self.adapter.query(user_id, query_text, top_k=top_k, vector=None)
@@ -0,0 +1,99 @@
+import time, threading
+from concurrent.futures import Executor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+# search(user_id, query, top_k) -> ranked result dicts with at least 'text'
+Searcher = Callable[[str, str, int], List[Dict[str, Any]]]
+
+def _key(hit: Dict[str, Any]) -> str:
+    # the same memory comes back from both sides with different ids; dedupe on its text
+    return ' '.join(str(hit.get('text', '')).split()).casefold()
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[Dict[str, Any]]], k: int = 60,
+                           weights: Optional[Dict[str, float]] = None, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Fuse ranked lists by sum(weight / (k + rank)); duplicates merge and record every source."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for source, hits in ranked.items():
+        w = (weights or {}).get(source, 1.0)
+        seen = set()
+        for rank, hit in enumerate(hits):
+            key = _key(hit)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            cur = fused.get(key)
+            if cur is None:
+                cur = fused[key] = {'t': hit.get('t'), 'text': hit.get('text', ''), 'meta': hit.get('meta') or {},
+                                    'score': 0.0, 'sources': []}
+            elif cur['t'] is None and hit.get('t') is not None:
+                cur['t'], cur['meta'] = hit['t'], hit.get('meta') or cur['meta']
+            cur['score'] += w / (k + rank + 1)
+            cur['sources'].append(source)
+    out = sorted(fused.values(), key=lambda h: -h['score'])
+    return out[:top_k] if top_k is not None else out
+
+def vector_hits(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Qdrant results ({'id', 'score', 'text', 'payload'}) in Memory's record shape
+    out = []
+    for r in results:
+        meta = (r.get('payload') or {}).get('meta') or {}
+        out.append({'t': meta.get('t'), 'text': r.get('text', ''), 'meta': meta})
+    return out
+
+# Keyword + vector recall. The vector search is started on a worker thread, the
+# (local, fast) keyword search runs on the calling thread, and the vector side
+# gets whatever is left of `budget` seconds; if it misses the budget or fails the
+# query returns keyword results alone instead of waiting.
+class HybridRecall:
+    def __init__(self, keyword: Searcher, vector: Searcher, budget: float = 0.15, k: int = 60,
+                 weights: Optional[Dict[str, float]] = None, fanout: int = 2, executor: Optional[Executor] = None):
+        self.keyword = keyword
+        self.vector = vector
+        self.budget = budget
+        self.k = k
+        self.weights = weights
+        self.fanout = fanout  # candidates fetched per side = fanout * top_k
+        self._executor = executor
+        self._lock = threading.Lock()
+        self.metrics = {'queries': 0, 'vector_timeouts': 0, 'vector_errors': 0, 'fused': 0}
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hybrid-recall')
+        return self._executor
+
+    def _count(self, key: str):
+        with self._lock:
+            self.metrics[key] += 1
+
+    def search(self, user_id: str, q: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + self.budget
+        n = max(top_k, self.fanout * top_k)
+        fut = self.executor.submit(self.vector, user_id, q, n)
+        self._count('queries')
+        local = self.keyword(user_id, q, n)
+        try:
+            remote = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            fut.cancel()  # still queued: skip it; already running: its result is dropped
+            self._count('vector_timeouts')
+            return local[:top_k]
+        except Exception as e:
+            self._count('vector_errors')
+            print('Vector recall failed, using keyword results:', e)
+            return local[:top_k]
+        if not remote:
+            return local[:top_k]
+        self._count('fused')
+        return reciprocal_rank_fusion({'keyword': local, 'vector': remote}, self.k, self.weights, top_k)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.metrics)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,278 @@
+import os, re, json, uuid, hashlib, threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_WORD_RE = re.compile(r'\w+')
+
+def hash_embed(texts: List[str], model: str = 'local', dim: int = 384) -> List[List[float]]:
+    """Offline embedding: signed feature hashing of word unigrams and bigrams, L2-normalized.
+
+    Has the provider signature of set_embedding_provider (EMBEDDING_PROVIDER=local)."""
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        words = _WORD_RE.findall(text.lower())
+        for feat in words + [a + ' ' + b for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feat.encode(), digest_size=8).digest(), 'little')
+            out[i, h % dim] += 1.0 if h >> 63 else -1.0
+    out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+    return out.tolist()
+
+# In-process vector store with the QdrantAdapter surface (upsert, upsert_many,
+# query, search_by_vector, flush, close), for running semantic memory without
+# Qdrant or network access. Vectors live in a memory-mapped float32/float16
+# matrix (`path`.vec), records in an append-only JSON-lines log (`path`.log).
+# Rows are handed out in fixed blocks of `block_rows`, each owned by one user,
+# so a user's vectors are a few contiguous row ranges scored with one matrix
+# product per range; the top k come from argpartition. With ivf_lists > 0 the
+# rows are also clustered (spherical k-means) once the collection reaches
+# ivf_min_rows, and searches only score the `nprobe` nearest clusters.
+class LocalVectorIndex:
+    def __init__(self, path: str = 'vectors', dim: Optional[int] = None, dtype: str = 'float32', block_rows: int = 64,
+                 embed: Optional[Callable[[List[str]], List[List[float]]]] = None, ivf_lists: int = 0, nprobe: int = 8,
+                 ivf_min_rows: Optional[int] = None):
+        if np is None:
+            raise RuntimeError('numpy not installed. pip install numpy')
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        self.embed = embed if embed is not None else (lambda texts: hash_embed(texts, dim=self.dim or 384))
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows or max(1024, 16 * ivf_lists)
+        self._lock = threading.RLock()
+        self._mat = None
+        self._capacity = 0
+        self._records: Dict[int, Dict[str, Any]] = {}     # row -> record
+        self._blocks: Dict[str, List[int]] = {}           # user -> owned block numbers
+        self._fill: Dict[int, int] = {}                   # block -> rows used
+        self._next_block = 0
+        self._centroids = None
+        self._assign = None                               # row -> IVF list
+        self._load()
+
+    # --- storage -----------------------------------------------------------
+
+    def _load(self):
+        if not os.path.exists(self.path + '.log'):
+            return
+        with open(self.path + '.log', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line
+                if 'header' in rec:
+                    self.dim = rec['header']['dim']
+                    self.dtype = np.dtype(rec['header']['dtype'])
+                    self.block_rows = rec['header']['block_rows']
+                    continue
+                self._remember(rec)
+        if self.dim and os.path.exists(self.path + '.vec'):
+            self._capacity = os.path.getsize(self.path + '.vec') // (self.dim * self.dtype.itemsize)
+            self._mat = np.memmap(self.path + '.vec', dtype=self.dtype, mode='r+', shape=(self._capacity, self.dim))
+        if self.ivf_lists and os.path.exists(self.path + '.ivf.npy'):
+            self._centroids = np.load(self.path + '.ivf.npy')
+            self._assign_all()
+
+    def _remember(self, rec: Dict[str, Any]):
+        row = rec['row']
+        self._records[row] = rec
+        block, offset = divmod(row, self.block_rows)
+        if block not in self._fill:
+            self._blocks.setdefault(rec['user_id'], []).append(block)
+        self._fill[block] = max(self._fill.get(block, 0), offset + 1)
+        self._next_block = max(self._next_block, block + 1)
+
+    def _ensure_rows(self, rows: int):
+        if rows <= self._capacity:
+            return
+        cap = max(rows, 2 * self._capacity, 4 * self.block_rows)
+        vec = self.path + '.vec'
+        with open(vec, 'ab') as f:
+            f.truncate(cap * self.dim * self.dtype.itemsize)  # sparse: unused block rows take no disk
+        if self._mat is not None:
+            self._mat.flush()
+        self._mat = np.memmap(vec, dtype=self.dtype, mode='r+', shape=(cap, self.dim))
+        if self._assign is not None:
+            self._assign = np.concatenate([self._assign, np.full(cap - self._capacity, -1, dtype=np.int32)])
+        self._capacity = cap
+
+    def _allocate(self, user_id: str) -> int:
+        blocks = self._blocks.get(user_id)
+        if blocks and self._fill[blocks[-1]] < self.block_rows:
+            block = blocks[-1]
+        else:
+            block = self._next_block
+            self._next_block += 1
+            self._fill[block] = 0
+            self._blocks.setdefault(user_id, []).append(block)
+            self._ensure_rows(self._next_block * self.block_rows)
+        row = block * self.block_rows + self._fill[block]
+        self._fill[block] += 1
+        return row
+
+    @staticmethod
+    def _normalize(vecs):
+        vecs = np.asarray(vecs, dtype=np.float32)
+        return vecs / np.maximum(np.linalg.norm(vecs, axis=-1, keepdims=True), 1e-12)
+
+    # --- adapter interface -------------------------------------------------------
+
+    def upsert_many(self, records: List[Dict[str, Any]]) -> int:
+        """Store records ({'user_id', 'text', 'meta', 'vector'}); missing vectors come from `embed`."""
+        if not records:
+            return 0
+        missing = [i for i, r in enumerate(records) if r.get('vector') is None]
+        vectors = [r.get('vector') for r in records]
+        if missing:
+            for i, v in zip(missing, self.embed([records[i]['text'] for i in missing])):
+                vectors[i] = v
+        vecs = self._normalize(vectors)
+        with self._lock:
+            new_file = self.dim is None or not os.path.exists(self.path + '.log')
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f'vector size {vecs.shape[1]} does not match index dimension {self.dim}')
+            lines = []
+            if new_file:
+                lines.append(json.dumps({'header': {'dim': self.dim, 'dtype': self.dtype.name, 'block_rows': self.block_rows}}))
+            added = []
+            for rec, vec in zip(records, vecs):
+                row = self._allocate(rec['user_id'])
+                self._mat[row] = vec  # vector first: a log line never points at an unwritten row
+                added.append({'id': str(uuid.uuid4()), 'user_id': rec['user_id'], 'text': rec['text'],
+                              'meta': rec.get('meta') or {}, 'row': row})
+            lines.extend(json.dumps(r) for r in added)
+            with open(self.path + '.log', 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            for r in added:
+                self._remember(r)
+            if self._centroids is not None:
+                rows = np.array([r['row'] for r in added])
+                self._assign[rows] = np.argmax(vecs @ self._centroids.T, axis=1)
+            elif self.ivf_lists and len(self._records) >= self.ivf_min_rows:
+                self.train_ivf()
+        return len(added)
+
+    def upsert(self, user_id: str, text: str, meta: Optional[Dict[str, Any]] = None, vector: Optional[List[float]] = None):
+        try:
+            self.upsert_many([{'user_id': user_id, 'text': text, 'meta': meta or {}, 'vector': vector}])
+        except Exception as e:
+            print('Local vector upsert failed:', e)
+
+    def _ranges(self, user_id: Optional[str]) -> List[Tuple[int, int]]:
+        # (start, end) row ranges to scan; adjacent blocks merge into one matrix product
+        blocks = sorted(self._blocks.get(user_id, ()) if user_id is not None else self._fill)
+        out: List[List[int]] = []
+        for b in blocks:
+            start, end = b * self.block_rows, b * self.block_rows + self._fill[b]
+            if out and out[-1][1] == start:
+                out[-1][1] = end
+            else:
+                out.append([start, end])
+        return [tuple(r) for r in out]
+
+    def search_many(self, vectors: List[List[float]], top_k: int = 5, user_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """Top-k hits for each query vector, all queries scored in the same matrix products."""
+        if self._mat is None or not len(vectors):
+            return [[] for _ in vectors]
+        q = self._normalize(vectors)
+        with self._lock:
+            mat, ranges, assign = self._mat, self._ranges(user_id), self._assign
+            probes = None
+            if self._centroids is not None:
+                near = np.argsort(-(q @ self._centroids.T), axis=1)[:, :self.nprobe]
+                probes = np.unique(near)
+        scores, rows = [], []
+        for start, end in ranges:
+            if probes is None:
+                block = mat[start:end]
+                idx = np.arange(start, end)
+            else:
+                idx = start + np.nonzero(np.isin(assign[start:end], probes))[0]
+                if not len(idx):
+                    continue
+                block = mat[idx]
+            scores.append(q @ np.asarray(block, dtype=np.float32).T)
+            rows.append(idx)
+        if not rows:
+            return [[] for _ in vectors]
+        scores, rows = np.concatenate(scores, axis=1), np.concatenate(rows)
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for qi, cand in enumerate(top):
+            cand = cand[np.argsort(-scores[qi, cand])]
+            hits = []
+            for c in cand:
+                rec = self._records.get(int(rows[c]))
+                if rec is None:
+                    continue  # allocated by a write that failed before logging
+                hits.append({'id': rec['id'], 'score': float(scores[qi, c]), 'text': rec['text'],
+                             'payload': {'user_id': rec['user_id'], 'text': rec['text'], 'meta': rec['meta']}})
+            out.append(hits)
+        return out
+
+    def search_by_vector(self, vector: List[float], top_k: int = 5, user_id: Optional[str] = None):
+        return self.search_many([vector], top_k, user_id)[0]
+
+    def query(self, user_id: str, query: str, top_k: int = 5, vector: Optional[List[float]] = None):
+        # vector search scoped to the user; with vector=None the query is embedded locally
+        try:
+            if vector is None:
+                vector = self.embed([query])[0]
+            return self.search_by_vector(vector, top_k, user_id=user_id)
+        except Exception as e:
+            print('Local vector query failed:', e)
+            return []
+
+    # --- IVF -------------------------------------------------------------------------
+
+    def train_ivf(self, lists: Optional[int] = None, iters: int = 10, sample: int = 20000, seed: int = 0):
+        """(Re)cluster the stored vectors into `lists` IVF lists with spherical k-means."""
+        with self._lock:
+            lists = lists or self.ivf_lists
+            rows = np.concatenate([np.arange(s, e) for s, e in self._ranges(None)] or [np.zeros(0, dtype=np.int64)])
+            if len(rows) < lists:
+                return
+            rng = np.random.default_rng(seed)
+            data = np.asarray(self._mat[np.sort(rng.choice(rows, min(sample, len(rows)), replace=False))], dtype=np.float32)
+            cent = data[rng.choice(len(data), lists, replace=False)].copy()
+            for _ in range(iters):
+                labels = np.argmax(data @ cent.T, axis=1)
+                for j in range(lists):
+                    members = data[labels == j]
+                    if len(members):
+                        cent[j] = members.sum(axis=0)
+                cent = self._normalize(cent)
+            self.ivf_lists = lists
+            self._centroids = cent
+            np.save(self.path + '.ivf.npy', cent)
+            self._assign_all()
+
+    def _assign_all(self, chunk: int = 65536):
+        self._assign = np.full(self._capacity, -1, dtype=np.int32)
+        for s, e in self._ranges(None):
+            for i in range(s, e, chunk):
+                j = min(i + chunk, e)
+                self._assign[i:j] = np.argmax(np.asarray(self._mat[i:j], dtype=np.float32) @ self._centroids.T, axis=1)
+
+    # --- lifecycle ---------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        return {'rows': len(self._records), 'users': len(self._blocks), 'blocks': self._next_block,
+                'capacity': self._capacity, 'dim': self.dim, 'dtype': self.dtype.name,
+                'ivf_lists': len(self._centroids) if self._centroids is not None else 0}
+
+    def flush(self):
+        with self._lock:
+            if self._mat is not None:
+                self._mat.flush()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,104 @@
+import re, math, time, heapq
+from typing import Dict, List, Optional
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+# Compact in-memory record: no per-instance __dict__, and empty meta is stored as None
+class Record:
+    __slots__ = ('t', 'text', 'meta', 'doc_id')
+
+    def __init__(self, t: float, text: str, meta: Optional[dict] = None):
+        self.t = t
+        self.text = text
+        self.meta = meta or None
+        self.doc_id = -1
+
+    @classmethod
+    def of(cls, rec) -> 'Record':
+        if isinstance(rec, Record):
+            return rec
+        return cls(rec.get('t', time.time()), rec.get('text', ''), rec.get('meta'))
+
+    def to_dict(self) -> dict:
+        return {'t': self.t, 'text': self.text, 'meta': self.meta or {}}
+
+def as_dict(rec) -> dict:
+    return rec.to_dict() if isinstance(rec, Record) else rec
+
+# Incrementally maintained inverted index over one user's records.
+# Scores are BM25 over matching documents plus an exponential time-decay bonus,
+# so only postings of the query terms are touched (sublinear in history size).
+class InvertedIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, half_life: float = 7 * 86400, recency_weight: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        self.half_life = half_life
+        self.recency_weight = recency_weight
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.docs: Dict[int, Record] = {}
+        self.total_len = 0
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, rec: Record) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        rec.doc_id = doc_id
+        tokens = tokenize(rec.text)
+        tf: Dict[str, int] = {}
+        for tok in tokens:
+            tf[tok] = tf.get(tok, 0) + 1
+        for tok, n in tf.items():
+            self.postings.setdefault(tok, {})[doc_id] = n
+        self.doc_len[doc_id] = len(tokens)
+        self.docs[doc_id] = rec
+        self.total_len += len(tokens)
+        return doc_id
+
+    def remove(self, doc_id: int):
+        rec = self.docs.pop(doc_id, None)
+        if rec is None:
+            return
+        for tok in set(tokenize(rec.text)):
+            plist = self.postings.get(tok)
+            if plist is not None:
+                plist.pop(doc_id, None)
+                if not plist:
+                    del self.postings[tok]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def search(self, q: str, top_k: int = 5, now: Optional[float] = None) -> List[Record]:
+        n_docs = len(self.docs)
+        if not n_docs or top_k <= 0:
+            return []
+        now = time.time() if now is None else now
+        avg_len = (self.total_len / n_docs) or 1.0
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+        for tok in set(tokenize(q)):
+            plist = self.postings.get(tok)
+            if not plist:
+                continue
+            df = len(plist)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in plist.items():
+                norm = k1 * (1 - b + b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        if not scores:
+            return []
+        decay = math.log(2) / self.half_life if self.half_life else 0.0
+        w = self.recency_weight
+        docs = self.docs
+
+        def ranked():
+            for doc_id, s in scores.items():
+                age = max(0.0, now - docs[doc_id].t)
+                yield (s + w * math.exp(-decay * age), doc_id)
+
+        return [docs[d] for _, d in heapq.nlargest(top_k, ranked())]
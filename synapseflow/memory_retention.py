@@ -0,0 +1,58 @@
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+# summarize(user_id, dropped records as dicts) -> summary text to keep, or None
+Summarizer = Callable[[str, List[dict]], Optional[str]]
+
+def _is_summary(rec) -> bool:
+    return bool(rec.meta and rec.meta.get('summary'))
+
+# Bounded retention for one user's history. Records beyond max_records or older
+# than max_age are dropped oldest-first; to keep the work amortized, trimming
+# only starts once the history is `slack` records over the limit. A leading
+# summary record is exempt from max_age: it is only folded into the next
+# summary when other records are dropped, never re-summarized on its own.
+class RetentionPolicy:
+    def __init__(self, max_records: Optional[int] = None, max_age: Optional[float] = None,
+                 summarize: Optional[Summarizer] = None, slack: Optional[int] = None):
+        self.max_records = max_records
+        self.max_age = max_age
+        self.summarize = summarize
+        self.slack = slack if slack is not None else max(1, (max_records or 0) // 10)
+
+    def due(self, records: deque, now: Optional[float] = None) -> bool:
+        if not records:
+            return False
+        if self.max_records is not None and len(records) >= self.max_records + self.slack:
+            return True
+        if self.max_age is not None:
+            oldest = records[1] if _is_summary(records[0]) and len(records) > 1 else records[0]
+            if _is_summary(oldest):
+                return False
+            now = time.time() if now is None else now
+            return now - oldest.t > self.max_age
+        return False
+
+    def trim(self, records: deque, now: Optional[float] = None) -> list:
+        """Pop expired / excess records from the left of `records` and return them."""
+        now = time.time() if now is None else now
+        limit = self.max_records
+        if limit is not None and self.summarize is not None:
+            limit = max(0, limit - 1)  # leave room for the summary record
+        head = records.popleft() if records and _is_summary(records[0]) else None
+        kept = 1 if head is not None else 0
+        dropped = []
+        while records:
+            if limit is not None and len(records) + kept > limit:
+                dropped.append(records.popleft())
+            elif self.max_age is not None and now - records[0].t > self.max_age:
+                dropped.append(records.popleft())
+            else:
+                break
+        if head is not None:
+            if dropped:
+                dropped.insert(0, head)
+            else:
+                records.appendleft(head)
+        return dropped
@@ -0,0 +1,391 @@
+import os, re, time, json, math, heapq, atexit, hashlib, sqlite3, threading
+from typing import Dict, List, Any, Optional
+from .memory_index import tokenize, as_dict
+
+SNAPSHOT_FORMAT = 'synapseflow-memory'
+
+# Storage engines for Memory. An engine loads the full {user_id: [records]} view
+# on startup and persists each new record through append().
+class MemoryStore:
+    # shared: other processes write to the same store (Memory must not cache it privately)
+    # searchable: the store answers keyword queries itself via search()
+    # lazy: users are loaded one at a time through load_user() and can be evicted
+    shared = False
+    searchable = False
+    lazy = False
+
+    def load(self) -> Dict[str, List[dict]]:
+        return {}
+
+    def load_user(self, user_id: str) -> List[dict]:
+        return []
+
+    def evict(self, user_id: str):
+        pass
+
+    def append(self, user_id: str, rec: dict):
+        pass
+
+    def should_compact(self, user_id: Optional[str] = None) -> bool:
+        return False
+
+    def compact(self, data: Dict[str, List[dict]]):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+# Legacy engine: rewrites the whole JSON document on every append
+class JsonFileStore(MemoryStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, List[dict]] = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self._data = json.load(f)
+        except Exception:
+            self._data = {}
+        return self._data
+
+    def append(self, user_id: str, rec: dict):
+        self._data.setdefault(user_id, []).append(as_dict(rec))
+        with open(self.path, 'w') as f:
+            json.dump(self._data, f, indent=2)
+
+# Append-only JSONL log + snapshot (single writer process).
+#   <path>      snapshot: header line {"format", "version", "seq"} then one record per line
+#   <path>.log  log: one record per line, each tagged with a sequence number "n"
+# Records in the log with n <= snapshot seq are already compacted and skipped on
+# replay, so a crash between snapshot replace and log truncation is harmless.
+class LogStore(MemoryStore):
+    def __init__(self, path: str, sync_every: int = 64, sync_interval: float = 1.0, compact_every: int = 10000,
+                 close_at_exit: bool = True):
+        self.path = path
+        self.log_path = path + '.log'
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._seq = 0
+        self._log_records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._fh = None
+        self._lock = threading.Lock()
+        if close_at_exit:
+            atexit.register(self.close)
+
+    def load(self):
+        data: Dict[str, List[dict]] = {}
+        snap_seq = self._load_snapshot(data)
+        self._seq = snap_seq
+        self._replay_log(data, snap_seq)
+        # a leftover tmp snapshot means we crashed mid-compaction; the old snapshot + log are intact
+        try:
+            os.remove(self.path + '.tmp')
+        except OSError:
+            pass
+        return data
+
+    def _load_snapshot(self, data: Dict[str, List[dict]]) -> int:
+        try:
+            f = open(self.path, 'r')
+        except OSError:
+            return 0
+        with f:
+            first = f.readline()
+            try:
+                header = json.loads(first)
+            except ValueError:
+                header = None
+            if not (isinstance(header, dict) and header.get('format') == SNAPSHOT_FORMAT):
+                # legacy memory.json written by json.dump(indent=2)
+                f.seek(0)
+                try:
+                    legacy = json.load(f)
+                except ValueError as e:
+                    print('Failed to read memory snapshot:', e)
+                    return 0
+                if isinstance(legacy, dict):
+                    for uid, recs in legacy.items():
+                        data.setdefault(uid, []).extend(recs)
+                return 0
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                uid = rec.pop('u', None)
+                if uid is not None:
+                    data.setdefault(uid, []).append(rec)
+            return int(header.get('seq', 0))
+
+    def _replay_log(self, data: Dict[str, List[dict]], snap_seq: int):
+        try:
+            f = open(self.log_path, 'rb')
+        except OSError:
+            return
+        good = 0
+        with f:
+            for raw in f:
+                try:
+                    if not raw.endswith(b'\n'):
+                        raise ValueError('torn write')
+                    rec = json.loads(raw)
+                except ValueError:
+                    # torn tail from a crash: drop it and everything after
+                    break
+                good += len(raw)
+                n = rec.pop('n', 0)
+                uid = rec.pop('u', None)
+                self._seq = max(self._seq, n)
+                if n <= snap_seq or uid is None:
+                    continue
+                data.setdefault(uid, []).append(rec)
+                self._log_records += 1
+        if good < os.path.getsize(self.log_path):
+            print('Recovered memory log, truncating torn tail at byte', good)
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good)
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.log_path, 'a', encoding='utf-8')
+        return self._fh
+
+    def append(self, user_id: str, rec: dict):
+        with self._lock:
+            self._seq += 1
+            line = json.dumps(dict(as_dict(rec), u=user_id, n=self._seq), separators=(',', ':'))
+            fh = self._open()
+            fh.write(line + '\n')
+            fh.flush()
+            self._log_records += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self._fh is not None and self._unsynced:
+            os.fsync(self._fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def should_compact(self, user_id: Optional[str] = None) -> bool:
+        return bool(self.compact_every) and self._log_records >= self.compact_every
+
+    def compact(self, data: Dict[str, List[dict]]):
+        with self._lock:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'format': SNAPSHOT_FORMAT, 'version': 1, 'seq': self._seq}) + '\n')
+                for uid, recs in data.items():
+                    for rec in recs:
+                        f.write(json.dumps(dict(as_dict(rec), u=uid), separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            open(self.log_path, 'w').close()
+            self._log_records = 0
+            self._unsynced = 0
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+# One LogStore per user under `directory`, opened on first access. Memory loads
+# a user's shard lazily and closes it again when the user is evicted.
+class ShardedLogStore(MemoryStore):
+    lazy = True
+
+    def __init__(self, directory: str, compact_every: int = 1000, **log_opts):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.log_opts = log_opts
+        self._shards: Dict[str, LogStore] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def shard_path(self, user_id: str) -> str:
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', user_id)[:64]
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:10]
+        return os.path.join(self.directory, f'{safe}-{digest}.json')
+
+    def _shard(self, user_id: str) -> LogStore:
+        with self._lock:
+            shard = self._shards.get(user_id)
+            if shard is None:
+                shard = self._shards[user_id] = LogStore(self.shard_path(user_id), compact_every=self.compact_every,
+                                                         close_at_exit=False, **self.log_opts)
+            return shard
+
+    def load_user(self, user_id: str) -> List[dict]:
+        return self._shard(user_id).load().get(user_id, [])
+
+    def append(self, user_id: str, rec: dict):
+        self._shard(user_id).append(user_id, rec)
+
+    def should_compact(self, user_id: Optional[str] = None) -> bool:
+        shard = self._shards.get(user_id)
+        return shard is not None and shard.should_compact()
+
+    def compact(self, data: Dict[str, List[dict]]):
+        for uid, recs in data.items():
+            self._shard(uid).compact({uid: recs})
+
+    def evict(self, user_id: str):
+        with self._lock:
+            shard = self._shards.pop(user_id, None)
+        if shard is not None:
+            shard.close()
+
+    def flush(self):
+        for shard in list(self._shards.values()):
+            shard.flush()
+
+    def close(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard in shards:
+            shard.close()
+
+# Shared engine for multi-process deployments: sqlite in WAL mode, one row per
+# record, FTS5 for keyword recall. Every worker process reads and writes the
+# same file, so Memory queries it directly instead of keeping a private copy.
+class SqliteStore(MemoryStore):
+    shared = True
+
+    def __init__(self, path: str, busy_timeout: float = 30.0, half_life: float = 7 * 86400, recency_weight: float = 0.5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.half_life = half_life
+        self.recency_weight = recency_weight
+        self._local = threading.local()
+        self._cursor = 0
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS records (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, '
+                     't REAL NOT NULL, text TEXT NOT NULL, meta TEXT)')
+        conn.execute('CREATE INDEX IF NOT EXISTS records_user ON records (user_id, seq)')
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(text, content='records', content_rowid='seq')")
+            conn.execute('CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN '
+                         'INSERT INTO records_fts (rowid, text) VALUES (new.seq, new.text); END')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN '
+                         "INSERT INTO records_fts (records_fts, rowid, text) VALUES ('delete', old.seq, old.text); END")
+            self.searchable = True
+        except sqlite3.OperationalError as e:
+            print('sqlite FTS5 unavailable, Memory will index in-process:', e)
+            self.searchable = False
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _rec(t: float, text: str, meta: Optional[str]) -> dict:
+        return {'t': t, 'text': text, 'meta': json.loads(meta) if meta else {}}
+
+    def load(self):
+        # searchable stores are queried in place; otherwise Memory mirrors rows through tail()
+        if self.searchable:
+            self._cursor = self._conn().execute('SELECT COALESCE(MAX(seq), 0) FROM records').fetchone()[0]
+            return {}
+        data: Dict[str, List[dict]] = {}
+        for uid, rec in self.tail():
+            data.setdefault(uid, []).append(rec)
+        return data
+
+    def load_user(self, user_id: str) -> List[dict]:
+        rows = self._conn().execute('SELECT t, text, meta FROM records WHERE user_id = ? ORDER BY seq', (user_id,)).fetchall()
+        return [self._rec(*row) for row in rows]
+
+    def append(self, user_id: str, rec: dict):
+        rec = as_dict(rec)
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT INTO records (user_id, t, text, meta) VALUES (?, ?, ?, ?)',
+                         (user_id, rec['t'], rec.get('text', ''), json.dumps(rec.get('meta') or {})))
+
+    def tail(self) -> List[tuple]:
+        """(user_id, record) pairs written by any process since the last call."""
+        rows = self._conn().execute('SELECT seq, user_id, t, text, meta FROM records WHERE seq > ? ORDER BY seq',
+                                    (self._cursor,)).fetchall()
+        if rows:
+            self._cursor = rows[-1][0]
+        return [(uid, self._rec(t, text, meta)) for _, uid, t, text, meta in rows]
+
+    def search(self, user_id: str, q: str, top_k: int = 5, now: Optional[float] = None) -> List[dict]:
+        # FTS5 bm25 picks candidates; the time-decay bonus is applied to a widened candidate set
+        terms = ' OR '.join('"%s"' % tok for tok in dict.fromkeys(tokenize(q)))
+        if not terms or top_k <= 0:
+            return []
+        rows = self._conn().execute(
+            'SELECT r.t, r.text, r.meta, bm25(records_fts) FROM records_fts JOIN records r ON r.seq = records_fts.rowid '
+            'WHERE records_fts MATCH ? AND r.user_id = ? ORDER BY bm25(records_fts) LIMIT ?',
+            (terms, user_id, max(top_k * 10, 50))).fetchall()
+        now = time.time() if now is None else now
+        decay = math.log(2) / self.half_life if self.half_life else 0.0
+        scored = ((-rank + self.recency_weight * math.exp(-decay * max(0.0, now - t)), i, t, text, meta)
+                  for i, (t, text, meta, rank) in enumerate(rows))
+        return [self._rec(t, text, meta) for _, _, t, text, meta in heapq.nlargest(top_k, scored)]
+
+    def oldest(self, user_id: str) -> Optional[float]:
+        """Timestamp of the user's oldest stored record (None when there are none)."""
+        return self._conn().execute('SELECT MIN(t) FROM records WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+    def prune(self, user_id: str, max_records: Optional[int] = None, max_age: Optional[float] = None) -> List[dict]:
+        """Delete the user's records beyond max_records / older than max_age; returns them oldest first."""
+        conn = self._conn()
+        cond, args = [], []
+        if max_age is not None:
+            cond.append('t < ?')
+            args.append(time.time() - max_age)
+        if max_records is not None:
+            cond.append('seq NOT IN (SELECT seq FROM records WHERE user_id = ? ORDER BY seq DESC LIMIT ?)')
+            args += [user_id, max_records]
+        if not cond:
+            return []
+        with conn:
+            rows = conn.execute('SELECT seq, t, text, meta FROM records WHERE user_id = ? AND (%s) ORDER BY seq' % ' OR '.join(cond),
+                                [user_id] + args).fetchall()
+            conn.executemany('DELETE FROM records WHERE seq = ?', [(r[0],) for r in rows])
+        return [self._rec(t, text, meta) for _, t, text, meta in rows]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def open_store(path: str, backend: Optional[str] = None) -> MemoryStore:
+    """Build a store from a backend name ('log', 'sharded', 'sqlite', 'json'); defaults to MEMORY_BACKEND or 'log'."""
+    backend = (backend or os.getenv('MEMORY_BACKEND') or 'log').lower()
+    if backend == 'sharded':
+        return ShardedLogStore(os.path.splitext(path)[0] + '.shards')
+    if backend == 'sqlite':
+        return SqliteStore(os.path.splitext(path)[0] + '.db')
+    if backend == 'json':
+        return JsonFileStore(path)
+    return LogStore(path)
@@ -1,5 +1,9 @@
-import os, sys, time
-from typing import Iterator, Dict, Any, Optional
+import os, sys, time, threading, asyncio
+from typing import Iterator, AsyncIterator, Dict, Any, Optional, List, Callable, Tuple
+from .embedding_service import EmbeddingService
+from .response_cache import ResponseCache
+from .streaming import aiter_in_thread
+from .tracing import get_tracer
 
 try:
     import openai
@@ -15,16 +19,30 @@ if openai and OPENAI_API_KEY:
     if OPENAI_API_BASE:
         openai.api_base = OPENAI_API_BASE
 
-def chat_completion(prompt: str, model: str = None, max_tokens: int = 300, temperature: float = 0.2) -> Dict[str, Any]:
-    model = model or OPENAI_MODEL
+SYSTEM_PROMPT = 'You are a helpful assistant.'
+
+def _require_openai():
     if openai is None:
         raise RuntimeError('openai package not installed. pip install openai')
     if not OPENAI_API_KEY:
         raise RuntimeError('OPENAI_API_KEY not set in environment (.env)')
+
+def _messages(prompt: str, context: Optional[str] = None) -> List[Dict[str, str]]:
+    # context (e.g. from ContextBuilder) is a second system message, after the fixed prompt
+    msgs = [{'role':'system','content':SYSTEM_PROMPT}]
+    if context:
+        msgs.append({'role':'system','content':context})
+    msgs.append({'role':'user','content':prompt})
+    return msgs
+
+def _openai_chat(prompt: str, model: str, max_tokens: int, temperature: float, stream: bool = False, context: Optional[str] = None):
+    """Default chat provider: {'text', 'raw'} or, with stream=True, an iterator of text chunks."""
+    _require_openai()
+    if stream:
+        return _openai_stream(prompt, model, max_tokens, temperature, context)
     resp = openai.ChatCompletion.create(
         model=model,
-        messages=[{'role':'system','content':'You are a helpful assistant.'},
-                  {'role':'user','content':prompt}],
+        messages=_messages(prompt, context),
         max_tokens=max_tokens,
         temperature=temperature,
     )
@@ -36,44 +54,267 @@ def chat_completion(prompt: str, model: str = None, max_tokens: int = 300, tempe
             text += content or ''
     return {'text': text, 'raw': resp}
 
-def chat_stream(prompt: str, model: str = None, max_tokens: int = 300, temperature: float = 0.2) -> Iterator[str]:
-    model = model or OPENAI_MODEL
-    if openai is None:
-        raise RuntimeError('openai package not installed. pip install openai')
-    if not OPENAI_API_KEY:
-        raise RuntimeError('OPENAI_API_KEY not set in environment (.env)')
+def _openai_stream(prompt: str, model: str, max_tokens: int, temperature: float, context: Optional[str] = None) -> Iterator[str]:
     # streaming API returns an iterator of events
     stream = openai.ChatCompletion.create(
         model=model,
-        messages=[{'role':'system','content':'You are a helpful assistant.'},
-                  {'role':'user','content':prompt}],
+        messages=_messages(prompt, context),
         max_tokens=max_tokens,
         temperature=temperature,
         stream=True,
     )
     for event in stream:
+        content = _delta_content(event)
+        if content:
+            yield content
+
+def _delta_content(event) -> Optional[str]:
+    try:
+        # event structure varies by provider; attempt safe extraction
+        choices = event.get('choices') if isinstance(event, dict) else getattr(event, 'choices', None)
+        if choices:
+            delta = choices[0].get('delta') if isinstance(choices[0], dict) else getattr(choices[0], 'delta', {})
+            return delta.get('content') if isinstance(delta, dict) else getattr(delta, 'content', None)
+        return None
+    except Exception:
+        # fallback to stringified event chunk
+        return str(event)
+
+_chat_provider: Optional[Callable[..., Any]] = None
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def set_chat_provider(provider: Optional[Callable[..., Any]]):
+    """Swap the chat backend, e.g. a local fake for offline use.
+
+    provider(prompt, model, max_tokens, temperature, stream) returns {'text', 'raw'},
+    or an iterator of text chunks when stream=True.
+    """
+    global _chat_provider
+    _chat_provider = provider
+
+def response_cache() -> Optional[ResponseCache]:
+    """Shared response cache (RESPONSE_CACHE_TTL / _SIZE / _PATH); None when TTL is 0."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            ttl = float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+            if ttl <= 0:
+                return None
+            _response_cache = ResponseCache(ttl=ttl, max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')),
+                                            path=os.getenv('RESPONSE_CACHE_PATH') or None)
+        return _response_cache
+
+def set_response_cache(cache: Optional[ResponseCache]):
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = cache
+
+def _provider():
+    return _chat_provider or _openai_chat
+
+def _call_provider(prompt: str, model: str, max_tokens: int, temperature: float, stream: bool, context: Optional[str] = None):
+    # custom providers only take the prompt, so context goes in front of it for them
+    if not context:
+        return _provider()(prompt, model, max_tokens, temperature, stream=stream)
+    if _chat_provider is not None:
+        return _chat_provider(context + '\n\n' + prompt, model, max_tokens, temperature, stream=stream)
+    return _openai_chat(prompt, model, max_tokens, temperature, stream=stream, context=context)
+
+def _key_extra(context: Optional[str]) -> Dict[str, str]:
+    return {'context': context} if context else {}
+
+def _upstream_chat(prompt: str, model: str, max_tokens: int, temperature: float, context: Optional[str] = None) -> Dict[str, Any]:
+    with get_tracer().span('llm', model, prompt_chars=len(prompt), context_chars=len(context or '')):
+        return _call_provider(prompt, model, max_tokens, temperature, False, context)
+
+def _upstream_stream(prompt: str, model: str, max_tokens: int, temperature: float, context: Optional[str] = None) -> Iterator[str]:
+    # time to first chunk and total stream time, observed directly (a span can't stay open across yields)
+    tracer = get_tracer()
+    chunks = _call_provider(prompt, model, max_tokens, temperature, True, context)
+    if not tracer.enabled:
+        return chunks
+    return _timed_stream(tracer, model, chunks)
+
+def _timed_stream(tracer, model: str, chunks: Iterator[str]) -> Iterator[str]:
+    t0 = time.perf_counter()
+    first = True
+    for chunk in chunks:
+        if first:
+            tracer.observe('llm.first_chunk', model, time.perf_counter() - t0)
+            first = False
+        yield chunk
+    tracer.observe('llm.stream', model, time.perf_counter() - t0)
+
+# context: extra system text sent before the prompt, e.g. ContextBuilder.build(user_id, prompt)
+def chat_completion(prompt: str, model: str = None, max_tokens: int = 300, temperature: float = 0.2, cache: bool = True,
+                    context: Optional[str] = None) -> Dict[str, Any]:
+    model = model or OPENAI_MODEL
+    rc = response_cache() if cache else None
+    if rc is None:
+        return dict(_upstream_chat(prompt, model, max_tokens, temperature, context), cached=False)
+    key = rc.key('chat', model, prompt, temperature, max_tokens, **_key_extra(context))
+    text, fut, leader = rc.claim(key)
+    if text is None and not leader:
+        # identical prompt already in flight: share its result
+        text = fut.result()
+    if text is not None:
+        return {'text': text, 'raw': None, 'cached': True}
+    try:
+        out = _upstream_chat(prompt, model, max_tokens, temperature, context)
+    except BaseException as e:
+        rc.fail(key, e)
+        raise
+    rc.complete(key, out['text'])
+    return dict(out, cached=False)
+
+def chat_stream(prompt: str, model: str = None, max_tokens: int = 300, temperature: float = 0.2, cache: bool = True,
+                context: Optional[str] = None) -> Iterator[str]:
+    model = model or OPENAI_MODEL
+    rc = response_cache() if cache else None
+    if rc is None:
+        yield from _upstream_stream(prompt, model, max_tokens, temperature, context)
+        return
+    key = rc.key('stream', model, prompt, temperature, max_tokens, **_key_extra(context))
+    chunks, fut, leader = rc.claim(key)
+    if chunks is None and not leader:
         try:
-            # event structure varies by provider; attempt safe extraction
-            choices = event.get('choices') if isinstance(event, dict) else getattr(event, 'choices', None)
-            if choices:
-                delta = choices[0].get('delta') if isinstance(choices[0], dict) else getattr(choices[0], 'delta', {})
-                content = delta.get('content') if isinstance(delta, dict) else getattr(delta, 'content', None)
-                if content:
-                    yield content
-        except Exception:
-            # fallback to stringified event chunk
-            yield str(event)
+            chunks = fut.result()
+        except BaseException:
+            chunks = None  # leader failed or was abandoned: stream on our own, uncached
+        if chunks is None:
+            yield from _upstream_stream(prompt, model, max_tokens, temperature, context)
+            return
+    if chunks is not None:
+        # cached stream replays at full speed
+        yield from chunks
+        return
+    got = []
+    try:
+        for chunk in _upstream_stream(prompt, model, max_tokens, temperature, context):
+            got.append(chunk)
+            yield chunk
+    except BaseException as e:
+        rc.fail(key, e if isinstance(e, Exception) else RuntimeError('stream abandoned'))
+        raise
+    rc.complete(key, got)
 
+async def achat_stream(prompt: str, model: str = None, max_tokens: int = 300, temperature: float = 0.2, cache: bool = True,
+                      context: Optional[str] = None) -> AsyncIterator[str]:
+    """Async variant of chat_stream; closing the iterator aborts the upstream request."""
+    model = model or OPENAI_MODEL
+    rc = response_cache() if cache else None
+    key = rc.key('stream', model, prompt, temperature, max_tokens, **_key_extra(context)) if rc is not None else None
+    if rc is not None:
+        chunks, fut, leader = rc.claim(key)
+        if chunks is None and not leader:
+            try:
+                chunks = await asyncio.wrap_future(fut)
+            except Exception:
+                chunks = None
+            if chunks is None:
+                rc, key = None, None
+        if chunks is not None:
+            for chunk in chunks:
+                yield chunk
+            return
+    got = []
+    tracer = get_tracer()
+    t0 = time.perf_counter()
+    try:
+        async for chunk in _achat_stream_upstream(prompt, model, max_tokens, temperature, context):
+            if not got:
+                tracer.observe('llm.first_chunk', model, time.perf_counter() - t0)
+            got.append(chunk)
+            yield chunk
+    except BaseException as e:
+        if rc is not None:
+            rc.fail(key, e if isinstance(e, Exception) else RuntimeError('stream abandoned'))
+        raise
+    tracer.observe('llm.stream', model, time.perf_counter() - t0)
+    if rc is not None:
+        rc.complete(key, got)
 
-def get_embedding(text: str, model: str = 'text-embedding-3-small') -> list:
-    """Return embedding vector for `text` using OpenAI embeddings API."""
-    if openai is None:
-        raise RuntimeError('openai package not installed. pip install openai')
-    if not OPENAI_API_KEY:
-        raise RuntimeError('OPENAI_API_KEY not set in environment (.env)')
+async def _achat_stream_upstream(prompt: str, model: str, max_tokens: int, temperature: float,
+                                 context: Optional[str] = None) -> AsyncIterator[str]:
+    acreate = getattr(openai.ChatCompletion, 'acreate', None) if openai is not None and _chat_provider is None else None
+    if acreate is None:
+        # custom provider or no native async client: pump the sync stream on a thread
+        async for chunk in aiter_in_thread(lambda: _call_provider(prompt, model, max_tokens, temperature, True, context)):
+            yield chunk
+        return
+    _require_openai()
+    stream = await acreate(
+        model=model,
+        messages=_messages(prompt, context),
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+    try:
+        async for event in stream:
+            content = _delta_content(event)
+            if content:
+                yield content
+    finally:
+        aclose = getattr(stream, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+def _openai_embed(texts: List[str], model: str = 'text-embedding-3-small') -> List[List[float]]:
+    """Embed a batch of texts with one OpenAI embeddings call."""
+    _require_openai()
     try:
-        resp = openai.Embedding.create(model=model, input=[text])
-        emb = resp['data'][0]['embedding'] if isinstance(resp, dict) else resp.data[0].embedding
-        return emb
+        resp = openai.Embedding.create(model=model, input=list(texts))
+        data = resp['data'] if isinstance(resp, dict) else resp.data
+        data = sorted(data, key=lambda d: d['index'] if isinstance(d, dict) else d.index)
+        return [d['embedding'] if isinstance(d, dict) else d.embedding for d in data]
     except Exception as e:
         raise RuntimeError('Embedding call failed: ' + str(e))
+
+_embedding_provider: Optional[Callable[[List[str], str], List[List[float]]]] = None
+_embedding_services: Dict[str, EmbeddingService] = {}
+_embedding_lock = threading.Lock()
+
+def set_embedding_provider(provider: Optional[Callable[[List[str], str], List[List[float]]]]):
+    """Swap the batch embedding backend (provider(texts, model) -> vectors), e.g. a local fake for offline use."""
+    global _embedding_provider
+    with _embedding_lock:
+        _embedding_provider = provider
+        services = list(_embedding_services.values())
+        _embedding_services.clear()
+    for svc in services:
+        svc.close()
+
+def _default_embed_provider(model: str) -> Tuple[Callable[[List[str], str], List[List[float]]], str]:
+    # -> (provider, cache namespace). EMBEDDING_PROVIDER=local embeds offline with
+    # feature hashing (synapseflow.local_vector); its vectors are cached under
+    # 'local:<dim>' so they never answer for the OpenAI model's key
+    if os.getenv('EMBEDDING_PROVIDER') == 'local':
+        from .local_vector import hash_embed
+        dim = int(os.getenv('QDRANT_VECTOR_SIZE', '384'))
+        return (lambda texts, model: hash_embed(texts, model, dim)), f'local:{dim}'
+    return _openai_embed, model
+
+def embedding_service(model: str = 'text-embedding-3-small') -> EmbeddingService:
+    """Shared batching + caching embedding service for `model` (per embedding provider)."""
+    with _embedding_lock:
+        provider, namespace = (_embedding_provider, model) if _embedding_provider else _default_embed_provider(model)
+        svc = _embedding_services.get(namespace)
+        if svc is None:
+            svc = EmbeddingService(lambda texts: provider(texts, model), model=namespace,
+                                   max_batch=int(os.getenv('EMBEDDING_MAX_BATCH', '64')),
+                                   batch_window=float(os.getenv('EMBEDDING_BATCH_WINDOW', '0.005')),
+                                   cache_size=int(os.getenv('EMBEDDING_CACHE_SIZE', '4096')),
+                                   cache_path=os.getenv('EMBEDDING_CACHE_PATH') or None)
+            _embedding_services[namespace] = svc
+        return svc
+
+def get_embedding(text: str, model: str = 'text-embedding-3-small') -> list:
+    """Return embedding vector for `text`; concurrent calls are micro-batched and cached."""
+    return embedding_service(model).embed(text)
+
+def get_embeddings(texts: List[str], model: str = 'text-embedding-3-small') -> List[list]:
+    """Return one embedding vector per text, using as few API calls as possible."""
+    return embedding_service(model).embed_many(texts)
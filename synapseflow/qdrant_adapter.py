@@ -1,4 +1,4 @@
-import os, time, json
+import os, time, json, uuid, queue, threading
 from typing import Optional, Dict, Any, List
 try:
     from qdrant_client import QdrantClient
@@ -7,57 +7,224 @@ except Exception:
     QdrantClient = None
     rest = None
 
+VECTOR_NAME = 'text'
+
+# one pooled client (keep-alive HTTP connections) per (url, api_key)
+_CLIENTS: Dict[tuple, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(url: str, api_key: Optional[str] = None):
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get((url, api_key))
+        if client is None:
+            client = _CLIENTS[(url, api_key)] = QdrantClient(url=url, api_key=api_key)
+        return client
+
 class QdrantAdapter:
-    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None, collection: str = 'synapseflow_memory'):
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None, collection: str = 'synapseflow_memory',
+                 vector_size: Optional[int] = None, batch_size: int = 256, buffered: bool = False, flush_interval: float = 0.5,
+                 max_pending: int = 10000, hnsw_m: int = 16, hnsw_ef_construct: int = 100, search_ef: Optional[int] = None,
+                 quantization: Optional[str] = None, on_disk: bool = False):
         if QdrantClient is None:
             raise RuntimeError('qdrant-client not installed. pip install qdrant-client')
         self.url = url or os.getenv('QDRANT_URL') or 'http://localhost:6333'
         self.api_key = api_key or os.getenv('QDRANT_API_KEY') or None
-        self.client = QdrantClient(url=self.url, api_key=self.api_key)
+        self.client = get_client(self.url, self.api_key)
         self.collection = collection
-        # create collection if not exists
+        # an explicit size (argument or QDRANT_VECTOR_SIZE) must match an existing collection
+        self.size_explicit = bool(vector_size or os.getenv('QDRANT_VECTOR_SIZE'))
+        self.vector_size = vector_size or int(os.getenv('QDRANT_VECTOR_SIZE', '384'))
+        self.batch_size = batch_size
+        self.vector_name: Optional[str] = VECTOR_NAME
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.search_ef = search_ef
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.ensure_collection()
+        self.writer = BufferedWriter(self.upsert_many, batch_size, flush_interval, max_pending) if buffered else None
+
+    def ensure_collection(self):
+        """Create the collection only if it is missing; never drops existing points."""
         try:
-            self.client.recreate_collection(collection_name=self.collection, vector_size=384, distance=rest.Distance.COSINE)
+            info = self.client.get_collection(collection_name=self.collection)
         except Exception:
+            info = None
+        if info is None:
+            quant = None
+            if self.quantization == 'scalar':
+                quant = rest.ScalarQuantization(scalar=rest.ScalarQuantizationConfig(type=rest.ScalarType.INT8, always_ram=True))
+            elif self.quantization == 'binary':
+                quant = rest.BinaryQuantization(binary=rest.BinaryQuantizationConfig(always_ram=True))
             try:
-                self.client.create_collection(collection_name=self.collection, vectors_config=rest.VectorParams(size=384, distance=rest.Distance.COSINE))
-            except Exception:
-                pass
+                self.client.create_collection(
+                    collection_name=self.collection,
+                    vectors_config={VECTOR_NAME: rest.VectorParams(size=self.vector_size, distance=rest.Distance.COSINE, on_disk=self.on_disk)},
+                    hnsw_config=rest.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct),
+                    quantization_config=quant,
+                    on_disk_payload=self.on_disk,
+                )
+            except Exception as e:
+                # another worker may have created it concurrently
+                print('Qdrant create_collection failed:', e)
+            payload_schema = {}
+        else:
+            self._check_schema(info)
+            payload_schema = getattr(info, 'payload_schema', None) or {}
+        if 'user_id' not in payload_schema:
+            try:
+                self.client.create_payload_index(collection_name=self.collection, field_name='user_id',
+                                                 field_schema=rest.PayloadSchemaType.KEYWORD)
+            except Exception as e:
+                print('Qdrant payload index on user_id failed:', e)
 
-    def upsert(self, user_id: str, text: str, meta: Optional[Dict[str,Any]] = None, vector: Optional[List[float]] = None):
-        vec = vector or [0.0]*384
+    def _check_schema(self, info):
+        vectors = info.config.params.vectors
+        if isinstance(vectors, dict):
+            params = vectors.get(VECTOR_NAME)
+            if params is None:
+                raise RuntimeError(f'Qdrant collection {self.collection!r} has no {VECTOR_NAME!r} vector (found {sorted(vectors)})')
+        else:
+            # legacy single unnamed vector collection
+            params = vectors
+            self.vector_name = None
+        if params.size != self.vector_size:
+            if self.size_explicit:
+                raise RuntimeError(f'Qdrant collection {self.collection!r} has vector size {params.size}, expected {self.vector_size}')
+            print(f'Qdrant collection {self.collection!r} has vector size {params.size}; using it (set QDRANT_VECTOR_SIZE to enforce one)')
+            self.vector_size = params.size
+
+    def _point(self, user_id: str, text: str, meta: Optional[Dict[str,Any]] = None, vector: Optional[List[float]] = None):
+        # records without an embedding are stored payload-only instead of with a zero vector
         payload = {'user_id': user_id, 'text': text, 'meta': meta or {}}
-        point_id = f"{user_id}-{int(time.time()*1000)}"
-        try:
-            self.client.upsert(collection_name=self.collection, points=[rest.PointStruct(id=point_id, vector=vec, payload=payload)])
-        except Exception as e:
-            print('Qdrant upsert failed:', e)
+        if self.vector_name is None:
+            if vector is None:
+                return None  # legacy unnamed-vector collections cannot hold payload-only points
+            return rest.PointStruct(id=str(uuid.uuid4()), vector=list(vector), payload=payload)
+        vec = {self.vector_name: list(vector)} if vector is not None else {}
+        return rest.PointStruct(id=str(uuid.uuid4()), vector=vec, payload=payload)
 
+    def _user_filter(self, user_id: Optional[str]):
+        if user_id is None:
+            return None
+        return rest.Filter(must=[rest.FieldCondition(key='user_id', match=rest.MatchValue(value=user_id))])
 
-def search_by_vector(self, vector: List[float], top_k: int = 5):
-    """Search the collection using a vector and return top_k results."""
-    try:
-        resp = self.client.search(collection_name=self.collection, query_vector=vector, limit=top_k, with_payload=True)
-        results = []
-        for r in resp:
-            payload = r.payload or {}
-            results.append({'id': r.id, 'score': getattr(r, 'score', None), 'text': payload.get('text',''), 'payload': payload})
-        return results
-    except Exception as e:
-        print('Qdrant search_by_vector failed:', e)
-        return []
+    def search_by_vector(self, vector: List[float], top_k: int = 5, user_id: Optional[str] = None):
+        """Search the collection using a vector (scoped to `user_id` if given) and return top_k results."""
+        try:
+            qvec = rest.NamedVector(name=self.vector_name, vector=list(vector)) if self.vector_name else list(vector)
+            params = None
+            if self.search_ef or self.quantization:
+                quant = rest.QuantizationSearchParams(rescore=True) if self.quantization else None
+                params = rest.SearchParams(hnsw_ef=self.search_ef, quantization=quant)
+            resp = self.client.search(collection_name=self.collection, query_vector=qvec, query_filter=self._user_filter(user_id),
+                                      limit=top_k, with_payload=True, search_params=params)
+            results = []
+            for r in resp:
+                payload = r.payload or {}
+                results.append({'id': r.id, 'score': getattr(r, 'score', None), 'text': payload.get('text',''), 'payload': payload})
+            return results
+        except Exception as e:
+            print('Qdrant search_by_vector failed:', e)
+            return []
 
     def query(self, user_id: str, query: str, top_k: int = 5, vector: Optional[List[float]] = None):
-        # stub: use scroll filter by user_id to show demo results
+        # vector search scoped to the user, or a filtered payload scroll when there is no query vector
         try:
             if vector is not None:
-                return self.search_by_vector(vector, top_k)
-            resp = self.client.scroll(collection_name=self.collection, limit=top_k, with_payload=True, with_vector=False, filter=rest.Filter(must=[rest.FieldCondition(key='user_id', match=rest.MatchValue(value=user_id))]))
+                return self.search_by_vector(vector, top_k, user_id=user_id)
+            points, _ = self.client.scroll(collection_name=self.collection, scroll_filter=self._user_filter(user_id),
+                                           limit=top_k, with_payload=True, with_vectors=False)
             results = []
-            for p in resp:
+            for p in points:
                 payload = p.payload or {}
                 results.append({'id': p.id, 'text': payload.get('text',''), 'payload': payload})
             return results
         except Exception as e:
             print('Qdrant query failed:', e)
             return []
+
+    def upsert_many(self, records: List[Dict[str,Any]]):
+        """Upsert records ({'user_id', 'text', 'meta', 'vector'}) in batches of batch_size points."""
+        points = [self._point(r['user_id'], r['text'], r.get('meta'), r.get('vector')) for r in records]
+        points = [p for p in points if p is not None]
+        for i in range(0, len(points), self.batch_size):
+            self.client.upsert(collection_name=self.collection, points=points[i:i+self.batch_size])
+        return len(points)
+
+    def upsert(self, user_id: str, text: str, meta: Optional[Dict[str,Any]] = None, vector: Optional[List[float]] = None):
+        rec = {'user_id': user_id, 'text': text, 'meta': meta or {}, 'vector': vector}
+        if self.writer is not None:
+            self.writer.put(rec)
+            return
+        try:
+            self.upsert_many([rec])
+        except Exception as e:
+            print('Qdrant upsert failed:', e)
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+# Background writer: buffers records and flushes them through `sink` when
+# batch_size records are pending or flush_interval has passed. put() blocks
+# (back-pressure) once max_pending records are queued, and raises queue.Full
+# if a put_timeout is given and expires.
+class BufferedWriter:
+    def __init__(self, sink, batch_size: int = 256, flush_interval: float = 0.5, max_pending: int = 10000,
+                 put_timeout: Optional[float] = None):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_pending)
+        self._closed = threading.Event()
+        self.metrics = {'flushed': 0, 'batches': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._loop, name='qdrant-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, rec: Dict[str,Any]):
+        if self._closed.is_set():
+            raise RuntimeError('BufferedWriter is closed')
+        self._queue.put(rec, timeout=self.put_timeout)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _loop(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                self.sink(batch)
+                self.metrics['flushed'] += len(batch)
+                self.metrics['batches'] += 1
+            except Exception as e:
+                self.metrics['errors'] += 1
+                print('Qdrant buffered upsert failed:', e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every record queued so far has been handed to the sink."""
+        self._queue.join()
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
@@ -0,0 +1,152 @@
+import time, json, hashlib, sqlite3, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+def normalize_prompt(prompt: str) -> str:
+    # whitespace-only differences produce the same completion key
+    return ' '.join(prompt.split())
+
+# sqlite tier: key -> (expires_at, json value)
+class DiskResponseCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL, value TEXT)')
+        self._conn.commit()
+
+    def get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute('SELECT expires, value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, expires: float, value: Any):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO responses (key, expires, value) VALUES (?, ?, ?)', (key, expires, json.dumps(value)))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# LLM response cache with TTL, LRU size bound, optional sqlite tier and
+# single-flight: the first caller for a key becomes the leader and computes,
+# concurrent callers wait on the leader's future instead of calling upstream.
+class ResponseCache:
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024, path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = DiskResponseCache(path) if path else None
+        self._lru: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    @staticmethod
+    def key(kind: str, model: str, prompt: str, temperature: float, max_tokens: int, **extra) -> str:
+        raw = json.dumps([kind, model, normalize_prompt(prompt), round(float(temperature), 4), int(max_tokens), extra],
+                         sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _get(self, key: str, now: float) -> Optional[Any]:
+        # caller holds self._lock
+        entry = self._lru.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._lru.move_to_end(key)
+                self.metrics['hits'] += 1
+                return entry[1]
+            del self._lru[key]
+        if self.disk is not None:
+            entry = self.disk.get(key, now)
+            if entry is not None:
+                self.metrics['disk_hits'] += 1
+                self._remember(key, entry[0], entry[1])
+                return entry[1]
+        return None
+
+    def _remember(self, key: str, expires: float, value: Any):
+        self._lru[key] = (expires, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get(key, time.time())
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, expires, value)
+            except Exception as e:
+                print('Response cache disk write failed:', e)
+
+    def claim(self, key: str) -> Tuple[Optional[Any], Optional[Future], bool]:
+        """Return (cached value, None, False) on a hit, else (None, future, is_leader).
+
+        The leader must finish with complete() or fail(); followers wait on the future.
+        """
+        with self._lock:
+            value = self._get(key, time.time())
+            if value is not None:
+                return value, None, False
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.metrics['coalesced'] += 1
+                return None, fut, False
+            self.metrics['misses'] += 1
+            fut = self._inflight[key] = Future()
+            return None, fut, True
+
+    def complete(self, key: str, value: Any):
+        self.put(key, value)
+        with self._lock:
+            fut = self._inflight.pop(key, None)
+        if fut is not None:
+            fut.set_result(value)
+
+    def fail(self, key: str, exc: BaseException):
+        with self._lock:
+            fut = self._inflight.pop(key, None)
+        if fut is not None:
+            fut.set_exception(exc)
+
+    def get_or_compute(self, key: str, compute) -> Any:
+        value, fut, leader = self.claim(key)
+        if value is not None:
+            return value
+        if not leader:
+            return fut.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.complete(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out = dict(self.metrics)
+            out['entries'] = len(self._lru)
+            out['inflight'] = len(self._inflight)
+        lookups = out['hits'] + out['disk_hits'] + out['misses'] + out['coalesced']
+        out['hit_rate'] = (out['hits'] + out['disk_hits'] + out['coalesced']) / lookups if lookups else 0.0
+        return out
@@ -0,0 +1,127 @@
+import time, asyncio
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# One planner step; deps are ids of steps whose outputs it needs
+class PlanNode:
+    __slots__ = ('id', 'step', 'deps')
+
+    def __init__(self, id: int, step: str, deps: Optional[List[int]] = None):
+        self.id = id
+        self.step = step
+        self.deps = list(deps or [])
+
+    def __repr__(self):
+        return f'PlanNode({self.id}, {self.step!r}, deps={self.deps})'
+
+class DagResult:
+    def __init__(self):
+        self.results: Dict[int, Any] = {}
+        self.timings: Dict[int, tuple] = {}  # id -> (start, end), perf_counter seconds
+        self.critical_path: List[int] = []
+        self.critical_path_ms = 0.0
+        self.wall_ms = 0.0
+
+    def _finish(self, nodes: List[PlanNode], t0: float):
+        self.wall_ms = (time.perf_counter() - t0) * 1000
+        # longest chain of step durations through the dependency edges
+        best: Dict[int, float] = {}
+        prev: Dict[int, Optional[int]] = {}
+        for node in _topological(nodes):
+            start, end = self.timings.get(node.id, (0.0, 0.0))
+            parent = max(node.deps, key=lambda d: best.get(d, 0.0), default=None)
+            best[node.id] = (end - start) * 1000 + (best.get(parent, 0.0) if parent is not None else 0.0)
+            prev[node.id] = parent
+        if best:
+            tail = max(best, key=best.get)
+            self.critical_path_ms = best[tail]
+            while tail is not None:
+                self.critical_path.append(tail)
+                tail = prev[tail]
+            self.critical_path.reverse()
+        return self
+
+def _ordered(nodes: List[PlanNode]) -> List[PlanNode]:
+    ids = {n.id for n in nodes}
+    for n in nodes:
+        missing = [d for d in n.deps if d not in ids]
+        if missing:
+            raise ValueError(f'step {n.id} depends on unknown steps {missing}')
+    return nodes
+
+def run_dag(nodes: List[PlanNode], run_node: Callable[[PlanNode, Dict[int, Any]], Any],
+            executor: Optional[Executor] = None) -> DagResult:
+    """Run every node once its deps finished; independent nodes run concurrently on `executor`.
+
+    run_node(node, {dep_id: dep_output}) returns the node's output.
+    """
+    nodes = _ordered(nodes)
+    res = DagResult()
+    t0 = time.perf_counter()
+
+    def call(node: PlanNode):
+        inputs = {d: res.results[d] for d in node.deps}
+        start = time.perf_counter()
+        try:
+            return run_node(node, inputs)
+        finally:
+            res.timings[node.id] = (start, time.perf_counter())
+
+    if executor is None or len(nodes) <= 1:
+        for node in _topological(nodes):
+            res.results[node.id] = call(node)
+        return res._finish(nodes, t0)
+
+    remaining = {n.id: set(n.deps) for n in nodes}
+    by_id = {n.id: n for n in nodes}
+    running = {}
+    while remaining or running:
+        for nid in [nid for nid, deps in remaining.items() if not deps]:
+            del remaining[nid]
+            running[executor.submit(call, by_id[nid])] = nid
+        if not running:
+            raise ValueError('dependency cycle in plan')
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for fut in done:
+            nid = running.pop(fut)
+            res.results[nid] = fut.result()
+            for deps in remaining.values():
+                deps.discard(nid)
+    return res._finish(nodes, t0)
+
+def _topological(nodes: List[PlanNode]) -> List[PlanNode]:
+    done, out, pending = set(), [], list(nodes)
+    while pending:
+        ready = [n for n in pending if all(d in done for d in n.deps)]
+        if not ready:
+            raise ValueError('dependency cycle in plan')
+        for n in ready:
+            done.add(n.id)
+            out.append(n)
+        pending = [n for n in pending if n.id not in done]
+    return out
+
+async def arun_dag(nodes: List[PlanNode], run_node: Callable[[PlanNode, Dict[int, Any]], Awaitable[Any]]) -> DagResult:
+    """Async run_dag: each node is a task that awaits its deps' tasks."""
+    nodes = _topological(_ordered(nodes))
+    res = DagResult()
+    t0 = time.perf_counter()
+    tasks: Dict[int, asyncio.Future] = {}
+
+    async def run(node: PlanNode):
+        inputs = {d: await tasks[d] for d in node.deps}
+        start = time.perf_counter()
+        try:
+            out = res.results[node.id] = await run_node(node, inputs)
+            return out
+        finally:
+            res.timings[node.id] = (start, time.perf_counter())
+
+    for node in nodes:
+        tasks[node.id] = asyncio.ensure_future(run(node))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return res._finish(nodes, t0)
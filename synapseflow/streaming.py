@@ -0,0 +1,154 @@
+import time, asyncio, threading
+from typing import AsyncIterator, Callable, Iterator, Optional, Any
+
+_DONE = object()
+
+async def aiter_in_thread(make_iter: Callable[[], Iterator[Any]], maxsize: int = 64) -> AsyncIterator[Any]:
+    """Drive a blocking iterator on a worker thread and yield its items on the event loop.
+
+    The thread blocks once `maxsize` items are buffered (back-pressure). Closing or
+    cancelling the async iterator stops the thread at its next item and closes the
+    sync iterator, which aborts the upstream HTTP stream.
+    """
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(maxsize)
+    stop = threading.Event()
+
+    def post(item):
+        try:
+            loop.call_soon_threadsafe(q.put_nowait, item)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def pump():
+        it = None
+        try:
+            it = make_iter()
+            for item in it:
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                post(item)
+        except BaseException as e:
+            if not stop.is_set():
+                post(e)
+        finally:
+            close = getattr(it, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            if not stop.is_set():
+                post(_DONE)
+
+    worker = threading.Thread(target=pump, name='stream-pump', daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = await q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+
+async def coalesce(chunks: AsyncIterator[str], max_chars: int = 256, max_delay: float = 0.05) -> AsyncIterator[str]:
+    """Merge small chunks into one, flushing after `max_chars` or `max_delay` seconds."""
+    it = chunks.__aiter__()
+    buf: list = []
+    size = 0
+    pending: Optional[asyncio.Task] = None
+    deadline = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield ''.join(buf)
+                buf, size, deadline = [], 0, None
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            buf.append(chunk)
+            size += len(chunk)
+            if deadline is None:
+                deadline = time.monotonic() + max_delay
+            if size >= max_chars:
+                yield ''.join(buf)
+                buf, size, deadline = [], 0, None
+        if buf:
+            yield ''.join(buf)
+    finally:
+        await _cancel(pending)
+        aclose = getattr(it, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+async def _cancel(task: Optional[asyncio.Task]):
+    # the generator must not be running when it is aclose()d
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+def sse_frame(data: str, event: Optional[str] = None) -> str:
+    # multi-line payloads need one data: field per line
+    head = f'event: {event}\n' if event else ''
+    return head + 'data: ' + data.replace('\n', '\ndata: ') + '\n\n'
+
+async def sse_events(chunks: AsyncIterator[str], is_disconnected: Optional[Callable[[], Any]] = None,
+                     heartbeat: float = 15.0) -> AsyncIterator[str]:
+    """Format `chunks` as SSE frames, with heartbeat events while the upstream is idle.
+
+    Chunks are data strings, or (event, data) pairs for named events.
+
+    Stops (and closes the upstream iterator) as soon as `is_disconnected()` reports
+    that the client went away; ends with a `done` event.
+    """
+    it = chunks.__aiter__()
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if is_disconnected is not None and await is_disconnected():
+                return
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat)
+            if not done:
+                yield sse_frame(str(int(time.time())), event='heartbeat')
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                yield sse_frame('[stream error] ' + str(e))
+                break
+            finally:
+                pending = None
+            if isinstance(chunk, tuple):
+                yield sse_frame(chunk[1], event=chunk[0])
+            elif chunk:
+                yield sse_frame(chunk)
+        yield sse_frame('', event='done')
+    finally:
+        await _cancel(pending)
+        aclose = getattr(it, 'aclose', None)
+        if aclose is not None:
+            await aclose()
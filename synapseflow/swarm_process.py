@@ -0,0 +1,57 @@
+import sys, signal, asyncio, importlib, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Tuple
+
+# --- worker side -----------------------------------------------------------
+
+_AGENT = None
+
+def _resolve(factory: str):
+    module, _, attr = factory.partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+def _init_host(factory: str, path: Tuple[str, ...]):
+    # build this worker's agent once; it lives as long as the process
+    global _AGENT
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.path[:] = list(path) + [p for p in sys.path if p not in path]
+    _AGENT = _resolve(factory)()
+
+def _describe() -> str:
+    return _AGENT.describe()
+
+def _run(user_id: str, query: str, use_planner: bool, remember: bool):
+    return _AGENT.run(user_id, query, use_planner, remember=remember)
+
+# --- parent side -----------------------------------------------------------
+
+# Swarm member running in `processes` worker processes, each holding its own Agent
+# built by `factory` ('package.module:function', importable in the workers), so a
+# swarm's CPU-bound planning and tools spread across cores. Results must pickle.
+# Each process has its own tool cache; for shared memory the factory should open
+# a multi-process store (e.g. open_store(path, 'sqlite')).
+class HostedAgent:
+    def __init__(self, name: str, factory: str, processes: int = 1, start_method: str = 'forkserver'):
+        self.name = name
+        self.factory = factory
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = 'spawn'
+        self.pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(start_method),
+                                        initializer=_init_host, initargs=(factory, tuple(sys.path)))
+        self._description: Optional[str] = None
+
+    def describe(self) -> str:
+        # capability text for LightSwarm routing, taken from the worker's tools
+        if self._description is None:
+            self._description = self.pool.submit(_describe).result()
+        return self._description
+
+    def run(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True) -> Any:
+        return self.pool.submit(_run, user_id, query, use_planner, remember).result()
+
+    async def arun(self, user_id: str, query: str, use_planner: bool = True, remember: bool = True) -> Any:
+        # cancelling drops the result; a call already running in the worker finishes there
+        return await asyncio.wrap_future(self.pool.submit(_run, user_id, query, use_planner, remember))
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,242 @@
+import time, asyncio, hashlib, threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+def normalize_input(text: str, casefold: bool = False) -> str:
+    # whitespace differences hit the same entry ("weather  Sanya" == "weather Sanya"); case only when the
+    # tool opts in, since tickers, URLs and code differ by case
+    text = ' '.join(str(text).split())
+    return text.casefold() if casefold else text
+
+# Per-tool cache settings, declared in the tool module next to tool_name:
+#   tool_cacheable = True        opt in (a tool_cache_ttl alone also opts in)
+#   tool_cache_ttl = 600         seconds a result is fresh
+#   tool_cache_stale = 60        extra seconds a stale result is served while it is refreshed
+#   tool_cache_negative_ttl = 30 seconds a failure is remembered (0 disables)
+#   tool_cache_casefold = True   inputs differing only in case share an entry
+class CachePolicy:
+    __slots__ = ('ttl', 'stale', 'negative_ttl', 'casefold')
+
+    def __init__(self, ttl: float = 300.0, stale: float = 0.0, negative_ttl: float = 0.0, casefold: bool = False):
+        self.ttl = ttl
+        self.stale = stale
+        self.negative_ttl = negative_ttl
+        self.casefold = casefold
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> Optional['CachePolicy']:
+        if not meta.get('tool_cacheable', 'tool_cache_ttl' in meta):
+            return None
+        return cls(float(meta.get('tool_cache_ttl', 300.0)), float(meta.get('tool_cache_stale', 0.0)),
+                   float(meta.get('tool_cache_negative_ttl', 0.0)), bool(meta.get('tool_cache_casefold', False)))
+
+    def __repr__(self):
+        return f'CachePolicy(ttl={self.ttl}, stale={self.stale}, negative_ttl={self.negative_ttl}, casefold={self.casefold})'
+
+# Entry: (fresh_until, stale_until, ok, value or exception)
+_Entry = Tuple[float, float, bool, Any]
+
+# set on the single-flight future when its leader was cancelled: followers retry the lookup
+_ABANDONED = object()
+
+# Bounded LRU of tool results keyed on (tool, normalized input). Fresh entries are
+# returned directly, stale ones are returned while a single background refresh runs,
+# failures can be cached briefly (re-raised on hit) and concurrent misses for the
+# same key share one call.
+class ToolCache:
+    def __init__(self, max_entries: int = 4096, executor: Optional[Executor] = None):
+        self.max_entries = max_entries
+        self.executor = executor
+        self._lru: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._refreshing = set()
+        self._tasks = set()  # async stale refreshes, referenced until done
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'stale_hits': 0, 'negative_hits': 0, 'misses': 0, 'coalesced': 0,
+                        'refreshes': 0, 'refresh_errors': 0, 'evictions': 0}
+        self.per_tool: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def key(tool: str, text: str, casefold: bool = False) -> str:
+        # tool name stays readable so one tool's entries can be invalidated
+        return tool + ':' + hashlib.sha256(normalize_input(text, casefold).encode('utf-8')).hexdigest()
+
+    def _count(self, tool: str, what: str):
+        # caller holds self._lock
+        self.metrics[what] += 1
+        counts = self.per_tool.get(tool)
+        if counts is None:
+            counts = self.per_tool[tool] = {'hits': 0, 'misses': 0}
+        counts['misses' if what == 'misses' else 'hits'] += 1
+
+    def _lookup(self, tool: str, key: str, now: float):
+        """Under the lock: ('hit'|'stale', entry), ('wait', future) or ('lead', future)."""
+        entry = self._lru.get(key)
+        if entry is not None:
+            if now < entry[0]:
+                self._lru.move_to_end(key)
+                self._count(tool, 'hits' if entry[2] else 'negative_hits')
+                return 'hit', entry
+            if now < entry[1]:
+                self._lru.move_to_end(key)
+                self._count(tool, 'stale_hits')
+                if key in self._refreshing:
+                    return 'hit', entry
+                self._refreshing.add(key)
+                return 'stale', entry
+            del self._lru[key]
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self._count(tool, 'coalesced')
+            return 'wait', fut
+        self._count(tool, 'misses')
+        fut = self._inflight[key] = Future()
+        return 'lead', fut
+
+    def _store(self, key: str, policy: 'CachePolicy', ok: bool, value: Any):
+        ttl = policy.ttl if ok else policy.negative_ttl
+        with self._lock:
+            self._refreshing.discard(key)
+            if ttl > 0:
+                now = time.time()
+                self._lru[key] = (now + ttl, now + ttl + (policy.stale if ok else 0.0), ok, value)
+                self._lru.move_to_end(key)
+                while len(self._lru) > self.max_entries:
+                    self._lru.popitem(last=False)
+                    self.metrics['evictions'] += 1
+            fut = self._inflight.pop(key, None)
+        if fut is not None and not fut.done():
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def _abandon(self, key: str):
+        # leader was cancelled (e.g. its caller's timeout): cache nothing and don't hand the
+        # cancellation to followers; they retry, and the first one in leads the next call
+        with self._lock:
+            self._refreshing.discard(key)
+            fut = self._inflight.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_result(_ABANDONED)
+
+    @staticmethod
+    def _result(entry: _Entry):
+        if entry[2]:
+            return entry[3]
+        raise entry[3]
+
+    def _refresh(self, tool: str, key: str, fn: Callable[[], Any], policy: 'CachePolicy'):
+        with self._lock:
+            self.metrics['refreshes'] += 1
+        try:
+            value = fn()
+        except Exception:
+            with self._lock:
+                self.metrics['refresh_errors'] += 1
+                self._refreshing.discard(key)
+            # keep serving the stale value until it expires instead of caching the failure
+            return
+        self._store(key, policy, True, value)
+
+    def call(self, tool: str, text: str, fn: Callable[[str], Any], policy: 'CachePolicy',
+             refresh: Optional[Callable[[str], Any]] = None) -> Any:
+        # refresh: used for background stale refreshes instead of fn (which may be tied to this request)
+        key = self.key(tool, text, policy.casefold)
+        while True:
+            with self._lock:
+                state, obj = self._lookup(tool, key, time.time())
+            if state != 'wait':
+                break
+            value = obj.result()
+            if value is not _ABANDONED:
+                return value
+        if state == 'stale':
+            job = lambda: self._refresh(tool, key, lambda: (refresh or fn)(text), policy)
+            if self.executor is not None:
+                self.executor.submit(job)
+            else:
+                threading.Thread(target=job, daemon=True, name=f'tool-cache-refresh-{tool}').start()
+        if state in ('hit', 'stale'):
+            return self._result(obj)
+        try:
+            value = fn(text)
+        except Exception as e:
+            self._store(key, policy, False, e)
+            raise
+        except BaseException:
+            self._abandon(key)
+            raise
+        self._store(key, policy, True, value)
+        return value
+
+    async def acall(self, tool: str, text: str, fn: Callable[[str], Awaitable[Any]], policy: 'CachePolicy',
+                    refresh: Optional[Callable[[str], Awaitable[Any]]] = None) -> Any:
+        key = self.key(tool, text, policy.casefold)
+        while True:
+            with self._lock:
+                state, obj = self._lookup(tool, key, time.time())
+            if state != 'wait':
+                break
+            # shielded: a follower's own cancellation must not cancel the shared future
+            value = await asyncio.shield(asyncio.wrap_future(obj))
+            if value is not _ABANDONED:
+                return value
+        if state == 'stale':
+            async def revalidate():
+                try:
+                    value = await (refresh or fn)(text)
+                except Exception:
+                    with self._lock:
+                        self.metrics['refresh_errors'] += 1
+                        self._refreshing.discard(key)
+                    return
+                except BaseException:
+                    with self._lock:
+                        self._refreshing.discard(key)
+                    raise
+                self._store(key, policy, True, value)
+            with self._lock:
+                self.metrics['refreshes'] += 1
+            task = asyncio.ensure_future(revalidate())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if state in ('hit', 'stale'):
+            return self._result(obj)
+        try:
+            value = await fn(text)
+        except Exception as e:
+            self._store(key, policy, False, e)
+            raise
+        except BaseException:
+            self._abandon(key)
+            raise
+        self._store(key, policy, True, value)
+        return value
+
+    def invalidate(self, tool: Optional[str] = None, text: Optional[str] = None):
+        with self._lock:
+            if tool is None:
+                self._lru.clear()
+            elif text is not None:
+                for casefold in (False, True):
+                    self._lru.pop(self.key(tool, text, casefold), None)
+            else:
+                for key in [k for k in self._lru if k.startswith(tool + ':')]:
+                    del self._lru[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.metrics)
+            out['entries'] = len(self._lru)
+            out['inflight'] = len(self._inflight)
+            tools = {name: dict(c) for name, c in self.per_tool.items()}
+        hits = out['hits'] + out['stale_hits'] + out['negative_hits'] + out['coalesced']
+        lookups = hits + out['misses']
+        out['hit_rate'] = hits / lookups if lookups else 0.0
+        for c in tools.values():
+            total = c['hits'] + c['misses']
+            c['hit_rate'] = c['hits'] / total if total else 0.0
+        out['tools'] = tools
+        return out
@@ -13,6 +13,11 @@ def {func_name}(input_text: str) -> str:
 tool_name = '{tool_name}'
 tool_description = {desc_json}
 tool_params = {params_json}
+# generated code is untrusted: run it in the tool process pool under limits
+tool_isolation = 'process'
+tool_timeout = 10
+tool_cpu_seconds = 5
+tool_memory_mb = 512
 '''
 
 def slugify(name: str) -> str:
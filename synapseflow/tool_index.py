@@ -0,0 +1,194 @@
+import re, math, threading
+from typing import Dict, List, Optional
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    # underscores split too, so 'get_weather' matches 'weather'
+    return _TOKEN_RE.findall(text.lower())
+
+# Tool-selection index maintained at register/unregister time.
+# score = sum over query tokens of tf * idf in (description + name), +1 if any
+# query token is a name token. Single queries walk the postings; a whole plan
+# is scored in one matrix product when numpy is available. Updates happen in
+# place (hot reload) under a lock that scoring also takes: a tool owns one row
+# of the term-count and name-term matrices and each live term one column, so
+# add/remove only touch that tool's cells (freed rows and columns are reused,
+# capacity doubles when full) and idf is applied per query from the column df.
+class ToolIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.name_terms: Dict[str, set] = {}
+        self.order: Dict[str, int] = {}
+        self._terms: Dict[str, Dict[str, int]] = {}
+        self._seq = 0
+        # numpy side: row per tool, column per term
+        self._rows: Dict[str, int] = {}
+        self._row_names: List[Optional[str]] = []
+        self._cols: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._free_cols: List[int] = []
+        self._tf = self._mask = self._df = None
+
+    def __len__(self):
+        return len(self.order)
+
+    def add(self, name: str, description: str = ''):
+        with self._lock:
+            self._add(name, description)
+
+    def _add(self, name: str, description: str):
+        if name in self.order:
+            self._remove(name)
+        tf: Dict[str, int] = {}
+        for tok in tokenize(description + ' ' + name):
+            tf[tok] = tf.get(tok, 0) + 1
+        for tok, n in tf.items():
+            self.postings.setdefault(tok, {})[name] = n
+        for tok in set(tokenize(name)):
+            self.name_terms.setdefault(tok, set()).add(name)
+        self._terms[name] = tf
+        self.order[name] = self._seq
+        self._seq += 1
+        if np is not None:
+            self._matrix_add(name, tf)
+
+    def remove(self, name: str):
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name: str):
+        tf = self._terms.pop(name, None)
+        if tf is None:
+            return
+        self.order.pop(name, None)
+        for tok in tf:
+            plist = self.postings.get(tok)
+            if plist is not None:
+                plist.pop(name, None)
+                if not plist:
+                    del self.postings[tok]
+            names = self.name_terms.get(tok)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.name_terms[tok]
+        if np is not None:
+            self._matrix_remove(name, tf)
+
+    def idf(self, tok: str) -> float:
+        df = len(self.postings.get(tok, ()))
+        return math.log(1 + len(self.order) / df) if df else 0.0
+
+    def score(self, query: str) -> Dict[str, float]:
+        with self._lock:
+            return self._score(query)
+
+    def _score(self, query: str) -> Dict[str, float]:
+        qtokens = tokenize(query)
+        scores: Dict[str, float] = {}
+        for tok in qtokens:
+            plist = self.postings.get(tok)
+            if not plist:
+                continue
+            w = self.idf(tok)
+            for name, n in plist.items():
+                scores[name] = scores.get(name, 0.0) + n * w
+        for name in set().union(*(self.name_terms.get(tok, ()) for tok in set(qtokens))):
+            scores[name] = scores.get(name, 0.0) + 1
+        return scores
+
+    def _grow(self, rows: int, cols: int):
+        # caller holds the lock; doubles the matrices' capacity to fit rows x cols
+        if self._tf is None:
+            self._tf = np.zeros((8, 64), dtype=np.float32)
+            self._mask = np.zeros((8, 64), dtype=np.float32)
+            self._df = np.zeros(64, dtype=np.float32)
+        r, c = self._tf.shape
+        if rows <= r and cols <= c:
+            return
+        while r < rows:
+            r *= 2
+        while c < cols:
+            c *= 2
+        for attr in ('_tf', '_mask'):
+            old = getattr(self, attr)
+            new = np.zeros((r, c), dtype=np.float32)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, attr, new)
+        df = np.zeros(c, dtype=np.float32)
+        df[:len(self._df)] = self._df
+        self._df = df
+
+    def _matrix_add(self, name: str, tf: Dict[str, int]):
+        for tok in tf:
+            if tok not in self._cols:
+                self._cols[tok] = self._free_cols.pop() if self._free_cols else len(self._cols)
+        row = self._free_rows.pop() if self._free_rows else len(self._row_names)
+        if row == len(self._row_names):
+            self._row_names.append(name)
+        else:
+            self._row_names[row] = name
+        self._rows[name] = row
+        self._grow(row + 1, max((self._cols[tok] for tok in tf), default=0) + 1)
+        name_toks = set(tokenize(name))
+        for tok, n in tf.items():
+            col = self._cols[tok]
+            self._tf[row, col] = n
+            self._df[col] += 1
+            if tok in name_toks:
+                self._mask[row, col] = 1.0
+
+    def _matrix_remove(self, name: str, tf: Dict[str, int]):
+        row = self._rows.pop(name, None)
+        if row is None:
+            return
+        for tok in tf:
+            col = self._cols[tok]
+            self._df[col] -= 1
+            if tok not in self.postings:  # last tool with this term: free its column
+                del self._cols[tok]
+                self._free_cols.append(col)
+        self._tf[row] = 0
+        self._mask[row] = 0
+        self._row_names[row] = None
+        self._free_rows.append(row)
+
+    def score_many(self, queries: List[str]) -> List[Dict[str, float]]:
+        tokens = [tokenize(q) for q in queries]
+        with self._lock:
+            if np is None or not self.order:
+                return [self._score(q) for q in queries]
+            q = np.zeros((len(queries), self._tf.shape[1]), dtype=np.float32)
+            for row, toks in enumerate(tokens):
+                for tok in toks:
+                    col = self._cols.get(tok)
+                    if col is not None:
+                        q[row, col] += 1
+            idf = np.log1p(len(self.order) / np.maximum(self._df, 1)).astype(np.float32)
+            total = (q * idf) @ self._tf.T + ((q @ self._mask.T) > 0)
+            names = list(self._row_names)
+        out = []
+        for row in total:
+            hits = np.nonzero(row)[0]
+            out.append({names[i]: float(row[i]) for i in hits})
+        return out
+
+    def rank(self, scores: Dict[str, float], top_n: int = 3) -> List[str]:
+        # best scores first, ties in registration order; fall back to the first tools when nothing matches
+        order = dict(self.order)
+        selected = sorted((n for n, s in scores.items() if s > 0 and n in order), key=lambda n: (-scores[n], order[n]))
+        if not selected:
+            selected = sorted(order, key=order.get)
+        return selected[:top_n]
+
+    def select(self, query: str, top_n: int = 3) -> List[str]:
+        return self.rank(self.score(query), top_n)
+
+    def select_many(self, queries: List[str], top_n: int = 3) -> List[List[str]]:
+        return [self.rank(s, top_n) for s in self.score_many(queries)]
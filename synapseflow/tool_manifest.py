@@ -0,0 +1,93 @@
+import os, ast, json, pkgutil, importlib.util
+from typing import Dict, List, Optional, Any
+
+MANIFEST_VERSION = 1
+
+def scan_tool_source(source: str) -> Optional[Dict[str, Any]]:
+    """Statically extract tool metadata from a tool module's source.
+
+    Returns {'func', 'is_async', 'meta': {tool_* literals}} or None when the module
+    has no public top-level function (such modules are imported the old way).
+    """
+    tree = ast.parse(source)
+    funcs: Dict[str, bool] = {}
+    meta: Dict[str, Any] = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith('_'):
+            funcs[node.name] = isinstance(node, ast.AsyncFunctionDef)
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            key = node.targets[0].id
+            if key.startswith('tool_'):
+                try:
+                    meta[key] = ast.literal_eval(node.value)
+                except ValueError:
+                    pass
+    if not funcs:
+        return None
+    # same pick as import-time discovery: the function named after the tool, else the first public one
+    func = meta.get('tool_name') if meta.get('tool_name') in funcs else sorted(funcs)[0]
+    return {'func': func, 'is_async': funcs[func], 'meta': meta}
+
+def _package_dirs(package: str) -> List[str]:
+    spec = importlib.util.find_spec(package)
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError(f'{package} is not a package')
+    return list(spec.submodule_search_locations)
+
+def default_manifest_path(package: str) -> str:
+    return os.getenv('SYNAPSEFLOW_TOOL_MANIFEST') or os.path.join(_package_dirs(package)[0], '.manifest.json')
+
+def _load_cache(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') == MANIFEST_VERSION:
+            return data.get('modules', {})
+    except Exception:
+        pass
+    return {}
+
+def _save_cache(path: Optional[str], modules: Dict[str, Any]):
+    if not path:
+        return
+    try:
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'modules': modules}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print('Could not write tool manifest cache:', e)
+
+def build_manifest(package: str = 'synapseflow.tools', cache_path: Optional[str] = '') -> List[Dict[str, Any]]:
+    """List tool entries for every module in `package` without importing them.
+
+    Entries are cached on disk keyed by file mtime and size; pass cache_path=None
+    to disable the cache ('' uses the default next to the tools).
+    """
+    if cache_path == '':
+        cache_path = default_manifest_path(package)
+    cached = _load_cache(cache_path)
+    modules: Dict[str, Any] = {}
+    entries = []
+    for finder, name, ispkg in pkgutil.iter_modules(_package_dirs(package)):
+        path = os.path.join(finder.path, name + '.py')
+        if ispkg or not os.path.isfile(path):
+            entries.append({'module': f'{package}.{name}', 'path': None, 'func': None})
+            continue
+        st = os.stat(path)
+        ent = cached.get(name)
+        if not ent or ent.get('mtime_ns') != st.st_mtime_ns or ent.get('size') != st.st_size:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    scanned = scan_tool_source(f.read())
+            except (SyntaxError, ValueError, OSError) as e:
+                print('Failed scanning tool module', name, e)
+                scanned = None
+            ent = dict(scanned or {'func': None}, mtime_ns=st.st_mtime_ns, size=st.st_size)
+        modules[name] = ent
+        entries.append(dict(ent, module=f'{package}.{name}', path=path))
+    if modules != cached:
+        _save_cache(cache_path, modules)
+    return entries
@@ -0,0 +1,228 @@
+import os, sys, signal, asyncio, weakref, importlib, threading, multiprocessing
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import resource
+except Exception:  # not on Windows
+    resource = None
+
+class ToolLimitExceeded(RuntimeError):
+    pass
+
+class ToolCrashed(RuntimeError):
+    pass
+
+class _Collateral(Exception):
+    # the call was lost when the pool was killed for another call's hang
+    pass
+
+# --- worker side -----------------------------------------------------------
+
+_FUNCS: Dict[Tuple[str, str], Tuple[Any, Any]] = {}  # (module, attr) -> (version, func)
+
+def _init_worker(preload: Tuple[str, ...], path: Tuple[str, ...]):
+    # workers ignore Ctrl-C (the parent shuts them down) and import the tool modules up front;
+    # the forkserver may predate sys.path changes in the parent, so take the parent's path
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.path[:] = list(path) + [p for p in sys.path if p not in path]
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print('Tool worker failed to preload', module, e, file=sys.stderr)
+
+def _warm(_=None):
+    return os.getpid()
+
+def _raise_limit(kind: str):
+    def handler(signum, frame):
+        raise ToolLimitExceeded(f'{kind} limit exceeded')
+    return handler
+
+def _load(module: str, attr: str, version: Any):
+    cached = _FUNCS.get((module, attr))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    mod = sys.modules.get(module)
+    if mod is not None and cached is not None:
+        mod = importlib.reload(mod)  # the tool file changed since this worker imported it
+    else:
+        mod = importlib.import_module(module)
+    func = getattr(mod, attr)
+    _FUNCS[(module, attr)] = (version, func)
+    return func
+
+def _call(module: str, attr: str, version: Any, args: tuple, kwargs: dict, timeout: Optional[float],
+          cpu_seconds: Optional[float], memory_mb: Optional[int]):
+    func = _load(module, attr, version)
+    # wall clock via ITIMER_REAL, CPU time via ITIMER_PROF, address space via a soft RLIMIT_AS;
+    # all three are reset after the call so the next one starts clean
+    old_as = None
+    if memory_mb and resource is not None:
+        old_as = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_mb * 1024 * 1024
+        if old_as[1] != resource.RLIM_INFINITY:
+            limit = min(limit, old_as[1])
+        resource.setrlimit(resource.RLIMIT_AS, (limit, old_as[1]))
+    if timeout:
+        signal.signal(signal.SIGALRM, _raise_limit(f'time ({timeout}s)'))
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    if cpu_seconds:
+        signal.signal(signal.SIGPROF, _raise_limit(f'CPU ({cpu_seconds}s)'))
+        signal.setitimer(signal.ITIMER_PROF, cpu_seconds)
+    try:
+        out = func(*args, **kwargs)
+        if asyncio.iscoroutine(out):
+            out = asyncio.run(out)
+        return out
+    except MemoryError:
+        raise ToolLimitExceeded(f'memory ({memory_mb} MB) limit exceeded')
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if cpu_seconds:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+        if old_as is not None:
+            resource.setrlimit(resource.RLIMIT_AS, old_as)
+
+# --- parent side -----------------------------------------------------------
+
+# Warm pool of worker processes for CPU-heavy or untrusted tools. Workers are
+# started from a forkserver (safe with the parent's threads), import the tool
+# modules once, and enforce per-call wall/CPU/memory limits themselves; the
+# parent only steps in (restarting the pool) if a worker ignores its limits or dies.
+# ProcessPoolExecutor can't lose one worker without breaking, so the other calls
+# in flight when a hung worker is killed are resubmitted once to the new pool.
+class ProcessToolPool:
+    def __init__(self, max_workers: Optional[int] = None, preload: Iterable[str] = (), grace: float = 2.0,
+                 start_method: str = 'forkserver'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.preload = list(preload)
+        self.grace = grace
+        self.start_method = start_method if start_method in multiprocessing.get_all_start_methods() else None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._hung: 'weakref.WeakSet[ProcessPoolExecutor]' = weakref.WeakSet()  # pools killed for a hang
+        self.metrics = {'calls': 0, 'limit_errors': 0, 'crashes': 0, 'restarts': 0, 'retries': 0}
+
+    def add_preload(self, module: str):
+        # modules added after start are imported by each worker on first call
+        if module not in self.preload:
+            self.preload.append(module)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                ctx = multiprocessing.get_context(self.start_method) if self.start_method else None
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=ctx, initializer=_init_worker,
+                                                 initargs=(tuple(self.preload), tuple(sys.path)))
+            return self._pool
+
+    def warm(self):
+        """Start every worker now instead of on the first calls."""
+        pool = self._executor()
+        return sorted(set(pool.map(_warm, range(self.max_workers))))
+
+    def _restart(self, pool: ProcessPoolExecutor, hung: bool = False):
+        with self._lock:
+            if hung:
+                self._hung.add(pool)
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.metrics['restarts'] += 1
+        # a worker stuck in C code ignores its itimer; kill the whole pool and start fresh
+        for proc in list(getattr(pool, '_processes', {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, module: str, attr: str, args: tuple = (), kwargs: Optional[dict] = None,
+               timeout: Optional[float] = None, cpu_seconds: Optional[float] = None,
+               memory_mb: Optional[int] = None, version: Any = None) -> Tuple[ProcessPoolExecutor, Future]:
+        pool = self._executor()
+        with self._lock:
+            self.metrics['calls'] += 1
+        return pool, pool.submit(_call, module, attr, version, args, kwargs or {}, timeout, cpu_seconds, memory_mb)
+
+    def _outcome(self, pool: ProcessPoolExecutor, fut: Future, wait: Optional[float], retry: bool = False):
+        try:
+            return fut.result(wait)
+        except ToolLimitExceeded:
+            with self._lock:
+                self.metrics['limit_errors'] += 1
+            raise
+        except (BrokenProcessPool, CancelledError) as e:
+            if pool in self._hung:
+                if retry:
+                    raise _Collateral()
+                raise ToolCrashed('tool worker pool was restarted during the call')
+            if isinstance(e, CancelledError):
+                raise
+            with self._lock:
+                self.metrics['crashes'] += 1
+            self._restart(pool)
+            raise ToolCrashed(f'tool worker died: {e}')
+        except FutureTimeout:
+            with self._lock:
+                self.metrics['limit_errors'] += 1
+            self._restart(pool, hung=True)
+            raise ToolLimitExceeded('tool worker did not stop at its time limit; pool restarted')
+
+    def run(self, module: str, attr: str, *args, timeout: Optional[float] = None, cpu_seconds: Optional[float] = None,
+            memory_mb: Optional[int] = None, version: Any = None, **kwargs):
+        for retry in (True, False):
+            pool, fut = self.submit(module, attr, args, kwargs, timeout, cpu_seconds, memory_mb, version)
+            try:
+                return self._outcome(pool, fut, timeout + self.grace if timeout else None, retry)
+            except _Collateral:
+                with self._lock:
+                    self.metrics['retries'] += 1
+
+    async def arun(self, module: str, attr: str, *args, timeout: Optional[float] = None, cpu_seconds: Optional[float] = None,
+                   memory_mb: Optional[int] = None, version: Any = None, **kwargs):
+        for retry in (True, False):
+            pool, fut = self.submit(module, attr, args, kwargs, timeout, cpu_seconds, memory_mb, version)
+            waiter = asyncio.wrap_future(fut)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout + self.grace if timeout else None)
+            except asyncio.TimeoutError:
+                # still running: _outcome restarts the pool, which fails the waiter later
+                waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            except (Exception, asyncio.CancelledError):
+                if not fut.done():
+                    raise  # this task itself was cancelled
+                # _outcome re-raises the tool's error (or resubmits a call lost to another call's hang)
+            try:
+                return self._outcome(pool, fut, 0, retry)
+            except _Collateral:
+                with self._lock:
+                    self.metrics['retries'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.metrics)
+            out['workers'] = self.max_workers
+            out['started'] = self._pool is not None
+        return out
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+_POOL: Optional[ProcessToolPool] = None
+_POOL_LOCK = threading.Lock()
+
+def default_pool() -> ProcessToolPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            workers = os.getenv('SYNAPSEFLOW_TOOL_PROCESSES')
+            _POOL = ProcessToolPool(int(workers) if workers else None)
+        return _POOL
@@ -0,0 +1,290 @@
+import os, time, random, asyncio, threading, weakref
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:
+    requests = None
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HAS_H2 = True
+except Exception:
+    HAS_H2 = False
+
+RETRY_STATUS = (429, 502, 503, 504)
+IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+# closed -> open after failure_threshold consecutive failures; open fails fast for
+# reset_timeout seconds, then half-open lets one probe through: success closes, failure re-opens
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if now - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release(self):
+        # the call ended without telling us anything about the upstream (bad request, cancellation)
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 2.0) -> float:
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc or parts.path
+
+# Shared HTTP runtime for network-bound tools: one keep-alive connection pool,
+# at most max_per_host requests in flight per upstream, jittered retries of
+# idempotent requests and a circuit breaker per host.
+class ToolRuntime:
+    def __init__(self, timeout: float = 5.0, retries: int = 2, backoff: float = 0.2, backoff_cap: float = 2.0,
+                 pool_size: int = 32, max_per_host: int = 8, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 http2: bool = True):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.http2 = http2 and HAS_H2
+        self._session = None
+        # one AsyncClient and one set of per-host semaphores per event loop, dropped with the loop
+        self._aclients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]' = weakref.WeakKeyDictionary()
+        self._asems: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]' = weakref.WeakKeyDictionary()
+        self._hosts: Dict[str, Tuple[threading.BoundedSemaphore, CircuitBreaker]] = {}
+        self._lock = threading.Lock()
+        self.metrics = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+
+    @property
+    def session(self):
+        if requests is None:
+            raise RuntimeError('requests package not installed. pip install requests')
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    s.mount('http://', adapter)
+                    s.mount('https://', adapter)
+                    self._session = s
+        return self._session
+
+    def _upstream(self, host: str) -> Tuple[threading.BoundedSemaphore, CircuitBreaker]:
+        with self._lock:
+            ent = self._hosts.get(host)
+            if ent is None:
+                ent = self._hosts[host] = (threading.BoundedSemaphore(self.max_per_host),
+                                           CircuitBreaker(self.failure_threshold, self.reset_timeout))
+            return ent
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        return self._upstream(_host(url))[1]
+
+    def _count(self, key: str):
+        with self._lock:
+            self.metrics[key] += 1
+
+    def _admit(self, host: str, breaker: CircuitBreaker):
+        if not breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f'circuit open for {host}; failing fast')
+
+    def _attempts(self, method: str, retries: Optional[int]) -> int:
+        retries = self.retries if retries is None else retries
+        return 1 + (retries if method.upper() in IDEMPOTENT else 0)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs):
+        """Like session.request; retryable statuses are returned after the last attempt (call raise_for_status)."""
+        host = _host(url)
+        sem, breaker = self._upstream(host)
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = self._attempts(method, retries)
+        session = self.session
+        for attempt in range(attempts):
+            self._admit(host, breaker)
+            self._count('requests')
+            try:
+                with sem:
+                    resp = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                self._count('failures')
+                if attempt + 1 >= attempts:
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if resp.status_code not in RETRY_STATUS:
+                    breaker.record_success()
+                    return resp
+                breaker.record_failure()
+                self._count('failures')
+                if attempt + 1 >= attempts:
+                    return resp
+                resp.close()
+            self._count('retries')
+            time.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap))
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def _forget_closed_loops(self):
+        # caller holds self._lock. A client's open connections can reference its loop,
+        # which keeps the weak entry alive, so entries of closed loops are dropped here
+        for table in (self._aclients, self._asems):
+            for loop in [l for l in table.keys() if l.is_closed()]:
+                del table[loop]
+
+    def _asem(self, host: str) -> asyncio.Semaphore:
+        # asyncio primitives are bound to one loop, so the async per-host limit is kept per loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sems = self._asems.get(loop)
+            if sems is None:
+                self._forget_closed_loops()
+                sems = self._asems[loop] = {}
+            sem = sems.get(host)
+            if sem is None:
+                sem = sems[host] = asyncio.Semaphore(self.max_per_host)
+            return sem
+
+    def _aclient(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._aclients.get(loop)
+            if client is None:
+                self._forget_closed_loops()
+                limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                client = self._aclients[loop] = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=self.timeout)
+            return client
+
+    async def arequest(self, method: str, url: str, retries: Optional[int] = None, **kwargs):
+        """Async request over httpx (HTTP/2 when h2 is installed); without httpx the sync path runs in a thread."""
+        if httpx is None:
+            return await asyncio.to_thread(self.request, method, url, retries, **kwargs)
+        host = _host(url)
+        breaker = self._upstream(host)[1]
+        sem = self._asem(host)
+        attempts = self._attempts(method, retries)
+        client = self._aclient()
+        for attempt in range(attempts):
+            self._admit(host, breaker)
+            self._count('requests')
+            try:
+                async with sem:
+                    resp = await client.request(method, url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException):
+                breaker.record_failure()
+                self._count('failures')
+                if attempt + 1 >= attempts:
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if resp.status_code not in RETRY_STATUS:
+                    breaker.record_success()
+                    return resp
+                breaker.record_failure()
+                self._count('failures')
+                if attempt + 1 >= attempts:
+                    return resp
+            self._count('retries')
+            await asyncio.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap))
+
+    async def aget(self, url: str, **kwargs):
+        return await self.arequest('GET', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.metrics)
+            hosts = dict(self._hosts)
+        out['circuits'] = {h: {'state': b.state, 'failures': b.failures} for h, (_, b) in hosts.items()}
+        return out
+
+    def close(self):
+        with self._lock:
+            session, self._session = self._session, None
+            clients = list(self._aclients.values())
+            self._aclients.clear()
+            self._asems.clear()
+        if session is not None:
+            session.close()
+        for client in clients:
+            try:
+                asyncio.get_running_loop().create_task(client.aclose())
+            except RuntimeError:
+                pass  # loop gone; its connections died with it
+
+_RUNTIME: Optional[ToolRuntime] = None
+_RUNTIME_LOCK = threading.Lock()
+
+def get_runtime() -> ToolRuntime:
+    global _RUNTIME
+    with _RUNTIME_LOCK:
+        if _RUNTIME is None:
+            _RUNTIME = ToolRuntime(timeout=float(os.getenv('TOOL_HTTP_TIMEOUT', '5')),
+                                   retries=int(os.getenv('TOOL_HTTP_RETRIES', '2')),
+                                   max_per_host=int(os.getenv('TOOL_HTTP_MAX_PER_HOST', '8')),
+                                   failure_threshold=int(os.getenv('TOOL_CIRCUIT_FAILURES', '5')),
+                                   reset_timeout=float(os.getenv('TOOL_CIRCUIT_RESET', '30')))
+        return _RUNTIME
+
+def set_runtime(runtime: Optional[ToolRuntime]):
+    global _RUNTIME
+    with _RUNTIME_LOCK:
+        old, _RUNTIME = _RUNTIME, runtime
+    if old is not None and old is not runtime:
+        old.close()
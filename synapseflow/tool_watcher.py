@@ -0,0 +1,104 @@
+import sys, importlib, threading
+from typing import Any, Dict, List, Optional, Tuple
+from .tool_manifest import build_manifest
+
+# Hot reload for a tool package. Each poll stats the tool files through the
+# manifest (mtime + size, no imports), then for new, changed and deleted modules
+# builds the replacement tools and applies them to the agent in one registry swap.
+# Changed modules that were already imported are reloaded first; a module that
+# fails to reload keeps its previous tool.
+class ToolWatcher:
+    def __init__(self, agent, package: str = 'synapseflow.tools', interval: float = 2.0):
+        self.agent = agent
+        self.package = package
+        self.interval = interval
+        self._seen: Dict[str, Tuple[Any, Any]] = {}   # module -> (mtime_ns, size)
+        self._names: Dict[str, str] = {}             # module -> registered tool name
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self._prime()
+
+    def _prime(self):
+        # the agent already registered the current modules; remember them as the baseline
+        tools = self.agent.tools
+        for ent in self._entries():
+            self._seen[ent['module']] = (ent.get('mtime_ns'), ent.get('size'))
+            for name, tool in tools.items():
+                if getattr(tool, 'module', None) == ent['module'] or getattr(tool.func, '__module__', None) == ent['module']:
+                    self._names[ent['module']] = name
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        try:
+            return build_manifest(self.package)
+        except Exception as e:
+            print('Tool watcher scan failed:', e)
+            return []
+
+    def _reimport(self, module: str) -> bool:
+        mod = sys.modules.get(module)
+        if mod is None:
+            return True
+        try:
+            importlib.reload(mod)
+            return True
+        except Exception as e:
+            print('Tool reload failed, keeping previous version of', module, e)
+            return False
+
+    def poll(self) -> Dict[str, List[str]]:
+        """Check the package once; returns the tool names added, reloaded and removed."""
+        entries = {ent['module']: ent for ent in self._entries()}
+        changed = [m for m, ent in entries.items() if self._seen.get(m) != (ent.get('mtime_ns'), ent.get('size'))]
+        gone = [m for m in self._seen if m not in entries]
+        if not changed and not gone:
+            return {'added': [], 'reloaded': [], 'removed': []}
+        importlib.invalidate_caches()  # let the import system see files created since the last scan
+        add, remove, out = [], [], {'added': [], 'reloaded': [], 'removed': []}
+        for module in changed:
+            ent = entries[module]
+            self._seen[module] = (ent.get('mtime_ns'), ent.get('size'))
+            old = self._names.get(module)
+            if not self._reimport(module):
+                continue
+            tool = self.agent._tool_from_entry(ent)
+            if tool is None:
+                continue
+            if old is not None and old != tool.name:
+                remove.append(old)
+            add.append(tool)
+            self._names[module] = tool.name
+            out['reloaded' if old is not None else 'added'].append(tool.name)
+        for module in gone:
+            del self._seen[module]
+            name = self._names.pop(module, None)
+            sys.modules.pop(module, None)
+            if name is not None:
+                remove.append(name)
+                out['removed'].append(name)
+        self.agent.swap_tools(add=add, remove=remove)
+        cache = getattr(self.agent, 'tool_cache', None)
+        if cache is not None:
+            for name in out['reloaded'] + out['removed']:
+                cache.invalidate(name)
+        self.reloads += 1
+        return out
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print('Tool watcher poll failed:', e)
+
+    def start(self) -> 'ToolWatcher':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='tool-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
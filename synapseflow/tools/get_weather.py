@@ -1,15 +1,20 @@
-import requests
+from ..tool_runtime import get_runtime
 def get_weather(input_text: str) -> str:
     city = input_text.strip()
     if not city:
         return 'No city provided.'
-    try:
-        # Uses wttr.in public API (no key) - simple text output
-        resp = requests.get(f'https://wttr.in/{city}?format=3', timeout=5)
-        return resp.text
-    except Exception as e:
-        return 'Weather tool failed: ' + str(e)
+    # Uses wttr.in public API (no key) - simple text output
+    # pooled keep-alive session with retries; fails fast while wttr.in's circuit is open.
+    # errors propagate so the agent reports them and the tool cache can remember them briefly
+    resp = get_runtime().get(f'https://wttr.in/{city}?format=3')
+    resp.raise_for_status()
+    return resp.text
 
 tool_name = 'get_weather'
 tool_description = 'Fetch simple weather text from wttr.in (demo)'
 tool_params = [{'name':'city_name','type':'string','description':'City name'}]
+tool_cacheable = True
+tool_cache_ttl = 600
+tool_cache_stale = 300
+tool_cache_negative_ttl = 30
+tool_cache_casefold = True  # city names are case-insensitive
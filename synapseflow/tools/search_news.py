@@ -7,3 +7,5 @@ def search_news(input_text: str) -> str:
 tool_name = 'search_news'
 tool_description = 'Demo news search returning templated results'
 tool_params = [{'name':'query','type':'string','description':'Search query'}]
+tool_cacheable = True
+tool_cache_ttl = 60
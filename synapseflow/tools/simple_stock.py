@@ -7,3 +7,5 @@ def simple_stock(input_text: str) -> str:
 tool_name = 'simple_stock'
 tool_description = 'Demo stock price tool (placeholder)'
 tool_params = [{'name':'symbol','type':'string','description':'Stock symbol'}]
+tool_cacheable = True
+tool_cache_ttl = 60
@@ -0,0 +1,278 @@
+import os, sys, time, random, bisect, threading, contextvars
+from collections import deque, Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds, ~2x apart from 0.5 ms to 60 s
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Fixed-bucket histogram: observe() is a bisect and two increments, quantiles
+# are interpolated inside the bucket that holds them.
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, float]:
+        return {'count': self.count, 'sum_ms': self.sum * 1000, 'p50_ms': self.quantile(0.5) * 1000,
+                'p95_ms': self.quantile(0.95) * 1000, 'p99_ms': self.quantile(0.99) * 1000}
+
+# One timed operation. Timings are perf_counter (monotonic); attributes are kept
+# as given, so callers pass sizes rather than copies of large payloads.
+class Span:
+    __slots__ = ('tracer', 'name', 'target', 'attrs', 'start', 'end', 'parent', 'error', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, target: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.target = target
+        self.attrs = attrs
+        self.start = self.end = 0.0
+        self.parent: Optional['Span'] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, key: str, value: Any):
+        self.attrs[key] = value
+
+    def fail(self, exc: BaseException):
+        # for errors the caller handles itself, so they never reach __exit__
+        self.error = type(exc).__name__
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            pass  # exited from another context (e.g. a generator resumed elsewhere)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {'name': self.name, 'target': self.target, 'start': self.start, 'duration_ms': self.duration_ms,
+               'parent': self.parent.name if self.parent is not None else None}
+        if self.error:
+            out['error'] = self.error
+        out.update(self.attrs)
+        return out
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def fail(self, exc: BaseException):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar('synapseflow_span', default=None)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Span source + histogram registry. Every finished span feeds the histogram for
+# (name, target); a sample_rate fraction of spans is also handed to the exporters
+# and kept in a small ring buffer. Disabled, span() returns a shared no-op object.
+class Tracer:
+    def __init__(self, enabled: bool = True, sample_rate: float = 1.0, keep: int = 256):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporters: List[Callable[[Dict[str, Any]], None]] = []
+        self.recent: deque = deque(maxlen=keep)
+        self._hists: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.profiler: Optional['SamplingProfiler'] = None
+
+    def span(self, name: str, target: str = '', **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, target, attrs)
+
+    def histogram(self, name: str, target: str = '') -> Histogram:
+        key = (name, target)
+        hist = self._hists.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, name: str, target: str, seconds: float):
+        if self.enabled:
+            self.histogram(name, target).observe(seconds)
+
+    def count(self, name: str, target: str = '', n: int = 1):
+        if self.enabled:
+            with self._lock:
+                self._counters[(name, target)] = self._counters.get((name, target), 0) + n
+
+    def add_exporter(self, fn: Callable[[Dict[str, Any]], None]):
+        self.exporters.append(fn)
+
+    def _finish(self, span: Span):
+        self.histogram(span.name, span.target).observe(span.end - span.start)
+        if span.error:
+            self.count(span.name + '.errors', span.target)
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.recent.append(span)
+        for fn in self.exporters:
+            try:
+                fn(span.to_dict())
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 per 'name' or 'name:target'."""
+        with self._lock:
+            hists = dict(self._hists)
+        return {f'{n}:{t}' if t else n: h.summary() for (n, t), h in sorted(hists.items())}
+
+    def render_prometheus(self, prefix: str = 'synapseflow') -> str:
+        with self._lock:
+            hists = sorted(self._hists.items())
+            counters = sorted(self._counters.items())
+        lines = [f'# HELP {prefix}_span_seconds Duration of traced operations.',
+                 f'# TYPE {prefix}_span_seconds histogram']
+        for (name, target), h in hists:
+            with h._lock:
+                counts, total, sum_ = list(h.counts), h.count, h.sum
+            labels = f'span="{_escape(name)}",target="{_escape(target)}"'
+            cum = 0
+            for le, n in zip(h.buckets, counts):
+                cum += n
+                lines.append(f'{prefix}_span_seconds_bucket{{{labels},le="{le}"}} {cum}')
+            lines.append(f'{prefix}_span_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'{prefix}_span_seconds_sum{{{labels}}} {sum_}')
+            lines.append(f'{prefix}_span_seconds_count{{{labels}}} {total}')
+        if counters:
+            lines.append(f'# TYPE {prefix}_events_total counter')
+            for (name, target), n in counters:
+                lines.append(f'{prefix}_events_total{{event="{_escape(name)}",target="{_escape(target)}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def render_gauges(self, name: str, values: Dict[str, Any], prefix: str = 'synapseflow') -> str:
+        # numeric entries of a stats() dict as one gauge family, e.g. cache hit rates
+        lines = [f'# TYPE {prefix}_{name} gauge']
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'{prefix}_{name}{{stat="{_escape(key)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+            self._counters.clear()
+        self.recent.clear()
+
+# Statistical profiler: a background thread samples every other thread's stack
+# each `interval` seconds and counts them in collapsed ("a;b;c N") form for
+# flame graphs. Costs nothing until started.
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stack(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self.samples[self._stack(frame)] += 1
+
+    def start(self) -> 'SamplingProfiler':
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self, top: Optional[int] = None) -> str:
+        return '\n'.join(f'{stack} {n}' for stack, n in self.samples.most_common(top))
+
+_TRACER: Optional[Tracer] = None
+_TRACER_LOCK = threading.Lock()
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer (SYNAPSEFLOW_TRACING=0 disables, SYNAPSEFLOW_TRACE_SAMPLE sets the export rate)."""
+    global _TRACER
+    if _TRACER is None:
+        with _TRACER_LOCK:
+            if _TRACER is None:
+                tracer = Tracer(enabled=os.getenv('SYNAPSEFLOW_TRACING', '1') != '0',
+                                sample_rate=float(os.getenv('SYNAPSEFLOW_TRACE_SAMPLE', '1')))
+                interval = float(os.getenv('SYNAPSEFLOW_PROFILE_INTERVAL', '0'))
+                if interval > 0:
+                    tracer.profiler = SamplingProfiler(interval).start()
+                _TRACER = tracer
+    return _TRACER
+
+def set_tracer(tracer: Optional[Tracer]):
+    global _TRACER
+    with _TRACER_LOCK:
+        _TRACER = tracer
+
+def span(name: str, target: str = '', **attrs):
+    return get_tracer().span(name, target, **attrs)
@@ -1,10 +1,17 @@
 import jwt
 import time
-import os, json, importlib
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+import os, json, asyncio, importlib
+from fastapi import FastAPI, Request, Depends, HTTPException, Query as QueryParam
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+from typing import List
 from synapseflow.agent import Agent, Memory, Tool
+from synapseflow.memory_store import open_store
+from synapseflow.streaming import coalesce, sse_events
+from synapseflow.tracing import get_tracer
+from synapseflow.admission import AdmissionQueue, Overloaded
+from synapseflow.context import ContextBuilder
 
 app = FastAPI(title='SynapseFlow Final API')
 
@@ -13,55 +20,106 @@ app.mount('/frontend', StaticFiles(directory='frontend'), name='frontend')
 
 
 # initialize agent
-mem = Memory(path='memory_api.json')
-agent = Agent(memory=mem)
+# sqlite (WAL) store is shared safely by all uvicorn workers; MEMORY_BACKEND=log for single-process deploys
+mem = Memory(path='memory_api.json', store=open_store('memory_api.json', os.getenv('MEMORY_BACKEND', 'sqlite')))
+agent = Agent(memory=mem, max_workers=int(os.getenv('SYNAPSEFLOW_TOOL_WORKERS', '16')),
+              max_concurrency=int(os.getenv('SYNAPSEFLOW_MAX_CONCURRENCY', '8')))
 agent.discover_tools('synapseflow.tools')
+# pick up tools written by tool_generator (and edits to existing ones) without a restart; 0 disables
+TOOL_RELOAD_INTERVAL = float(os.getenv('SYNAPSEFLOW_TOOL_RELOAD', '2'))
+tool_watcher = agent.watch_tools('synapseflow.tools', TOOL_RELOAD_INTERVAL) if TOOL_RELOAD_INTERVAL > 0 else None
+
+# memory recall packed under CONTEXT_TOKEN_BUDGET tokens and sent with LLM calls
+context_builder = ContextBuilder(memory=mem)
+
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', '15'))
+SSE_COALESCE_CHARS = int(os.getenv('SSE_COALESCE_CHARS', '64'))
+SSE_COALESCE_DELAY = float(os.getenv('SSE_COALESCE_DELAY', '0.05'))
+
+# bounded work queue in front of the agent: SYNAPSEFLOW_MAX_RUNS runs (batch items count
+# individually) execute at once, the rest wait fairly per user; past the limits requests get 429
+admission = AdmissionQueue(max_running=int(os.getenv('SYNAPSEFLOW_MAX_RUNS', '32')),
+                           max_queued=int(os.getenv('SYNAPSEFLOW_MAX_QUEUED', '256')),
+                           max_queued_per_key=int(os.getenv('SYNAPSEFLOW_MAX_QUEUED_PER_USER', '32')))
+MAX_BATCH = int(os.getenv('SYNAPSEFLOW_MAX_BATCH', '64'))
 
 class Query(BaseModel):
     user_id: str
     query: str
 
+class BatchQuery(BaseModel):
+    items: List[Query]
+
+def overloaded(e: Overloaded):
+    return JSONResponse({'error': 'overloaded: ' + e.reason, 'retry_after': e.retry_after}, status_code=429,
+                        headers={'Retry-After': str(e.retry_after)})
+
 @app.post('/run')
-def run_query(q: Query):
-    res = agent.run(q.user_id, q.query)
+async def run_query(q: Query):
+    try:
+        async with admission.slot(q.user_id):
+            res = await agent.arun(q.user_id, q.query)
+    except Overloaded as e:
+        return overloaded(e)
     return JSONResponse({'result': res})
 
+# many queries in one request: planning, tool selection and identical tool calls are shared
+@app.post('/run_batch')
+async def run_batch(b: BatchQuery):
+    if len(b.items) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f'batch larger than {MAX_BATCH} items')
+    users = {q.user_id for q in b.items}
+    try:
+        async with admission.slot(users.pop() if len(users) == 1 else 'batch', cost=len(b.items)):
+            res = await agent.arun_batch([(q.user_id, q.query) for q in b.items])
+    except Overloaded as e:
+        return overloaded(e)
+    return JSONResponse({'results': res})
+
 @app.post('/stream')
-def stream_query(q: Query):
+def stream_query(q: Query, token: str = QueryParam(None)):
     # stream LLM response for the whole query by delegating to openai_integration.chat_stream
     try:
         from synapseflow.openai_integration import chat_stream
     except Exception as e:
         return JSONResponse({'error': 'openai integration not available: ' + str(e)})
+    # memory context only for the token's subject, never for the unauthenticated body user_id
+    sub = token_subject(token)
+    context = context_builder.build(sub, q.query) if sub else None
     def iter_chunks():
         try:
-            for chunk in chat_stream(q.query):
+            for chunk in chat_stream(q.query, context=context):
                 yield chunk
         except Exception as e:
             yield '\n[stream error] ' + str(e)
     return StreamingResponse(iter_chunks(), media_type='text/plain')
 
 
-from fastapi import Response
-
-@app.get('/sse_stream')
-async def sse_stream(request: Request):
+# SSE progress of an agent run: plan, chunk (streaming tools), tool and step events as
+# they complete, then result; the first frame arrives when the fastest tool finishes
+@app.get('/run_stream')
+async def run_stream(request: Request, user_id: str, q: str):
     try:
-        from synapseflow.openai_integration import chat_stream
-    except Exception as e:
-        return JSONResponse({'error': 'openai integration not available: ' + str(e)})
+        slot = await admission.acquire(user_id)
+    except Overloaded as e:
+        return overloaded(e)
 
-    async def event_generator(qstr: str):
-        # stream chat chunks
-        try:
-            for chunk in chat_stream(qstr):
-                yield f"data: {chunk}\n\n"
-                # no native request.client_disconnected, so we don't check
-        except Exception as e:
-            yield f"data: [stream error] {str(e)}\n\n"
+    start, held = time.perf_counter(), [slot]
 
-    q = request.query_params.get('q','')
-    return StreamingResponse(event_generator(q), media_type='text/event-stream')
+    def release():
+        # from the generator's finally, or the background task if the stream never started
+        if held:
+            admission.release(held.pop(), time.perf_counter() - start)
+
+    async def events():
+        try:
+            async for ev in agent.arun_stream(user_id, q):
+                yield ev['event'], json.dumps(ev, default=str)
+        finally:
+            release()
+    return StreamingResponse(sse_events(events(), request.is_disconnected, heartbeat=SSE_HEARTBEAT),
+                             media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+                             background=BackgroundTask(release))
 
 # Simple auth: HMAC JWT (demo only)
 JWT_SECRET = 'synapseflow_secret_demo_change_me'
@@ -71,6 +129,15 @@ def create_token(username: str):
     payload = {'sub': username, 'iat': int(time.time()), 'exp': int(time.time()) + 3600}
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
 
+def token_subject(token):
+    # 'sub' of a valid token from /auth/token, else None
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO]).get('sub') or None
+    except Exception:
+        return None
+
 @app.post('/auth/token')
 def auth_token(req: Request):
     data = req.json() if hasattr(req, 'json') else None
@@ -88,26 +155,38 @@ def auth_token(req: Request):
     token = create_token(username)
     return {'access_token': token}
 
-# modify sse_stream to accept token param and validate
-from fastapi import Query
-
+# SSE stream of the LLM answer; requires a token from /auth/token
 @app.get('/sse_stream')
-async def sse_stream(request: Request, q: str = '', token: str = Query(None)):
+async def sse_stream(request: Request, q: str = '', token: str = QueryParam(None)):
     # validate token
     try:
         if not token:
             raise HTTPException(status_code=401, detail='missing token')
-        jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
     except Exception as e:
         return JSONResponse({'error':'invalid token: '+str(e)}, status_code=401)
     try:
-        from synapseflow.openai_integration import chat_stream
+        from synapseflow.openai_integration import achat_stream
     except Exception as e:
         return JSONResponse({'error': 'openai integration not available: ' + str(e)})
-    async def event_generator(qstr: str):
-        try:
-            for chunk in chat_stream(qstr):
-                yield f"data: {chunk}\n\n"
-        except Exception as e:
-            yield f"data: [stream error] {str(e)}\n\n"
-    return StreamingResponse(event_generator(q), media_type='text/event-stream')
+    # tokens are coalesced into larger frames; a client disconnect closes the upstream stream
+    context = await asyncio.to_thread(context_builder.build, claims.get('sub', ''), q)
+    chunks = coalesce(achat_stream(q, context=context), max_chars=SSE_COALESCE_CHARS, max_delay=SSE_COALESCE_DELAY)
+    return StreamingResponse(sse_events(chunks, request.is_disconnected, heartbeat=SSE_HEARTBEAT),
+                             media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Prometheus scrape target: span latency histograms (per tool, LLM, embedding, memory) plus cache stats
+@app.get('/metrics')
+def metrics():
+    tracer = get_tracer()
+    body = (tracer.render_prometheus() + tracer.render_gauges('tool_cache', agent.tool_cache.stats())
+            + tracer.render_gauges('admission', admission.stats()))
+    return PlainTextResponse(body, media_type='text/plain; version=0.0.4')
+
+# collapsed stacks from the sampling profiler (SYNAPSEFLOW_PROFILE_INTERVAL > 0), for flame graphs
+@app.get('/debug/profile')
+def profile(top: int = 200):
+    profiler = get_tracer().profiler
+    if profiler is None:
+        return JSONResponse({'error': 'profiler disabled; set SYNAPSEFLOW_PROFILE_INTERVAL'}, status_code=404)
+    return PlainTextResponse(profiler.collapsed(top))
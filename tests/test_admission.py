@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from synapseflow.admission import AdmissionQueue, Overloaded
+from synapseflow.agent import Agent, Memory, Tool
+from synapseflow.tracing import Tracer
+
+def test_round_robin_between_users_and_load_shedding():
+    async def main():
+        q = AdmissionQueue(max_running=1, max_queued=4, max_queued_per_key=3, tracer=Tracer())
+        order, gate = [], asyncio.Event()
+
+        async def job(user, i):
+            async with q.slot(user):
+                order.append((user, i))
+                await gate.wait()
+        first = asyncio.ensure_future(job('a', 0))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(job('a', i)) for i in (1, 2, 3)] + [asyncio.ensure_future(job('b', 1))]
+        await asyncio.sleep(0)
+        assert q.stats()['queued'] == 4
+        with pytest.raises(Overloaded) as exc:
+            await q.acquire('c')
+        assert exc.value.retry_after >= 1
+        gate.set()
+        await asyncio.gather(first, *waiting)
+        return order, q.stats()
+    order, stats = asyncio.run(main())
+    assert order == [('a', 0), ('a', 1), ('b', 1), ('a', 2), ('a', 3)]
+    assert stats['rejected'] == 1 and stats['running'] == 0 and stats['queued'] == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        q = AdmissionQueue(max_running=1, max_queued=2, tracer=Tracer())
+        await q.acquire('a')
+        waiter = asyncio.ensure_future(q.acquire('b'))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        q.release()
+        return q.stats()
+    stats = asyncio.run(main())
+    assert stats['queued'] == 0 and stats['running'] == 0 and stats['cancelled'] == 1
+
+def test_arun_batch_shares_identical_work(tmp_path):
+    calls = []
+
+    def weather(text):
+        calls.append(text)
+        return 'sunny'
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    agent.register_tool(Tool('weather', weather, 'weather forecast'))
+    items = [('u1', 'weather in Sanya'), ('u2', 'weather in Sanya'), ('u3', 'weather in Paris and weather in Sanya')]
+    res = asyncio.run(agent.arun_batch(items))
+    assert sorted(calls) == ['weather in Paris', 'weather in Sanya']
+    assert res[0] == res[1] == [{'step': 'weather in Sanya', 'results': [{'tool': 'weather', 'output': 'sunny'}]}]
+    assert [r['step'] for r in res[2]] == ['weather in Paris', 'weather in Sanya']
+    assert [h['user'] for h in agent.history] == ['u1', 'u2', 'u3']
+    agent.memory.store.close()
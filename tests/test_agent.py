@@ -1,12 +1,31 @@
-from lightagent.agent import Agent, Memory, Tool
-def test_agent_run():
-    mem = Memory(path='memory_test.json')
+import asyncio, time
+from synapseflow.agent import Agent, Memory, Tool
+def test_agent_run(tmp_path):
+    mem = Memory(path=str(tmp_path / 'memory_test.json'))
     agent = Agent(memory=mem)
     # register a dummy tool
     def echo(x): return 'ECHO:'+x
     agent.register_tool(Tool('echo', echo, 'echo tool'))
     res = agent.run('u1', 'echo hello')
     assert res and isinstance(res, list)
+
+def test_agent_arun_concurrent_with_timeout(tmp_path):
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')), tool_timeout=0.5)
+    def slow(x):
+        time.sleep(0.3)
+        return 'SLOW:' + x
+    async def hang(x):
+        await asyncio.sleep(10)
+    agent.register_tool(Tool('slow', slow, 'slow weather tool'))
+    agent.register_tool(Tool('hang', hang, 'hang weather tool', timeout=0.1))
+    t0 = time.monotonic()
+    res = asyncio.run(agent.arun('u1', 'weather a and weather b and weather c'))
+    assert time.monotonic() - t0 < 0.9
+    assert [r['step'] for r in res] == ['weather a', 'weather b', 'weather c']
+    outs = {o['tool']: o['output'] for o in res[0]['results']}
+    assert outs['slow'] == 'SLOW:weather a'
+    assert 'timed out' in outs['hang']
+
 if __name__ == '__main__':
     test_agent_run()
     print('test passed')
@@ -0,0 +1,19 @@
+import json, os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import fakes, run_all
+
+def test_fakes_are_deterministic():
+    a, b = fakes.hash_embed(['weather in sanya', 'stock price'])
+    assert a == fakes.hash_embed(['weather in sanya'])[0] and abs(sum(x * x for x in a) - 1) < 1e-6
+    q = fakes.FakeQdrantAdapter()
+    q.upsert('u1', 'weather in sanya', vector=a)
+    q.upsert('u2', 'weather in sanya', vector=a)
+    q.upsert('u1', 'stock price', vector=b)
+    hits = q.search_by_vector(a, top_k=1, user_id='u1')
+    assert [h['text'] for h in hits] == ['weather in sanya'] and hits[0]['payload']['user_id'] == 'u1'
+
+def test_suite_smoke_and_compare():
+    doc = {'results': {'planner': run_all.bench_planner([30], repeat=3), 'tools': run_all.bench_select_tools([5], queries=10)}}
+    json.dumps(doc)
+    ratios = run_all.compare(doc, doc)
+    assert ratios['planner'][0]['words'] == 1.0 and ratios['tools'][0]['tools'] == 1.0
@@ -0,0 +1,40 @@
+from synapseflow.agent import Memory
+from synapseflow.context import ContextBuilder, count_tokens, truncate
+from synapseflow import openai_integration as oi
+
+def test_truncate_respects_token_budget():
+    text = 'the forecast for Sanya is sunny with a light breeze ' * 20
+    cut = truncate(text, 12)
+    assert count_tokens(cut) <= 12 and cut.endswith('…')
+    assert truncate('short', 12) == 'short'
+
+def test_builder_packs_under_budget_summarizes_and_caches(tmp_path):
+    mem = Memory(path=str(tmp_path / 'mem.json'))
+    for i in range(12):
+        mem.add('u1', f'Trip note {i}: Sanya hotel costs {100 + i} dollars. Booked via email on day {i}.')
+    calls = []
+
+    def summarize(texts, max_tokens):
+        calls.append(len(texts))
+        return f'{len(texts)} older Sanya trip notes'
+    builder = ContextBuilder(memory=mem, budget=80, top_k=10, item_tokens=20, summary_tokens=16, summarize=summarize)
+    results = [{'step': 'weather in Sanya', 'results': [{'tool': 'weather', 'output': 'sunny, 31C'}]}]
+    ctx = builder.build('u1', 'Sanya hotel trip', results)
+    assert count_tokens(ctx) + count_tokens('Sanya hotel trip') <= 80
+    assert ctx.startswith('Earlier context: ') and 'older Sanya trip notes' in ctx
+    assert '- weather in Sanya -> weather: sunny, 31C' in ctx and 'Relevant memory:\n- Trip note' in ctx
+    assert builder.build('u1', 'Sanya hotel trip', results) == ctx
+    assert builder.stats()['prefix_hits'] == 1 and calls == [calls[0]]
+    assert builder.build('u2', 'Sanya hotel trip') == ''
+    mem.store.close()
+
+def test_chat_completion_sends_context():
+    seen = []
+    oi.set_chat_provider(lambda prompt, model, max_tokens, temperature, stream=False: seen.append(prompt) or {'text': 'ok', 'raw': None})
+    try:
+        oi.chat_completion('hotel?', cache=False, context='Relevant memory:\n- Sanya')
+        oi.chat_completion('hotel?', cache=False)
+    finally:
+        oi.set_chat_provider(None)
+    assert seen == ['Relevant memory:\n- Sanya\n\nhotel?', 'hotel?']
+    assert oi._messages('hotel?', 'ctx')[1] == {'role': 'system', 'content': 'ctx'}
@@ -0,0 +1,52 @@
+import threading
+from synapseflow.embedding_service import EmbeddingService
+from synapseflow import openai_integration
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+def test_concurrent_embeds_are_batched_and_cached():
+    fake = FakeProvider()
+    svc = EmbeddingService(fake, batch_window=0.05)
+    texts = [f'text {i % 5}' for i in range(20)]
+    out = [None] * len(texts)
+    def worker(i):
+        out[i] = svc.embed(texts[i])
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert sum(len(c) for c in fake.calls) == 5
+    assert len(fake.calls) < 5
+    assert out[0] == out[5] == fake([texts[0]])[0]
+    svc.embed('text 1')
+    stats = svc.stats()
+    assert stats['misses'] == 5 and stats['hits'] + stats['coalesced'] == 16
+    svc.close()
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / 'emb.sqlite')
+    fake = FakeProvider()
+    svc = EmbeddingService(fake, cache_path=path)
+    first = svc.embed_many(['a', 'bb'])
+    svc.close()
+    svc2 = EmbeddingService(fake, cache_path=path)
+    assert svc2.embed_many(['a', 'bb']) == first
+    assert len(fake.calls) == 1 and svc2.stats()['disk_hits'] == 2
+    svc2.close()
+
+def test_get_embedding_uses_pluggable_provider():
+    calls = []
+    def provider(texts, model):
+        calls.append((model, list(texts)))
+        return [[1.0, 0.0] for _ in texts]
+    openai_integration.set_embedding_provider(provider)
+    try:
+        assert openai_integration.get_embeddings(['x', 'y', 'x']) == [[1.0, 0.0]] * 3
+        assert openai_integration.get_embedding('y') == [1.0, 0.0]
+        assert sum(len(c[1]) for c in calls) == 2
+    finally:
+        openai_integration.set_embedding_provider(None)
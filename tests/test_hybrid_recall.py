@@ -0,0 +1,57 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import fakes
+from synapseflow.hybrid_recall import HybridRecall, reciprocal_rank_fusion
+from synapseflow.embeddings_qdrant import EmbeddingMemory
+from synapseflow.agent import Memory
+from synapseflow import openai_integration as oi
+
+def test_rrf_merges_duplicates_and_ranks_shared_hits_first():
+    keyword = [{'t': 1, 'text': 'flight to Sanya', 'meta': {}}, {'t': 2, 'text': 'hotel price', 'meta': {}}]
+    vector = [{'t': None, 'text': 'Hotel  price', 'meta': {}}, {'t': None, 'text': 'beach weather', 'meta': {}}]
+    out = reciprocal_rank_fusion({'keyword': keyword, 'vector': vector})
+    assert [h['text'] for h in out] == ['hotel price', 'flight to Sanya', 'beach weather']
+    assert out[0]['sources'] == ['keyword', 'vector'] and out[0]['t'] == 2
+
+def test_slow_vector_search_degrades_to_keyword_results():
+    def slow(uid, q, n):
+        time.sleep(0.5)
+        return [{'text': 'late'}]
+    recall = HybridRecall(lambda uid, q, n: [{'t': 1, 'text': 'local', 'meta': {}}], slow, budget=0.05)
+    t0 = time.perf_counter()
+    assert [h['text'] for h in recall.search('u', 'q')] == ['local']
+    assert time.perf_counter() - t0 < 0.3
+    assert recall.stats()['vector_timeouts'] == 1
+    recall.close()
+
+def test_memory_reuses_one_embedding_memory_and_fuses(tmp_path):
+    oi.set_embedding_provider(fakes.hash_embed)
+    try:
+        emb = EmbeddingMemory(adapter=fakes.FakeQdrantAdapter())
+        mem = Memory(path=str(tmp_path / 'mem.json'), adapter=emb.adapter, embeddings=emb)
+        mem.add('u1', 'weather forecast rain')
+        mem.add('u1', 'stock market share price')
+        assert mem.embeddings is emb and len(emb.adapter.points) == 2
+        out = mem.query('u1', 'market price', 2)
+        assert out[0]['text'] == 'stock market share price'
+        assert set(out[0]['sources']) == {'keyword', 'vector'} and out[0]['t'] is not None
+        mem.store.close()
+    finally:
+        oi.set_embedding_provider(None)
+
+def test_records_dropped_by_retention_are_not_recalled_from_vectors(tmp_path):
+    from synapseflow.memory_retention import RetentionPolicy
+    oi.set_embedding_provider(fakes.hash_embed)
+    try:
+        emb = EmbeddingMemory(adapter=fakes.FakeQdrantAdapter())
+        mem = Memory(path=str(tmp_path / 'mem.json'), adapter=emb.adapter, embeddings=emb,
+                     retention=RetentionPolicy(max_records=3, slack=1))
+        mem.add('u1', 'stock market share price')
+        for i in range(4):
+            mem.add('u1', f'weather note {i}')
+        assert len(emb.adapter.points) == 5 and 'stock market share price' not in [r['text'] for r in mem.records('u1')]
+        out = mem.query('u1', 'market share price', 5)
+        assert out and all(h['text'] != 'stock market share price' for h in out)
+        mem.store.close()
+    finally:
+        oi.set_embedding_provider(None)
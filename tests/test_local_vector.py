@@ -0,0 +1,53 @@
+import pytest
+np = pytest.importorskip('numpy')
+from synapseflow.local_vector import LocalVectorIndex, hash_embed
+from synapseflow.agent import Memory
+
+def test_per_user_search_and_reopen(tmp_path):
+    path = str(tmp_path / 'vec')
+    idx = LocalVectorIndex(path, dtype='float16', block_rows=4)
+    for i in range(10):
+        idx.upsert('alice', f'note {i} about the weather forecast in Sanya' if i == 7 else f'stock note {i}')
+        idx.upsert('bob', f'bob item {i}')
+    assert idx.stats()['blocks'] == 6 and idx.stats()['dtype'] == 'float16'
+    hits = idx.query('alice', 'weather forecast Sanya', top_k=3)
+    assert hits[0]['text'].startswith('note 7') and all(h['payload']['user_id'] == 'alice' for h in hits)
+    assert hits[0]['score'] >= hits[1]['score'] >= hits[2]['score']
+    idx.close()
+    again = LocalVectorIndex(path)
+    assert again.query('alice', 'weather forecast Sanya', top_k=1)[0]['text'] == hits[0]['text']
+    assert [h['text'] for h in again.query('bob', 'bob item 3', top_k=1)] == ['bob item 3']
+
+def test_ivf_search_finds_stored_vectors(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(8, 32))
+    vecs = centers[rng.integers(0, 8, 2000)] + 0.1 * rng.normal(size=(2000, 32))
+    idx = LocalVectorIndex(str(tmp_path / 'vec'), ivf_lists=8, nprobe=2, ivf_min_rows=1000)
+    idx.upsert_many([{'user_id': 'u', 'text': f't{i}', 'vector': v.tolist()} for i, v in enumerate(vecs)])
+    assert idx.stats()['ivf_lists'] == 8
+    found = idx.search_many(vecs[:50].tolist(), top_k=1, user_id='u')
+    assert sum(h[0]['text'] == f't{i}' for i, h in enumerate(found)) >= 48
+
+def test_memory_uses_local_index_offline(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOCAL_VECTOR_PATH', str(tmp_path / 'vec'))
+    mem = Memory(path=str(tmp_path / 'mem.json'))
+    mem.add('u1', 'weather forecast says rain in Sanya')
+    mem.add('u1', 'INFY stock closed higher')
+    out = mem.query('u1', 'rain forecast', 2)
+    assert out[0]['text'] == 'weather forecast says rain in Sanya' and set(out[0]['sources']) == {'keyword', 'vector'}
+    assert len(hash_embed(['x'], dim=16)[0]) == 16
+    mem.store.close()
+
+def test_local_embeddings_are_cached_apart_from_openai(monkeypatch):
+    from synapseflow import openai_integration as oi
+    monkeypatch.setenv('EMBEDDING_PROVIDER', 'local')
+    monkeypatch.setenv('QDRANT_VECTOR_SIZE', '16')
+    oi.set_embedding_provider(None)
+    try:
+        svc = oi.embedding_service()
+        assert svc.model == 'local:16' and svc.key('x') != oi.EmbeddingService(None, model='text-embedding-3-small').key('x')
+        assert len(oi.get_embedding('rain in Sanya')) == 16
+        monkeypatch.setenv('EMBEDDING_PROVIDER', 'openai')
+        assert oi.embedding_service() is not svc and oi.embedding_service().model == 'text-embedding-3-small'
+    finally:
+        oi.set_embedding_provider(None)
@@ -0,0 +1,131 @@
+import json
+from synapseflow.agent import Memory
+from synapseflow.memory_store import LogStore
+
+def test_log_store_replay(tmp_path):
+    path = str(tmp_path / 'mem.json')
+    mem = Memory(path=path)
+    mem.add('u1', 'visited sanya beach')
+    mem.add('u1', 'booked hotel')
+    mem.store.close()
+    mem2 = Memory(path=path)
+    assert [r['text'] for r in mem2.records('u1')] == ['visited sanya beach', 'booked hotel']
+
+def test_log_store_compaction_and_torn_tail(tmp_path):
+    path = str(tmp_path / 'mem.json')
+    mem = Memory(path=path, store=LogStore(path, compact_every=3))
+    for i in range(5):
+        mem.add('u1', f'note {i}')
+    mem.store.close()
+    with open(path + '.log', 'a') as f:
+        f.write('{"u":"u1","n":99,"text":"half')
+    mem2 = Memory(path=path)
+    assert [r['text'] for r in mem2.records('u1')] == [f'note {i}' for i in range(5)]
+    mem2.add('u1', 'after recovery')
+    mem2.store.close()
+    assert Memory(path=path).records('u1')[-1]['text'] == 'after recovery'
+
+def test_legacy_json_file(tmp_path):
+    path = tmp_path / 'mem.json'
+    path.write_text(json.dumps({'u1': [{'t': 1.0, 'text': 'old', 'meta': {}}]}, indent=2))
+    mem = Memory(path=str(path))
+    assert mem.records('u1')[0]['text'] == 'old'
+
+def test_query_bm25_prefers_relevant_and_recent(tmp_path):
+    mem = Memory(path=str(tmp_path / 'mem.json'))
+    mem.add('u1', 'weather in sanya is sunny')
+    mem.add('u1', 'stock INFY went up')
+    mem.add('u1', 'sanya weather update: rain')
+    mem.add('u2', 'sanya weather for someone else')
+    res = mem.query('u1', 'Sanya weather?', top_k=2)
+    assert [r['text'] for r in res] == ['sanya weather update: rain', 'weather in sanya is sunny']
+    assert mem.query('u1', 'nothing matches', top_k=3) == []
+    assert mem.query('nobody', 'sanya') == []
+
+def test_sqlite_store_shared_between_workers(tmp_path):
+    from synapseflow.memory_store import SqliteStore
+    path = str(tmp_path / 'mem.db')
+    a = Memory(path=path, store=SqliteStore(path))
+    b = Memory(path=path, store=SqliteStore(path))
+    a.add('u1', 'sanya weather is sunny')
+    b.add('u1', 'stock INFY went up')
+    b.add('u1', 'sanya weather update: rain')
+    assert [r['text'] for r in a.query('u1', 'sanya weather', top_k=2)] == ['sanya weather update: rain', 'sanya weather is sunny']
+    assert b.query('u1', 'INFY')[0]['text'] == 'stock INFY went up'
+    assert a.query('u2', 'sanya') == []
+
+def test_sqlite_store_tail_mirroring_without_fts(tmp_path):
+    from synapseflow.memory_store import SqliteStore
+    path = str(tmp_path / 'mem.db')
+    sa, sb = SqliteStore(path), SqliteStore(path)
+    sa.searchable = sb.searchable = False
+    a, b = Memory(path=path, store=sa), Memory(path=path, store=sb)
+    a.add('u1', 'first note')
+    b.add('u1', 'second note')
+    assert sorted(r['text'] for r in a.query('u1', 'note')) == ['first note', 'second note']
+    assert len(b.records('u1')) == 2
+
+def test_sharded_store_lazy_load_and_lru_eviction(tmp_path):
+    from synapseflow.memory_store import ShardedLogStore
+    mem = Memory(store=ShardedLogStore(str(tmp_path / 'shards')), max_loaded_users=2)
+    for uid in ['a', 'b', 'c']:
+        mem.add(uid, f'{uid} likes sanya')
+    assert list(mem._loaded) == ['b', 'c'] and 'a' not in mem._data
+    assert mem.query('a', 'sanya')[0]['text'] == 'a likes sanya'
+    assert list(mem._loaded) == ['c', 'a']
+    mem.store.close()
+    fresh = Memory(store=ShardedLogStore(str(tmp_path / 'shards')))
+    assert fresh._data == {} and fresh.records('b')[0]['text'] == 'b likes sanya'
+
+def test_retention_max_records_with_summary(tmp_path):
+    from synapseflow.memory_retention import RetentionPolicy
+    from synapseflow.memory_store import ShardedLogStore
+    summaries = []
+    def summarize(uid, dropped):
+        summaries.append(len(dropped))
+        return f'{len(dropped)} older notes'
+    policy = RetentionPolicy(max_records=5, slack=2, summarize=summarize)
+    mem = Memory(store=ShardedLogStore(str(tmp_path / 'shards')), retention=policy)
+    for i in range(20):
+        mem.add('u1', f'note {i}')
+        assert len(mem.records('u1')) <= 5 + 2
+    recs = mem.records('u1')
+    assert recs[0]['meta']['summary'] and recs[-1]['text'] == 'note 19'
+    assert mem.query('u1', 'note 0') and all(r['text'] != 'note 0' for r in mem.query('u1', 'note 0', top_k=10))
+    mem.store.close()
+    assert [r['text'] for r in Memory(store=ShardedLogStore(str(tmp_path / 'shards'))).records('u1')] == [r['text'] for r in recs]
+
+def test_retention_max_age_on_sqlite(tmp_path):
+    import time
+    from synapseflow.memory_retention import RetentionPolicy
+    from synapseflow.memory_store import SqliteStore
+    path = str(tmp_path / 'mem.db')
+    mem = Memory(path=path, store=SqliteStore(path), retention=RetentionPolicy(max_age=3600, slack=1))
+    mem.store.append('u1', {'t': time.time() - 7200, 'text': 'ancient note', 'meta': {}})
+    mem.add('u1', 'fresh note')
+    assert [r['text'] for r in mem.records('u1')] == ['fresh note']
+
+def test_retention_summary_is_not_resummarized_by_age(tmp_path):
+    import time
+    from synapseflow.memory_retention import RetentionPolicy
+    from synapseflow.memory_store import ShardedLogStore, SqliteStore
+    calls = []
+    def summarize(uid, dropped):
+        calls.append([r['text'] for r in dropped])
+        return f'summary of {len(dropped)}'
+    store = ShardedLogStore(str(tmp_path / 'shards'))
+    store.append('u1', {'t': time.time() - 7200, 'text': 'ancient', 'meta': {}})
+    mem = Memory(store=store, retention=RetentionPolicy(max_age=3600, slack=1, summarize=summarize))
+    for i in range(5):
+        mem.add('u1', f'note {i}')
+    assert calls == [['ancient']]
+    assert [r['text'] for r in mem.records('u1')] == ['summary of 1'] + [f'note {i}' for i in range(5)]
+    mem.store.close()
+    calls.clear()
+    path = str(tmp_path / 'mem.db')
+    mem = Memory(path=path, store=SqliteStore(path), retention=RetentionPolicy(max_age=3600, slack=1, summarize=summarize))
+    mem.store.append('u1', {'t': time.time() - 7200, 'text': 'ancient', 'meta': {}})
+    for i in range(5):
+        mem.add('u1', f'note {i}')
+    assert calls == [['ancient']]
+    mem.store.close()
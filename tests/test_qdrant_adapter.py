@@ -0,0 +1,85 @@
+import queue, threading, pytest
+from synapseflow.qdrant_adapter import BufferedWriter
+
+def test_buffered_writer_flushes_by_size_and_time():
+    batches = []
+    w = BufferedWriter(batches.append, batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        w.put({'user_id': 'u', 'text': str(i)})
+    w.flush()
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert [r['text'] for b in batches for r in b] == [str(i) for i in range(25)]
+    w.close()
+
+def test_buffered_writer_back_pressure():
+    gate = threading.Event()
+    w = BufferedWriter(lambda batch: gate.wait(), batch_size=1, flush_interval=0.01, max_pending=2, put_timeout=0.05)
+    with pytest.raises(queue.Full):
+        for i in range(10):
+            w.put({'user_id': 'u', 'text': str(i)})
+    gate.set()
+    w.close()
+
+class FakeClient:
+    def __init__(self, vectors=None, payload_schema=None):
+        from types import SimpleNamespace
+        self.info = None if vectors is None else SimpleNamespace(
+            config=SimpleNamespace(params=SimpleNamespace(vectors=vectors)), payload_schema=payload_schema or {})
+        self.created, self.indexes, self.calls = [], [], []
+
+    def get_collection(self, collection_name):
+        if self.info is None:
+            raise KeyError(collection_name)
+        return self.info
+
+    def create_collection(self, **kw):
+        self.created.append(kw)
+
+    def create_payload_index(self, **kw):
+        self.indexes.append(kw)
+
+    def search(self, **kw):
+        self.calls.append(kw)
+        return []
+
+    def scroll(self, **kw):
+        self.calls.append(kw)
+        return [], None
+
+def make_adapter(monkeypatch, client, **kw):
+    from synapseflow import qdrant_adapter
+    monkeypatch.delenv('QDRANT_VECTOR_SIZE', raising=False)
+    monkeypatch.setattr(qdrant_adapter, 'get_client', lambda url, api_key=None: client)
+    return qdrant_adapter.QdrantAdapter(url='http://qdrant.test', **kw)
+
+def test_ensure_collection_creates_collection_and_user_index(monkeypatch):
+    pytest.importorskip('qdrant_client')
+    client = FakeClient()
+    make_adapter(monkeypatch, client, vector_size=8)
+    assert len(client.created) == 1 and client.created[0]['vectors_config']['text'].size == 8
+    assert [i['field_name'] for i in client.indexes] == ['user_id']
+    client = FakeClient(vectors={'text': type('P', (), {'size': 8})()}, payload_schema={'user_id': 'keyword'})
+    make_adapter(monkeypatch, client, vector_size=8)
+    assert client.created == [] and client.indexes == []
+
+def test_vector_size_mismatch(monkeypatch):
+    pytest.importorskip('qdrant_client')
+    existing = {'text': type('P', (), {'size': 768})()}
+    assert make_adapter(monkeypatch, FakeClient(vectors=existing)).vector_size == 768
+    with pytest.raises(RuntimeError):
+        make_adapter(monkeypatch, FakeClient(vectors=existing), vector_size=384)
+    monkeypatch.setenv('QDRANT_VECTOR_SIZE', '384')
+    from synapseflow import qdrant_adapter
+    with pytest.raises(RuntimeError):
+        qdrant_adapter.QdrantAdapter(url='http://qdrant.test')
+
+def test_queries_are_scoped_to_the_user(monkeypatch):
+    pytest.importorskip('qdrant_client')
+    client = FakeClient()
+    adapter = make_adapter(monkeypatch, client, vector_size=2)
+    adapter.query('alice', 'weather', vector=[0.1, 0.2])
+    adapter.query('alice', 'weather')
+    search, scroll = client.calls
+    for flt in (search['query_filter'], scroll['scroll_filter']):
+        assert flt.must[0].key == 'user_id' and flt.must[0].match.value == 'alice'
+    assert search['query_vector'].name == 'text'
@@ -0,0 +1,58 @@
+import asyncio, threading, time
+from synapseflow import openai_integration as oi
+from synapseflow.response_cache import ResponseCache
+
+class FakeChat:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+    def __call__(self, prompt, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        time.sleep(self.delay)
+        if stream:
+            return iter(['echo: ', prompt])
+        return {'text': 'echo: ' + prompt, 'raw': None}
+
+def setup(tmp_path=None, delay=0.0):
+    fake = FakeChat(delay)
+    oi.set_chat_provider(fake)
+    oi.set_response_cache(ResponseCache(ttl=60, max_entries=8, path=str(tmp_path / 'rc.sqlite') if tmp_path else None))
+    return fake
+
+def teardown_function(_):
+    oi.set_chat_provider(None)
+    oi.set_response_cache(None)
+
+def test_completion_cached_and_keyed_on_params():
+    fake = setup()
+    first = oi.chat_completion('hi  there')
+    assert first['text'] == 'echo: hi  there' and first['cached'] is False
+    assert oi.chat_completion('hi there')['cached'] is True
+    assert oi.chat_completion('hi there', temperature=0.9)['cached'] is False
+    assert oi.chat_completion('hi there', cache=False)['cached'] is False
+    assert fake.calls == 3
+
+def test_single_flight_coalesces_concurrent_prompts():
+    fake = setup(delay=0.1)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(oi.chat_completion('same')['text'])) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert fake.calls == 1 and out == ['echo: same'] * 8
+
+def test_stream_replay_and_disk_tier(tmp_path):
+    fake = setup(tmp_path)
+    assert list(oi.chat_stream('plan')) == ['echo: ', 'plan']
+    oi.set_response_cache(ResponseCache(ttl=60, path=str(tmp_path / 'rc.sqlite')))
+    assert list(oi.chat_stream('plan')) == ['echo: ', 'plan']
+    async def collect():
+        return [c async for c in oi.achat_stream('plan')]
+    assert asyncio.run(collect()) == ['echo: ', 'plan']
+    assert fake.calls == 1
+
+def test_ttl_and_lru_eviction():
+    rc = ResponseCache(ttl=60, max_entries=2)
+    rc.put('a', 1); rc.put('b', 2); rc.put('c', 3)
+    assert rc.get('a') is None and rc.get('c') == 3
+    rc.put('d', 4, ttl=-1)
+    assert rc.get('d') is None
@@ -0,0 +1,56 @@
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
+from synapseflow.agent import Agent, Memory, Planner, Tool
+from synapseflow.scheduler import PlanNode, run_dag, arun_dag
+
+def test_plan_graph_dependencies_and_dedupe():
+    nodes = Planner.plan_graph('check weather Sanya. Check weather sanya; find stock INFY and then compare the results')
+    assert [n.step for n in nodes] == ['check weather Sanya', 'find stock INFY', 'compare the results']
+    assert [n.deps for n in nodes] == [[], [], [1]]
+    assert [n.deps for n in Planner.plan_graph('search news about INFY then summarize it')] == [[], [0]]
+
+def test_mid_sentence_that_does_not_chain_steps(tmp_path):
+    query = 'find stock INFY; check that the weather is fine'
+    assert [n.deps for n in Planner.plan_graph(query)] == [[], []]
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    for name, desc in (('stock', 'find stock'), ('weather', 'check weather')):
+        async def slow(q):
+            await asyncio.sleep(0.2)
+            return 'ok'
+        agent.register_tool(Tool(name, slow, desc))
+    t0 = time.monotonic()
+    res = asyncio.run(agent.arun('u1', query))
+    assert time.monotonic() - t0 < 0.35 and [r['results'][0]['output'] for r in res] == ['ok', 'ok']
+    agent.memory.store.close()
+
+def test_run_dag_parallel_and_critical_path():
+    nodes = [PlanNode(0, 'a'), PlanNode(1, 'b'), PlanNode(2, 'c', [0])]
+    def run(node, inputs):
+        time.sleep(0.1)
+        return node.step + ''.join(inputs.values())
+    with ThreadPoolExecutor(4) as pool:
+        t0 = time.monotonic()
+        res = run_dag(nodes, run, pool)
+    assert time.monotonic() - t0 < 0.28
+    assert res.results == {0: 'a', 1: 'b', 2: 'ca'}
+    assert res.critical_path == [0, 2]
+    assert res.critical_path_ms >= 190
+
+def test_arun_dag_orders_dependents():
+    order = []
+    async def run(node, inputs):
+        await asyncio.sleep(0.05 if node.id == 0 else 0)
+        order.append(node.id)
+        return node.id
+    res = asyncio.run(arun_dag([PlanNode(0, 'a'), PlanNode(1, 'b', [0]), PlanNode(2, 'c')], run))
+    assert order.index(0) < order.index(1) and order[0] == 2
+    assert res.results == {0: 0, 1: 1, 2: 2}
+
+def test_agent_passes_dependency_context(tmp_path):
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    agent.register_tool(Tool('news', lambda q: 'headline', 'search news'))
+    agent.register_tool(Tool('summary', lambda q, context=None: len(context or []), 'summarize'))
+    res = agent.run('u1', 'search news then summarize')
+    assert res[1]['depends_on'] == ['search news']
+    assert {o['tool']: o['output'] for o in res[1]['results']}['summary'] == 1
+    assert 'critical_path_ms' in agent.history[-1]
@@ -0,0 +1,106 @@
+import asyncio, threading, time
+from synapseflow.streaming import aiter_in_thread, coalesce, sse_events, sse_frame
+
+def test_aiter_in_thread_stops_upstream_on_close():
+    closed = threading.Event()
+    def upstream():
+        try:
+            for i in range(1000):
+                time.sleep(0.001)
+                yield f'tok{i} '
+        finally:
+            closed.set()
+    async def main():
+        got = []
+        agen = aiter_in_thread(upstream, maxsize=4)
+        async for chunk in agen:
+            got.append(chunk)
+            if len(got) == 3:
+                break
+        await agen.aclose()
+        return got
+    assert asyncio.run(main()) == ['tok0 ', 'tok1 ', 'tok2 ']
+    assert closed.wait(1.0)
+
+def test_coalesce_and_sse_frames():
+    async def tokens():
+        for t in ['a', 'b', 'c', 'line1\nline2']:
+            yield t
+        await asyncio.sleep(0.05)
+        yield 'late'
+    async def main():
+        return [f async for f in sse_events(coalesce(tokens(), max_chars=3, max_delay=0.01), heartbeat=0.02)]
+    frames = asyncio.run(main())
+    assert frames[0] == sse_frame('abc')
+    assert frames[1] == 'data: line1\ndata: line2\n\n'
+    assert any(f.startswith('event: heartbeat') for f in frames)
+    assert frames[-2:] == [sse_frame('late'), sse_frame('', event='done')]
+
+def test_sse_events_stops_on_disconnect():
+    async def tokens():
+        while True:
+            await asyncio.sleep(0.001)
+            yield 'x'
+    async def main():
+        n = 0
+        async def disconnected():
+            return n >= 5
+        async for _ in sse_events(tokens(), disconnected):
+            n += 1
+        return n
+    assert asyncio.run(main()) == 5
+
+def test_arun_stream_emits_fast_tool_before_slow_one(tmp_path):
+    from synapseflow.agent import Agent, Memory, Tool
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+
+    async def slow_news(text):
+        await asyncio.sleep(0.3)
+        return 'headlines'
+
+    def weather_feed(text):
+        for part in ('sun', 'ny'):
+            yield part
+    agent.register_tool(Tool('news', slow_news, 'news headlines'))
+    agent.register_tool(Tool('weather', weather_feed, 'weather forecast'))
+
+    async def main():
+        t0, seen = time.perf_counter(), []
+        async for ev in agent.arun_stream('u', 'news today and weather in Sanya'):
+            seen.append((ev['event'], ev.get('tool'), ev.get('data'), time.perf_counter() - t0))
+            if ev['event'] == 'result':
+                result = ev['result']
+        return seen, result
+    seen, result = asyncio.run(main())
+    assert seen[0][0] == 'plan'
+    assert [s[2] for s in seen if s[0] == 'chunk'] == ['sun', 'ny']
+    first_tool = next(s for s in seen if s[0] == 'tool')
+    assert first_tool[1] == 'weather' and first_tool[3] < 0.2
+    assert [s[0] for s in seen[-2:]] == ['step', 'result']
+    assert result[1]['results'] == [{'tool': 'weather', 'output': 'sunny'}]
+
+    events = list(agent.run_stream('u', 'weather in Sanya'))
+    assert [e['event'] for e in events] == ['plan', 'chunk', 'chunk', 'tool', 'step', 'result']
+    assert asyncio.run(agent.arun('u', 'weather in Sanya'))[0]['results'][0]['output'] == 'sunny'
+    agent.memory.store.close()
+
+def test_async_generator_tool_on_sync_run(tmp_path):
+    from synapseflow.agent import Agent, Memory, Tool
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+
+    async def weather_feed(text):
+        for part in ('sun', 'ny'):
+            await asyncio.sleep(0)
+            yield part
+    agent.register_tool(Tool('weather', weather_feed, 'weather forecast'))
+    assert agent.run('u', 'weather in Sanya')[0]['results'][0]['output'] == 'sunny'
+    events = list(agent.run_stream('u', 'weather in Sanya'))
+    assert [e.get('data') for e in events if e['event'] == 'chunk'] == ['sun', 'ny']
+    agent.memory.store.close()
+
+def test_sse_events_named_events():
+    async def events():
+        yield ('tool', '{"tool": "weather"}')
+    async def main():
+        return [f async for f in sse_events(events())]
+    assert asyncio.run(main())[0] == sse_frame('{"tool": "weather"}', event='tool')
@@ -0,0 +1,99 @@
+import asyncio, os, tempfile
+from synapseflow.agent import Agent, LightSwarm, Memory, Tool
+from synapseflow.swarm_process import HostedAgent
+
+def make_agent(name, tool, desc, delay=0.0, fail=False):
+    async def func(text):
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError('down')
+        return f'{name}: {text}'
+    agent = Agent(name, memory=Memory(path=os.path.join(tempfile.mkdtemp(), 'mem.json')))
+    agent.register_tool(Tool(tool, func, desc))
+    if fail:
+        async def broken(user_id, query, use_planner=True, remember=True):
+            await asyncio.sleep(delay)
+            raise RuntimeError('agent down')
+        agent.arun = broken
+    return agent
+
+def hosted_factory():
+    agent = Agent('hosted', memory=Memory(path=os.path.join(tempfile.mkdtemp(), 'mem.json')))
+    agent.register_tool(Tool('stock_price', lambda text: f'pid {os.getpid()}', 'stock market price'))
+    return agent
+
+def test_route_broadcast_and_shared_memory(tmp_path):
+    mem = Memory(path=str(tmp_path / 'mem.json'))
+    swarm = LightSwarm(memory=mem)
+    swarm.register_agent(make_agent('weather_bot', 'forecast', 'weather forecast rain', delay=0.01))
+    swarm.register_agent(make_agent('stocks_bot', 'quote', 'stock market price', delay=0.2))
+    swarm.register_agent(make_agent('broken_bot', 'noop', 'nothing', fail=True))
+    assert swarm.route('stock price for INFY') == ['stocks_bot']
+    res = asyncio.run(swarm.arun(None, 'weather in Sanya', user_id='alice'))
+    assert res[0]['results'][0]['output'] == 'weather_bot: weather in Sanya'
+
+    first = asyncio.run(swarm.broadcast('weather in Sanya', 'bob', mode='first'))
+    assert list(first['results']) == ['weather_bot'] and first['complete']
+    every = asyncio.run(swarm.broadcast('weather in Sanya', 'bob'))
+    assert set(every['results']) == {'weather_bot', 'stocks_bot'} and 'broken_bot' in every['errors']
+    assert not every['complete']
+    assert [r['text'] for r in mem.query('bob', 'weather Sanya', 10)] == ['weather in Sanya', 'weather in Sanya']
+    assert mem.query('alice', 'weather Sanya') and not mem.query('swarm_user', 'weather Sanya')
+    mem.store.close()
+
+def test_hedge_uses_backup_when_primary_is_slow():
+    swarm = LightSwarm(hedge_after=0.05)
+    swarm.register_agent(make_agent('slow', 'forecast', 'weather forecast', delay=1.0))
+    swarm.register_agent(make_agent('fast', 'forecast2', 'weather', delay=0.01))
+    out = asyncio.run(swarm.hedge('weather in Sanya', 'u', primary='slow'))
+    assert out['agent'] == 'fast' and out['hedged']
+    out = asyncio.run(swarm.hedge('weather in Sanya', 'u', primary='fast', backup='slow'))
+    assert out['agent'] == 'fast' and not out['hedged']
+
+def test_hedge_backs_up_early_failures_and_cancels_primary():
+    swarm = LightSwarm(hedge_after=1.0)
+    assert asyncio.run(swarm.hedge('weather in Sanya')) == {'error': 'agent not found'}
+    swarm.register_agent(make_agent('broken', 'noop', 'weather forecast', fail=True))
+    swarm.register_agent(make_agent('fast', 'forecast', 'weather', delay=0.01))
+    out = asyncio.run(asyncio.wait_for(swarm.hedge('weather in Sanya', 'u', primary='broken'), 0.5))
+    assert out['agent'] == 'fast' and out['hedged']
+    started, cancelled = [], []
+    async def stuck(user_id, query, use_planner=True, remember=True):
+        started.append(query)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+    swarm.agents['fast'].arun = stuck
+    async def caller():
+        task = asyncio.ensure_future(swarm.hedge('weather in Sanya', 'u', primary='fast'))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert started == cancelled == ['weather in Sanya']  # before asyncio.run cancels leftovers
+    asyncio.run(caller())
+
+def test_hosted_agent_runs_in_a_worker_process():
+    hosted = HostedAgent('hosted', 'test_swarm:hosted_factory')
+    try:
+        swarm = LightSwarm()
+        swarm.register_agent(hosted)
+        assert swarm.route('stock price') == ['hosted']
+        out = asyncio.run(swarm.arun('hosted', 'stock price INFY', 'u'))
+        assert out[0]['results'][0]['output'] != f'pid {os.getpid()}'
+    finally:
+        hosted.shutdown()
+
+def test_cancelled_member_is_recorded_not_raised():
+    swarm = LightSwarm(hedge_after=0.05)
+    swarm.register_agent(make_agent('ok', 'forecast', 'weather forecast', delay=0.1))
+    swarm.register_agent(make_agent('gone', 'forecast2', 'weather'))
+    async def cancelled(user_id, query, use_planner=True, remember=True):
+        raise asyncio.CancelledError()
+    swarm.agents['gone'].arun = cancelled
+    out = asyncio.run(swarm.broadcast('weather in Sanya', 'u'))
+    assert out['errors'] == {'gone': 'cancelled'} and list(out['results']) == ['ok']
+    out = asyncio.run(swarm.hedge('weather in Sanya', 'u', primary='gone', backup='ok'))
+    assert out['agent'] == 'ok' and out['hedged']
@@ -0,0 +1,119 @@
+import asyncio, threading, time
+import pytest
+from synapseflow.agent import Agent, LightSwarm, Memory, Tool
+from synapseflow.tool_cache import CachePolicy, ToolCache
+
+def counting(fail=False, delay=0.0):
+    calls = []
+    def fn(x):
+        calls.append(x)
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError('upstream down')
+        return f'{x}#{len(calls)}'
+    return fn, calls
+
+def test_policy_from_meta():
+    assert CachePolicy.from_meta({'tool_name': 'x'}) is None
+    assert CachePolicy.from_meta({'tool_cacheable': False, 'tool_cache_ttl': 5}) is None
+    p = CachePolicy.from_meta({'tool_cache_ttl': 5, 'tool_cache_negative_ttl': 1})
+    assert (p.ttl, p.stale, p.negative_ttl) == (5.0, 0.0, 1.0)
+
+def test_hit_on_normalized_input_and_lru_bound():
+    cache = ToolCache(max_entries=2)
+    fn, calls = counting()
+    policy = CachePolicy(ttl=60, casefold=True)
+    assert cache.call('t', 'Check  weather', fn, policy) == 'Check  weather#1'
+    assert cache.call('t', 'check weather', fn, policy) == 'Check  weather#1'
+    cache.call('t', 'b', fn, policy)
+    cache.call('t', 'c', fn, policy)
+    cache.call('t', 'check weather', fn, policy)
+    assert len(calls) == 4
+    stats = cache.stats()
+    assert stats['evictions'] >= 1 and stats['tools']['t']['hits'] == 1
+
+def test_case_is_kept_unless_the_tool_opts_in():
+    cache = ToolCache()
+    fn, calls = counting()
+    policy = CachePolicy.from_meta({'tool_cache_ttl': 60})
+    assert cache.call('quote', 'AAPL', fn, policy) == 'AAPL#1'
+    assert cache.call('quote', ' AAPL ', fn, policy) == 'AAPL#1'
+    assert cache.call('quote', 'aapl', fn, policy) == 'aapl#2'
+    assert CachePolicy.from_meta({'tool_cache_ttl': 60, 'tool_cache_casefold': True}).casefold
+
+def test_stale_while_revalidate_and_negative_cache():
+    cache = ToolCache()
+    fn, calls = counting()
+    cache.call('t', 'a', fn, CachePolicy(ttl=0.05, stale=10))
+    time.sleep(0.08)
+    assert cache.call('t', 'a', fn, CachePolicy(ttl=0.05, stale=10)) == 'a#1'  # stale value, refresh in background
+    for _ in range(50):
+        if cache.stats()['refreshes'] and len(calls) == 2 and not cache._refreshing:
+            break
+        time.sleep(0.01)
+    assert cache.call('t', 'a', fn, CachePolicy(ttl=0.05, stale=10)) == 'a#2'
+    bad, bad_calls = counting(fail=True)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            cache.call('bad', 'a', bad, CachePolicy(ttl=60, negative_ttl=60))
+    assert len(bad_calls) == 1 and cache.stats()['negative_hits'] == 2
+
+def test_concurrent_misses_share_one_call():
+    cache = ToolCache()
+    fn, calls = counting(delay=0.1)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.call('t', 'x', fn, CachePolicy()))) for _ in range(5)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len(calls) == 1 and out == ['x#1'] * 5
+
+def test_swarm_agents_share_cache(tmp_path):
+    swarm = LightSwarm()
+    fn, calls = counting()
+    for name in ('a', 'b'):
+        agent = Agent(name, memory=Memory(path=str(tmp_path / f'{name}.json')))
+        agent.register_tool(Tool('weather', fn, 'check weather', cache=CachePolicy(ttl=60, casefold=True)))
+        swarm.register_agent(agent)
+    swarm.run('a', 'check weather Sanya')
+    asyncio.run(swarm.agents['b'].arun('u', 'check  weather sanya'))
+    assert len(calls) == 1
+    assert swarm.cache_stats()['hit_rate'] == 0.5
+
+def test_timed_out_leader_does_not_cancel_followers(tmp_path):
+    calls = []
+    async def slow(text):
+        calls.append(text)
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.05)
+        return 'done'
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')), tool_timeout=0.3)
+    agent.register_tool(Tool('slow', slow, 'slow lookup', cache=CachePolicy(ttl=60)))
+
+    async def main():
+        leader = asyncio.ensure_future(agent.arun('u', 'slow lookup', use_planner=False))
+        await asyncio.sleep(0.2)
+        follower = asyncio.ensure_future(agent.arun('u', 'slow lookup', use_planner=False))
+        return await asyncio.gather(leader, follower)
+    leader, follower = asyncio.run(main())
+    assert leader[0]['results'][0]['output'] == 'Tool slow timed out after 0.3s'
+    assert follower[0]['results'][0]['output'] == 'done' and len(calls) == 2
+    agent.memory.store.close()
+
+def test_async_stale_refresh_is_kept_and_skips_request_callback():
+    cache = ToolCache()
+    chunks = []
+    async def fn(x, on_chunk=chunks.append):
+        on_chunk and on_chunk('chunk')
+        return x
+    policy = CachePolicy(ttl=0.01, stale=10)
+
+    async def main():
+        await cache.acall('t', 'a', fn, policy, refresh=lambda s: fn(s, None))
+        await asyncio.sleep(0.02)
+        assert await cache.acall('t', 'a', fn, policy, refresh=lambda s: fn(s, None)) == 'a'
+        assert len(cache._tasks) == 1
+        await asyncio.sleep(0.01)
+        assert not cache._tasks
+    asyncio.run(main())
+    assert chunks == ['chunk'] and cache.stats()['refreshes'] == 1
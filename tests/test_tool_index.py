@@ -0,0 +1,43 @@
+from synapseflow.tool_index import ToolIndex
+
+def make_index():
+    idx = ToolIndex()
+    idx.add('get_weather', 'Fetch simple weather text from wttr.in (demo)')
+    idx.add('search_news', 'Demo news search returning templated results')
+    idx.add('simple_stock', 'Demo stock price tool (placeholder)')
+    return idx
+
+def test_select_and_fallback():
+    idx = make_index()
+    assert idx.select('check weather Sanya')[0] == 'get_weather'
+    assert idx.select('find stock INFY', top_n=1) == ['simple_stock']
+    assert idx.select('zzz', top_n=2) == ['get_weather', 'search_news']
+
+def test_select_many_matches_single_and_updates_incrementally():
+    idx = make_index()
+    steps = ['check weather Sanya', 'latest news', 'find stock INFY']
+    assert idx.select_many(steps) == [idx.select(s) for s in steps]
+    idx.remove('get_weather')
+    idx.add('forecast', 'Weather forecast for a city')
+    assert idx.select_many(steps)[0][0] == 'forecast'
+    assert 'get_weather' not in idx.select('weather', top_n=5)
+
+def test_matrix_is_updated_in_place_and_matches_postings():
+    import random
+    idx = make_index()
+    words = ['weather', 'news', 'stock', 'price', 'city', 'forecast', 'rain', 'market', 'search', 'demo']
+    rng = random.Random(0)
+    steps = [' '.join(rng.sample(words, 3)) for _ in range(20)]
+    for i in range(30):
+        name = f'tool_{rng.randrange(8)}'
+        if name in idx.order and rng.random() < 0.5:
+            idx.remove(name)
+        else:
+            idx.add(name, ' '.join(rng.sample(words, 4)))
+        for got, s in zip(idx.score_many(steps), steps):
+            want = idx.score(s)
+            assert got.keys() == want.keys() and all(abs(got[n] - want[n]) < 1e-4 for n in want)
+    tf = idx._tf
+    idx.remove('get_weather')
+    idx.add('get_weather', 'Fetch simple weather text from wttr.in (demo)')
+    assert idx._tf is tf and idx.select_many(steps) == [idx.select(s) for s in steps]  # freed row reused, no rebuild
@@ -0,0 +1,35 @@
+import sys
+from synapseflow.agent import Agent, Memory, LazyTool
+from synapseflow.tool_manifest import build_manifest, scan_tool_source
+
+def write_pkg(tmp_path, name='lazytools_pkg'):
+    pkg = tmp_path / name
+    pkg.mkdir()
+    (pkg / 'shout.py').write_text(
+        "import sys\nsys.modules.setdefault('_shout_imported', True)\n"
+        "def shout(input_text: str) -> str:\n    return input_text.upper()\n"
+        "tool_name = 'shout'\ntool_description = 'Uppercase the input'\ntool_cache_ttl = 30\n")
+    sys.path.insert(0, str(tmp_path))
+    return pkg
+
+def test_scan_tool_source_picks_named_function():
+    ent = scan_tool_source("def b(x): pass\nasync def a(x): pass\ntool_name = 'b'\ntool_params = [{'name': 'x'}]\n")
+    assert ent['func'] == 'b' and not ent['is_async'] and ent['meta']['tool_params'] == [{'name': 'x'}]
+    assert scan_tool_source("x = 1\n") is None
+
+def test_discover_registers_without_import(tmp_path):
+    pkg = write_pkg(tmp_path)
+    try:
+        agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+        agent.discover_tools('lazytools_pkg')
+        tool = agent.tools['shout']
+        assert isinstance(tool, LazyTool) and tool.description == 'Uppercase the input'
+        assert 'lazytools_pkg.shout' not in sys.modules
+        assert tool.run('hi') == 'HI'
+        assert 'lazytools_pkg.shout' in sys.modules
+        cached = build_manifest('lazytools_pkg')
+        assert (pkg / '.manifest.json').exists() and cached[0]['meta']['tool_cache_ttl'] == 30
+    finally:
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop('lazytools_pkg.shout', None)
+        sys.modules.pop('lazytools_pkg', None)
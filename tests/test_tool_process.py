@@ -0,0 +1,78 @@
+import asyncio, os, textwrap, time
+import pytest
+from synapseflow.agent import Agent, Memory, ProcessTool
+from synapseflow.tool_process import ProcessToolPool, ToolLimitExceeded
+
+TOOL = '''
+import os, time
+def busy(input_text: str) -> str:
+    if 'spin' in input_text:
+        while True:
+            pass
+    if 'sleep' in input_text:
+        time.sleep(30)
+    if 'hog' in input_text:
+        return str(len(bytearray(400 * 1024 * 1024)))
+    return f'{input_text}@{os.getpid()}'
+
+def stuck(input_text: str) -> str:
+    # ignores its itimers, like a worker blocked in C code
+    import signal
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM, signal.SIGPROF})
+    time.sleep(30)
+
+def nap(input_text: str) -> str:
+    time.sleep(float(input_text))
+    return 'rested'
+
+tool_name = 'busy'
+tool_description = 'busy cpu tool'
+tool_isolation = 'process'
+tool_timeout = 1.5
+tool_cpu_seconds = 0.3
+tool_memory_mb = 256
+'''
+
+@pytest.fixture
+def tools_pkg(tmp_path, monkeypatch):
+    pkg = tmp_path / 'isolated_tools'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('')
+    (pkg / 'busy.py').write_text(TOOL)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return 'isolated_tools'
+
+@pytest.fixture
+def pool():
+    p = ProcessToolPool(max_workers=2, grace=1.0)
+    yield p
+    p.shutdown()
+
+def test_process_tool_runs_out_of_process_with_limits(tmp_path, tools_pkg, pool):
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')), process_pool=pool)
+    agent.discover_tools(tools_pkg, lazy=True)
+    tool = agent.tools['busy']
+    assert isinstance(tool, ProcessTool) and tool.func is None
+    assert pool.warm()
+    out = tool.run('hello')
+    assert out.startswith('hello@') and out != f'hello@{os.getpid()}'
+    with pytest.raises(ToolLimitExceeded, match='CPU'):
+        tool.run('spin')
+    with pytest.raises(ToolLimitExceeded, match='memory'):
+        tool.run('hog')
+    assert tool.run('again').startswith('again@')  # worker survives its limits
+    res = asyncio.run(agent.arun('u1', 'busy sleep', use_planner=False))
+    assert 'limit exceeded' in res[0]['results'][0]['output'] or 'timed out' in res[0]['results'][0]['output']
+    assert pool.stats()['limit_errors'] >= 2
+
+def test_hung_worker_restart_retries_other_calls(tools_pkg, pool):
+    from concurrent.futures import ThreadPoolExecutor
+    pool.warm()
+    with ThreadPoolExecutor(2) as ex:
+        hung = ex.submit(pool.run, tools_pkg + '.busy', 'stuck', 'x', timeout=0.5)
+        time.sleep(0.2)
+        other = ex.submit(pool.run, tools_pkg + '.busy', 'nap', '1.5', timeout=5)
+        with pytest.raises(ToolLimitExceeded, match='restarted'):
+            hung.result()
+        assert other.result() == 'rested'
+    assert pool.stats()['restarts'] == 1 and pool.stats()['retries'] == 1
@@ -0,0 +1,103 @@
+import threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from synapseflow.tool_runtime import CircuitBreaker, CircuitOpenError, ToolRuntime, backoff_delay
+
+def test_circuit_breaker_opens_and_probes():
+    b = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    b.record_failure()
+    assert b.allow()
+    b.record_failure()
+    assert b.state == 'open' and not b.allow()
+    time.sleep(0.06)
+    assert b.allow() and not b.allow()  # one half-open probe at a time
+    b.record_failure()
+    assert b.state == 'open'
+    time.sleep(0.06)
+    assert b.allow()
+    b.record_success()
+    assert b.state == 'closed'
+
+def test_backoff_is_jittered_and_capped():
+    delays = [backoff_delay(5, base=0.1, cap=0.5) for _ in range(50)]
+    assert all(0 <= d <= 0.5 for d in delays) and len(set(delays)) > 1
+
+class StubHandler(BaseHTTPRequestHandler):
+    plan = []  # status codes to answer with, then 200
+    hits = 0
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits += 1
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+            status = cls.plan.pop(0) if cls.plan else 200
+        time.sleep(0.05)
+        body = b'sunny'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    pytest.importorskip('requests')
+    StubHandler.plan, StubHandler.hits, StubHandler.peak = [], 0, 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+def test_retries_then_succeeds(stub):
+    rt = ToolRuntime(retries=2, backoff=0.01)
+    StubHandler.plan = [503, 502]
+    resp = rt.get(stub + '/Sanya')
+    assert resp.status_code == 200 and resp.text == 'sunny'
+    assert StubHandler.hits == 3 and rt.stats()['retries'] == 2
+
+def test_per_host_limit(stub):
+    rt = ToolRuntime(max_per_host=2)
+    threads = [threading.Thread(target=rt.get, args=(stub,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert StubHandler.hits == 6 and StubHandler.peak <= 2
+
+def test_circuit_fails_fast_when_upstream_down(stub):
+    rt = ToolRuntime(retries=0, failure_threshold=2, reset_timeout=60)
+    StubHandler.plan = [503, 503]
+    assert rt.get(stub).status_code == 503
+    assert rt.get(stub).status_code == 503
+    t0 = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        rt.get(stub)
+    assert time.monotonic() - t0 < 0.01 and StubHandler.hits == 2
+
+def test_async_state_is_per_loop_and_dropped_with_it():
+    import asyncio, gc
+    rt = ToolRuntime(max_per_host=3)
+    async def grab():
+        return rt._asem('api.example.com')
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second and second._value == 3
+    gc.collect()
+    assert len(rt._asems) <= 1
+
+def test_async_requests_across_event_loops(stub):
+    import asyncio
+    pytest.importorskip('httpx')
+    rt = ToolRuntime(retries=0)
+    assert asyncio.run(rt.aget(stub)).text == 'sunny'
+    assert asyncio.run(rt.aget(stub)).text == 'sunny'
+    assert len(rt._aclients) <= 1 and StubHandler.hits == 2
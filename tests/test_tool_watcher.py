@@ -0,0 +1,51 @@
+import os, time
+from synapseflow.agent import Agent, Memory
+from synapseflow.tool_watcher import ToolWatcher
+
+def write_tool(pkg, name, body, desc):
+    path = pkg / f'{name}.py'
+    path.write_text(f"def {name}(input_text):\n    return {body!r} + input_text\n\n"
+                    f"tool_name = '{name}'\ntool_description = '{desc}'\n")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # coarse-mtime filesystems
+
+def test_hot_reload_adds_reloads_and_removes(tmp_path, monkeypatch):
+    pkg = tmp_path / 'hot_tools'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('')
+    write_tool(pkg, 'alpha', 'A1:', 'alpha weather')
+    write_tool(pkg, 'beta', 'B:', 'beta news')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv('SYNAPSEFLOW_TOOL_MANIFEST', str(tmp_path / 'manifest.json'))
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    agent.discover_tools('hot_tools')
+    assert agent.tools['alpha'].run('x') == 'A1:x'
+    watcher = ToolWatcher(agent, 'hot_tools')
+    assert watcher.poll() == {'added': [], 'reloaded': [], 'removed': []}
+
+    snapshot = agent.tools
+    write_tool(pkg, 'alpha', 'A2:', 'alpha stocks')
+    write_tool(pkg, 'gamma', 'G:', 'gamma search')
+    (pkg / 'beta.py').unlink()
+    changes = watcher.poll()
+    assert changes == {'added': ['gamma'], 'reloaded': ['alpha'], 'removed': ['beta']}
+    assert agent.tools['alpha'].run('x') == 'A2:x'
+    assert sorted(agent.tools) == ['alpha', 'gamma']
+    assert sorted(snapshot) == ['alpha', 'beta']  # in-flight runs keep their registry
+    assert [t.name for t in agent.select_tools('stocks', top_n=1)] == ['alpha']
+    assert 'beta' not in [t.name for t in agent.select_tools('beta news', top_n=3)]
+
+def test_broken_reload_keeps_previous_tool(tmp_path, monkeypatch):
+    pkg = tmp_path / 'hot_tools2'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('')
+    write_tool(pkg, 'alpha', 'A1:', 'alpha weather')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv('SYNAPSEFLOW_TOOL_MANIFEST', str(tmp_path / 'manifest.json'))
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    agent.discover_tools('hot_tools2')
+    agent.tools['alpha'].run('x')
+    watcher = ToolWatcher(agent, 'hot_tools2')
+    (pkg / 'alpha.py').write_text('def alpha(:\n')
+    assert watcher.poll()['reloaded'] == []
+    assert agent.tools['alpha'].run('x') == 'A1:x'
@@ -0,0 +1,53 @@
+import time
+from synapseflow.agent import Agent, Memory, Tool
+from synapseflow.tracing import NOOP_SPAN, Histogram, SamplingProfiler, Tracer, set_tracer
+
+def test_histogram_quantiles():
+    h = Histogram()
+    for _ in range(90):
+        h.observe(0.002)
+    for _ in range(10):
+        h.observe(0.4)
+    s = h.summary()
+    assert s['count'] == 100
+    assert 1 <= s['p50_ms'] <= 2.5 and 250 <= s['p99_ms'] <= 500
+
+def teardown_function(_):
+    set_tracer(None)
+
+def test_agent_spans_and_prometheus(tmp_path):
+    tracer = Tracer()
+    set_tracer(tracer)
+    spans, calls = [], []
+    tracer.add_exporter(spans.append)
+    big = 'x' * 100000
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')), trace=calls.append)
+    agent.register_tool(Tool('big', lambda q: big, 'big weather'))
+    agent.register_tool(Tool('boom', lambda q: 1 / 0, 'boom weather'))
+    agent.run('u1', 'weather now')
+    names = {(s['name'], s['target']) for s in spans}
+    assert {('agent.run', agent.name), ('plan', ''), ('select_tools', ''), ('tool', 'big'), ('memory.add', '')} <= names
+    tool_span = next(s for s in spans if s['target'] == 'big')
+    assert tool_span['parent'] == 'agent.run' and tool_span['duration_ms'] >= 0
+    assert calls[0]['output'] is big and 'ms' in calls[0]  # no str() copy of tool output
+    assert 'tool:big' in tracer.stats() and 'p95_ms' in tracer.stats()['tool:big']
+    text = tracer.render_prometheus()
+    assert 'synapseflow_span_seconds_bucket{span="tool",target="big",le="+Inf"} 1' in text
+    assert 'synapseflow_events_total{event="tool.errors",target="boom"} 1' in text
+
+def test_disabled_tracer_records_nothing(tmp_path):
+    tracer = Tracer(enabled=False)
+    set_tracer(tracer)
+    assert tracer.span('tool', 'x') is NOOP_SPAN
+    agent = Agent(memory=Memory(path=str(tmp_path / 'mem.json')))
+    agent.register_tool(Tool('echo', lambda q: q, 'echo'))
+    agent.run('u1', 'echo hi')
+    assert tracer.stats() == {} and not tracer.recent
+
+def test_sampling_profiler_collects_stacks():
+    prof = SamplingProfiler(interval=0.002).start()
+    deadline = time.time() + 0.1
+    while time.time() < deadline:
+        sum(range(1000))
+    prof.stop()
+    assert 'test_sampling_profiler_collects_stacks' in prof.collapsed()